@@ -15,6 +15,7 @@
 
 # -*- coding: utf-8 -*-
 from collections.abc import Iterable
+import numpy as np # arithmetic computations
 
 # ------------------------------------------------------------------------------
 # Agent class definition
@@ -90,6 +91,270 @@ class Agent:
         """Getter for the point property"""
         return self.__point
 
+
+# ------------------------------------------------------------------------------
+# Population class definition
+class Population:
+    """
+    A struct-of-arrays store of the waterbirds, where each agent is a row shared
+    across contiguous arrays instead of an object on its own.
+
+    Parameters
+    ----------
+    types : list of string
+        the category names of the agents (e.g., ['5cm', '10cm']). The position
+        of a category within this list is its integer type code.
+    colors : list of string, default None
+        the color representation of each category (design focus)
+
+    Attributes
+    ----------
+    x : ndarray of float64, shape (n,)
+        the x-coordinates of the agents
+    y : ndarray of float64, shape (n,)
+        the y-coordinates of the agents
+    codes : ndarray of int16, shape (n,)
+        the type codes of the agents (index within `types`)
+    ids : ndarray of int64, shape (n,)
+        the unique key identifiers of the agents
+    habs : ndarray of int16, shape (n,)
+        the index of the habitat each agent dwells in (-1 if unknown)
+
+    Notes
+    -----
+    Agents are added by blocks of the same category. Their names are derived
+    from their ids, as in '1-30cm' for the first agent of the '30cm' category.
+    Indexing or iterating over a population yields `AgentView` objects, which
+    are compatible with the `Agent` interface and read from and write to the
+    underlying arrays.
+
+    Examples
+    --------
+    Construct a population
+    >>> population = Population(['15cm', '30cm'], ['#afaf3a', '#6CC2BD'])
+    >>> population.add('15cm', [(0.12, 0.53), (0.3, 0.4)])
+    >>> len(population)
+    2
+
+    Update positions of the agents of a category
+    >>> indices = population.indices('15cm')
+    >>> population.set_points(indices, [(0.2, 0.5), (0.3, 0.5)])
+    >>> population[0].get_point()
+    (0.2, 0.5)
+    """
+    def __init__(self, types, colors=None):
+        self.types = list(types)
+        self.colors = list(colors) if colors is not None else [''] * len(self.types)
+
+        self.x = np.empty(0, dtype=np.float64)
+        self.y = np.empty(0, dtype=np.float64)
+        self.codes = np.empty(0, dtype=np.int16)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.habs = np.empty(0, dtype=np.int16)
+        self.__starts = np.zeros(len(self.types), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not -len(self) <= index < len(self):
+            raise IndexError(f'agent index {index} out of range.')
+        return AgentView(self, index % len(self))
+
+    def __iter__(self):
+        return (AgentView(self, i) for i in range(len(self)))
+
+    @property
+    def points(self):
+        """The positions of the agents as an array of shape (n, 2)"""
+        return np.column_stack((self.x, self.y))
+
+    @property
+    def nbytes(self):
+        """The memory consumed by the arrays of the population"""
+        return self.x.nbytes + self.y.nbytes + self.codes.nbytes + self.ids.nbytes + self.habs.nbytes
+
+    def code(self, _type):
+        """Get the integer type code of a category"""
+        return self.types.index(_type)
+
+    def add(self, _type, points, habs=None):
+        """
+        Add a block of agents of the same category
+
+        Parameters
+        ----------
+        _type : string
+            the category name of the new agents
+        points : array-like of shape (n, 2)
+            the x and y coordinates of the new agents
+        habs : array-like of int, shape (n,), default None
+            the index of the habitat each new agent dwells in, if known
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        code, n = self.code(_type), len(points)
+        if not np.any(self.codes == code):
+            self.__starts[code] = len(self)
+
+        self.x = np.concatenate((self.x, points[:, 0]))
+        self.y = np.concatenate((self.y, points[:, 1]))
+        self.codes = np.concatenate((self.codes, np.full(n, code, dtype=np.int16)))
+        self.ids = np.concatenate((self.ids, np.arange(len(self.ids), len(self.ids) + n)))
+        habs = np.full(n, -1) if habs is None else np.asarray(habs).reshape(n)
+        self.habs = np.concatenate((self.habs, habs.astype(np.int16)))
+
+    def indices(self, _type):
+        """Get the indices of the agents of a category"""
+        return np.flatnonzero(self.codes == self.code(_type))
+
+    def set_points(self, indices, points):
+        """Update the positions of the agents at the given indices"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        self.x[indices] = points[:, 0]
+        self.y[indices] = points[:, 1]
+
+    def names(self, indices=None):
+        """Get the names of the agents (e.g., ['1-30cm', ...])"""
+        indices = np.arange(len(self)) if indices is None else indices
+        codes = self.codes[indices]
+        serials = self.ids[indices] - self.__starts[codes] + 1
+        return [f'{n}-{self.types[c]}' for n, c in zip(serials, codes)]
+
+
+# ------------------------------------------------------------------------------
+# PopulationBatch class definition
+class PopulationBatch:
+    """
+    Several independent replicates of the same population, stored with a leading
+    replicate dimension so that all of them are updated at once.
+
+    Parameters
+    ----------
+    types : list of string
+        the category names of the agents. The position of a category within
+        this list is its integer type code.
+    replicates : int
+        the number of replicates
+
+    Attributes
+    ----------
+    points : ndarray of float64, shape (r, n, 2)
+        the positions of the agents in every replicate
+    habs : ndarray of int16, shape (r, n)
+        the index of the habitat each agent dwells in, in every replicate
+    codes : ndarray of int16, shape (n,)
+        the type codes of the agents, shared by the replicates
+
+    Examples
+    --------
+    >>> batch = PopulationBatch(['15cm', '30cm'], 100)
+    >>> batch.add('15cm', np.random.rand(100, 5, 2)) # 5 agents per replicate
+    >>> batch.points.shape
+    (100, 5, 2)
+    """
+    def __init__(self, types, replicates):
+        self.types = list(types)
+        self.replicates = int(replicates)
+        self.points = np.empty((self.replicates, 0, 2), dtype=np.float64)
+        self.habs = np.empty((self.replicates, 0), dtype=np.int16)
+        self.codes = np.empty(0, dtype=np.int16)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        """The memory consumed by the arrays of the replicates"""
+        return self.points.nbytes + self.habs.nbytes + self.codes.nbytes
+
+    def code(self, _type):
+        """Get the integer type code of a category"""
+        return self.types.index(_type)
+
+    def add(self, _type, points, habs=None):
+        """
+        Add a block of agents of the same category to every replicate
+
+        Parameters
+        ----------
+        _type : string
+            the category name of the new agents
+        points : array-like of shape (r, n, 2)
+            the x and y coordinates of the new agents in every replicate
+        habs : array-like of int, shape (r, n), default None
+            the index of the habitat each new agent dwells in, if known
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(self.replicates, -1, 2)
+        n = points.shape[1]
+        habs = np.full((self.replicates, n), -1) if habs is None else np.asarray(habs)
+        self.points = np.concatenate((self.points, points), axis=1)
+        self.habs = np.concatenate((self.habs, habs.reshape(self.replicates, n).astype(np.int16)), axis=1)
+        self.codes = np.concatenate((self.codes, np.full(n, self.code(_type), dtype=np.int16)))
+
+    def indices(self, _type):
+        """Get the indices of the agents of a category (same in every replicate)"""
+        return np.flatnonzero(self.codes == self.code(_type))
+
+    def replicate(self, r, colors=None):
+        """Get a copy of a replicate as a `Population`"""
+        population = Population(self.types, colors)
+        for k, _type in enumerate(self.types):
+            indices = self.indices(_type)
+            if len(indices) > 0:
+                population.add(_type, self.points[r, indices], self.habs[r, indices])
+        return population
+
+
+# ------------------------------------------------------------------------------
+# AgentView class definition
+class AgentView:
+    """
+    An `Agent`-compatible view of a single row of a `Population`.
+
+    Parameters
+    ----------
+    population : Population
+        the population holding the agent
+    index : int
+        the position of the agent within the population
+    """
+    __slots__ = ('population', 'index')
+
+    def __init__(self, population, index):
+        self.population = population
+        self.index = index
+
+    @property
+    def type(self):
+        return self.population.types[self.population.codes[self.index]]
+
+    @property
+    def color(self):
+        return self.population.colors[self.population.codes[self.index]]
+
+    @property
+    def name(self):
+        return self.population.names([self.index])[0]
+
+    def set_point(self, point):
+        """
+        Setter for the point property
+
+        Parameters
+        ----------
+        point : tuple of shape (2,)
+            the x and y coordinates. Must be float values.
+        """
+        if not isinstance(point, Iterable): # point: (x, y)
+            raise TypeError(f'the argument {point} is not iterable.')
+        if len(point) != 2:
+            raise TypeError(f'the argument {point} must contain 2 elements.')
+        self.population.x[self.index], self.population.y[self.index] = point
+
+    def get_point(self):
+        """Getter for the point property"""
+        return (float(self.population.x[self.index]), float(self.population.y[self.index]))
+
 # ==============================================================================
 # END: Agent class definition
 # ==============================================================================
\ No newline at end of file
@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Benchmarks of the hot paths of the process at scaling population sizes
+
+# ==============================================================================
+# START: Benchmarks
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import io
+import os
+import sys
+import copy
+import json
+import time as timer # wall clock
+import argparse # command line
+import platform
+import tempfile
+import subprocess # commit of the benchmarked tree
+import contextlib
+import statistics
+from datetime import datetime # datetime handler
+import numpy as np # arithmetic computations
+
+import config
+import constants as C
+from helpers import gen_rand_point, which_habitat, compute_dist, eval_fn
+from core import initialize, create_patches, create_agents, restrict_habitats, update_one, update, reset
+from simulation import Simulation
+
+SIZES = (22, 1000, 10000, 100000) # 22: default configuration (`config.yml`)
+STEPS = (1, 10, 34) # 34: every unit of time of the default process
+SEED = 2019
+
+def scale_config(cnf, size, steps, outdir):
+    """
+    Get a copy of a configuration scaled to a number of agents and of units of
+    time, with its outputs redirected
+
+    Parameters
+    ----------
+    cnf : dict
+        the base configuration
+    size : int
+        the total number of agents, split among the agents' types in the same
+        proportions as in the base configuration
+    steps : int
+        the number of updates of the process (`app.counter` - 1)
+    outdir : string
+        the base output directory (`outDir`)
+
+    Returns
+    -------
+    cnf : dict
+        the scaled configuration
+    """
+    cnf = copy.deepcopy(cnf)
+    agents = cnf['app']['agents']
+    total = sum(ag_cnf['quantity'] for ag_cnf in agents)
+    quantities = [size * ag_cnf['quantity'] // total for ag_cnf in agents]
+    quantities[int(np.argmax(quantities))] += size - sum(quantities) # remainder
+    for ag_cnf, quantity in zip(agents, quantities):
+        ag_cnf['quantity'] = quantity
+
+    cnf['outDir'] = outdir
+    cnf['app']['counter'] = steps + 1
+    cnf['app'].setdefault('render', {})['workers'] = 0 # rendered in process, hence timed
+    cnf['app']['render']['png'] = False
+    return cnf
+
+
+def _per_call():
+    """ The habitats and the random generator of the per-agent benchmarks, which
+    time `size` calls each, as an update of the reference engine does """
+    habitats = create_patches()
+    ag_cnf = C.CNF_AG[0]
+    restricted = restrict_habitats(habitats, ag_cnf['habs'], first_only=True)
+    return habitats, restricted, np.random.default_rng(SEED)
+
+
+def bench_gen_rand_point(size, steps):
+    _, restricted, rng = _per_call()
+    gen_rand_point(restricted, 'in', rng) # warm up: the sampler is built once
+    def run():
+        for _ in range(size):
+            gen_rand_point(restricted, 'in', rng)
+    return run
+
+
+def bench_which_habitat(size, steps):
+    habitats, _, rng = _per_call()
+    points = rng.random((size, 2)) # anywhere, as drawn before locating them
+    which_habitat(points[0], habitats) # warm up: the spatial index is built once
+    def run():
+        for point in points:
+            which_habitat(point, habitats)
+    return run
+
+
+def bench_compute_dist(size, steps):
+    habitats, _, rng = _per_call()
+    settlements = [h for h in habitats if h.type == C.HUMAN_SETTLEMENT]
+    lagoons = [h for h in habitats if h.type != C.HUMAN_SETTLEMENT]
+    chosen = [lagoons[i] for i in rng.integers(len(lagoons), size=size)]
+    def run():
+        for habitat in chosen:
+            compute_dist(habitat, settlements)
+    return run
+
+
+def bench_eval_fn(size, steps):
+    _, _, rng = _per_call()
+    meta_fns = [meta_fn for ag_cnf in C.CNF_AG for meta_fn in ag_cnf['fns']]
+    calls = [(meta_fns[i], x) for i, x in zip(rng.integers(len(meta_fns), size=size), rng.random(size) * 50)]
+    def run():
+        for meta_fn, x in calls:
+            eval_fn(meta_fn, x)
+    return run
+
+
+def bench_update_one(size, steps):
+    rng = np.random.default_rng(SEED)
+    habitats = create_patches()
+    agents = create_agents(habitats, rng)
+    def run():
+        for agent in agents:
+            update_one(habitats, agent, 1, rng)
+    return run
+
+
+def bench_update(size, steps, engine=None):
+    rng = np.random.default_rng(SEED)
+    habitats, agents = initialize(rng)
+    def run():
+        for time in range(1, steps + 1):
+            update(habitats, agents, time, engine, rng)
+    return run
+
+
+def bench_observe(size, steps):
+    from output import observe
+    sim = Simulation(C.CONFIG, seed=SEED, record=False)
+    def run():
+        for time in range(steps):
+            observe(sim.habitats, sim.agents, time)
+    return run
+
+
+def bench_make_gif(size, steps):
+    from output import make_gif
+    from renderer import Renderer
+    sim = Simulation(C.CONFIG, seed=SEED, record=False)
+    renderer = Renderer(
+        sim.habitats, sim.agents.types, sim.agents.colors,
+        [C.get_agentp(_type, 'label') for _type in sim.agents.types], C.SAMPLE_DIR
+    )
+    for time in range(steps): # the PNG images to combine
+        renderer.snapshot(sim.agents.x, sim.agents.y, sim.agents.codes, time, True)
+        sim.step()
+    renderer.close()
+    def run():
+        make_gif(dirname=C.SAMPLE_DIR)
+    return run
+
+
+def bench_plot_figure(size, steps):
+    from output import plot_figure
+    sim = Simulation(C.CONFIG, seed=SEED, record=False).run(steps)
+    def run():
+        plot_figure(sim.occupancy)
+    return run
+
+
+def bench_finalize(size, steps):
+    from output import observe, finalize
+    rng = np.random.default_rng(SEED)
+    habitats, agents = initialize(rng)
+    observe(habitats, agents, 0) # something to close
+    for time in range(1, steps + 1):
+        update(habitats, agents, time, None, rng)
+    def run():
+        finalize()
+    return run
+
+
+# name: (benchmark, stepped). The stepped benchmarks time a whole process of
+# `steps` units of time; the others time `size` calls, one per agent. They are
+# also run as pytest-benchmark cases (see `tests/test_benchmarks.py`).
+BENCHMARKS = {
+    'gen_rand_point': (bench_gen_rand_point, False),
+    'which_habitat': (bench_which_habitat, False),
+    'compute_dist': (bench_compute_dist, False),
+    'eval_fn': (bench_eval_fn, False),
+    'update_one': (bench_update_one, False),
+    'update': (bench_update, True),
+    'observe': (bench_observe, True),
+    'make_gif': (bench_make_gif, True),
+    'plot_figure': (bench_plot_figure, True),
+    'finalize': (bench_finalize, True),
+}
+
+
+def prepare(name, size, steps, engine=None, outdir='.'):
+    """
+    Set up a benchmark: configure a process of `size` agents and `steps` units
+    of time, with its outputs in `outdir`, then build what is timed
+
+    Returns
+    -------
+    run : callable
+        the timed part of the benchmark (see `BENCHMARKS`). Release the state
+        it leaves with `teardown` once timed.
+    """
+    bench, _ = BENCHMARKS[name]
+    cnf = scale_config(config.load_config(), size, steps or 1, outdir)
+    C.configure(cnf)
+    with contextlib.redirect_stdout(io.StringIO()): # progress messages
+        config.prepare_output(config=cnf)
+        return bench(size, steps, engine) if name == 'update' else bench(size, steps)
+
+
+def teardown():
+    """ Release whatever a benchmark left in the state of the process """
+    if C.STORE['gif'] is not None:
+        C.STORE['gif'].close()
+        C.STORE['gif'] = None
+    if C.STORE['renderer'] is not None:
+        C.STORE['renderer'].close()
+    if C.STORE['stats'] is not None and C.STORE['stats'].writer is not None:
+        C.STORE['stats'].close()
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+    reset()
+
+
+def measure(name, size, steps, repeat=3, engine=None, outdir='.'):
+    """
+    Time a benchmark: the setup runs before each repetition and is not timed
+
+    Parameters
+    ----------
+    name : string
+        the name of the benchmark (see `BENCHMARKS`)
+    size : int
+        the number of agents
+    steps : int, None
+        the number of units of time, for the stepped benchmarks
+    repeat : int, default 3
+        the number of timed repetitions
+    engine : string, default None
+        the update engine (see `core.update`)
+    outdir : string, default '.'
+        the directory the outputs of the benchmark are written into
+
+    Returns
+    -------
+    result : dict
+        the timings (in seconds) and their summary
+    """
+    times = []
+    for _ in range(repeat):
+        run = prepare(name, size, steps, engine, outdir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = timer.perf_counter()
+            run()
+            times.append(timer.perf_counter() - start)
+            teardown()
+
+    median = statistics.median(times)
+    return {
+        'name': name,
+        'size': size,
+        'steps': steps,
+        'repeat': repeat,
+        'times': times,
+        'min': min(times),
+        'median': median,
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if repeat > 1 else 0.0,
+        'per_agent': median / (size * (steps or 1)) # per agent and unit of time
+    }
+
+
+def get_metadata():
+    """ Describe the benchmarked tree and machine, to compare like with like """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def run(names=None, sizes=SIZES, steps=STEPS, repeat=3, engine=None, outdir=None):
+    """
+    Run benchmarks over every population size (and step count, if stepped)
+
+    Returns
+    -------
+    report : dict
+        'meta': the benchmarked tree and machine (see `get_metadata`)
+        'results': a list of results (see `measure`)
+    """
+    names = names or list(BENCHMARKS)
+    report = {'meta': get_metadata(), 'results': []}
+    report['meta'].update(sizes=list(sizes), steps=list(steps), repeat=repeat, engine=engine or C.ENGINE)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in names:
+            for size in sizes:
+                for n in (steps if BENCHMARKS[name][1] else [None]):
+                    result = measure(name, size, n, repeat, engine, outdir or tmpdir)
+                    report['results'].append(result)
+                    print('{:<16}{:>8} agents{:>6} {:>12.6f} s  ({:.3g} s/agent)'.format(
+                        name, size, '' if n is None else f'x{n}', result['median'], result['per_agent']
+                    ))
+    return report
+
+
+def compare(base, head, threshold=1.1):
+    """
+    Compare two benchmark reports, case by case, by their median timings
+
+    Parameters
+    ----------
+    base, head : dict
+        the reports (see `run`) before and after a change
+    threshold : float, default 1.1
+        the ratio (head / base) beyond which a case regressed
+
+    Returns
+    -------
+    rows : list of tuple
+        (name, size, steps, base median, head median, ratio), for every case in
+        both reports
+    regressions : list of tuple
+        the rows of the cases that regressed
+    """
+    key = lambda r: (r['name'], r['size'], r['steps'])
+    before = {key(r): r for r in base['results']}
+    rows = []
+    for r in head['results']:
+        if key(r) in before:
+            b = before[key(r)]['median']
+            rows.append(key(r) + (b, r['median'], r['median'] / b if b > 0 else float('inf')))
+    regressions = [row for row in rows if row[-1] > threshold]
+    return rows, regressions
+
+
+def print_comparison(base, head, threshold=1.1):
+    rows, regressions = compare(base, head, threshold)
+    print('=> Comparing {} (base) with {} (head)'.format(
+        base['meta'].get('commit'), head['meta'].get('commit')
+    ))
+    for name, size, steps, b, h, ratio in rows:
+        flag = '  REGRESSION' if ratio > threshold else ''
+        print('{:<16}{:>8} agents{:>6} {:>12.6f} s {:>12.6f} s {:>8.2f}x{}'.format(
+            name, size, '' if steps is None else f'x{steps}', b, h, ratio, flag
+        ))
+    print(f'=> {len(regressions)} regression(s) beyond {threshold:.2f}x over {len(rows)} cases')
+    return regressions
+
+
+def main(argv=None):
+    """ Command line entry point: run the benchmarks, save them and compare them """
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of the waterbirds ABM')
+    parser.add_argument('names', nargs='*', help=f'benchmarks to run (default: all): {", ".join(BENCHMARKS)}')
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=SIZES, help='population sizes')
+    parser.add_argument('-t', '--steps', type=int, nargs='+', default=STEPS, help='units of time of the stepped benchmarks')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='timed repetitions of each case')
+    parser.add_argument('-e', '--engine', choices=['vectorized', 'reference'], help='update engine')
+    parser.add_argument('-o', '--output', help='JSON report (default: <outDir>/benchmarks/<commit>_<date>.json)')
+    parser.add_argument('-c', '--compare', nargs='+', metavar='REPORT',
+        help='compare with a base report; given two reports, compare them without running anything')
+    parser.add_argument('--threshold', type=float, default=1.1, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmark(s): {", ".join(sorted(unknown))}')
+    reports = []
+    for filename in args.compare or []:
+        with open(filename) as report:
+            reports.append(json.load(report))
+
+    if len(reports) < 2:
+        report = run(args.names, args.sizes, args.steps, args.repeat, args.engine)
+        filename = args.output
+        if filename is None:
+            dirname = os.path.join(config.get_output_dirs()['out'], 'benchmarks')
+            os.makedirs(dirname, exist_ok=True)
+            datenow = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = os.path.join(dirname, f'{report["meta"]["commit"] or "local"}_{datenow}.json')
+        with open(filename, 'w') as target:
+            json.dump(report, target, indent=2)
+        print(f'=> Benchmarks saved at <{filename}>')
+        reports.append(report)
+
+    if len(reports) >= 2:
+        regressions = print_comparison(reports[0], reports[1], args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+# run from the command line
+if __name__ == '__main__':
+    sys.exit(main())
+
+# ==============================================================================
+# END: Benchmarks
+# ==============================================================================
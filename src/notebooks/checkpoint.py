@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the checkpoints of a process, from which it resumes
+
+# ==============================================================================
+# START: Checkpoint class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import json
+import numpy as np # arithmetic computations
+
+from agent import Population
+from occupancy import Occupancy
+from recorder import StatsRecorder, StatsWriter
+
+VERSION = 1
+
+# ------------------------------------------------------------------------------
+# Checkpoint class definition
+class Checkpoint:
+    """
+    The whole state of a process at the end of a unit of time: enough to resume
+    it as if it had never stopped.
+
+    Parameters
+    ----------
+    data : dict
+        the arrays of the state, keyed by name (see `capture`)
+
+    Notes
+    -----
+    A checkpoint is a single NumPy `.npz` archive holding:
+    - 'time', 'epoch': the last completed unit of time, the environment epoch
+    - 'config': the configuration of the process (JSON)
+    - 'types', 'x', 'y', 'codes', 'habs': the agents
+    - 'hab_names', 'hab_props' (JSON): the habitats' properties
+    - 'rng_kind', 'rng_state' (JSON), 'rng_keys': the state of the random
+      generator
+    - 'occupancy': the occupancy history
+    - 'stats_<column>': the statistics not handed over to the writer yet
+    - 'writer_path', 'writer_fmt', 'writer_chunks', 'writer_nbytes': the
+      offsets of the statistics already on disk, if streamed
+    The archive is written to a temporary file first, then renamed, so that a
+    process stopped while saving leaves the previous checkpoint intact.
+
+    Examples
+    --------
+    >>> Checkpoint.capture(time, habitats, agents, occupancy, recorder, rng).save('checkpoint.npz')
+    >>> ckpt = Checkpoint.load('checkpoint.npz')
+    >>> ckpt.restore_habitats(habitats)
+    >>> agents, rng = ckpt.population(colors), ckpt.rng()
+    """
+    def __init__(self, data):
+        self.data = data
+
+    @property
+    def time(self):
+        return int(self.data['time'])
+
+    @property
+    def epoch(self):
+        return int(self.data['epoch'])
+
+    @property
+    def config(self):
+        return json.loads(str(self.data['config']))
+
+
+    @classmethod
+    def capture(cls, time, habitats, agents, occupancy, recorder=None, rng=None, epoch=0, cnf=None):
+        """
+        Capture the state of a process. The statistics already handed over to
+        the writer are waited for, so that the offsets on disk are final.
+
+        Parameters
+        ----------
+        time : int
+            the last completed unit of time
+        habitats : list of Habitat
+            all the created habitats
+        agents : Population
+            the agents
+        occupancy : Occupancy
+            the occupancy of the habitats, recorded up to `time`
+        recorder : StatsRecorder, default None
+            the statistics, if recorded
+        rng : numpy.random.Generator, default None
+            the source of randomness. If not specified, the global state of
+            `numpy.random`.
+        epoch : int, default 0
+            the environment epoch
+        cnf : dict, default None
+            the configuration of the process
+
+        Returns
+        -------
+        checkpoint : Checkpoint
+            the captured state (copied)
+        """
+        data = {
+            'version': np.array(VERSION),
+            'time': np.array(int(time)),
+            'epoch': np.array(int(epoch)),
+            'config': np.array(json.dumps(cnf)),
+            'types': np.array(agents.types, dtype=str),
+            'x': agents.x.copy(),
+            'y': agents.y.copy(),
+            'codes': agents.codes.copy(),
+            'habs': agents.habs.copy(),
+            'hab_names': np.array([h.id for h in habitats], dtype=str),
+            'hab_props': np.array(json.dumps([h.props for h in habitats], default=_scalar)),
+            'occupancy': occupancy.tensor.copy()
+        }
+        data.update(_rng_state(rng))
+        if recorder is not None:
+            data['stats_size'] = np.array(recorder.size)
+            for k, col in recorder.columns.items():
+                data['stats_' + k] = col[:recorder.size].copy()
+            writer = recorder.writer
+            if writer is not None:
+                writer.sync() # the queued chunks are on disk
+                data['writer_path'] = np.array(writer.path)
+                data['writer_fmt'] = np.array(writer.fmt)
+                data['writer_chunks'] = np.array(writer.chunks)
+                data['writer_nbytes'] = np.array(writer.nbytes)
+        return cls(data)
+
+
+    def save(self, filename):
+        """
+        Save the checkpoint in NumPy's `.npz` format, replacing the previous one
+        only once completely written
+
+        Returns
+        -------
+        filename : string
+            the target file
+        """
+        tmpname = filename + '.tmp'
+        with open(tmpname, 'wb') as f:
+            np.savez_compressed(f, **self.data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpname, filename)
+        return filename
+
+
+    @classmethod
+    def load(cls, filename):
+        """ Load a checkpoint saved with `save` """
+        with np.load(filename) as archive:
+            data = {k: archive[k] for k in archive.files}
+        if int(data['version']) != VERSION:
+            raise ValueError(f'unsupported checkpoint version <{int(data["version"])}> at <{filename}>')
+        return cls(data)
+
+
+    def rng(self):
+        """
+        Restore the random generator
+
+        Returns
+        -------
+        rng : numpy.random.Generator, None
+            the generator, or None if the checkpoint holds the global state of
+            `numpy.random`, which is restored instead
+        """
+        state = json.loads(str(self.data['rng_state']))
+        if str(self.data['rng_kind']) == 'legacy':
+            state = (state[0], self.data['rng_keys']) + tuple(state[1:])
+            np.random.set_state(state)
+            return None
+        bit_generator = getattr(np.random, state['bit_generator'])()
+        bit_generator.state = state
+        return np.random.Generator(bit_generator)
+
+
+    def restore_habitats(self, habitats):
+        """ Set the properties of the habitats, which change over time """
+        hab_names = [h.id for h in habitats]
+        if hab_names != self.data['hab_names'].tolist():
+            raise ValueError('the habitats do not match the ones of the checkpoint')
+        for h, props in zip(habitats, json.loads(str(self.data['hab_props']))):
+            h.props = props # values as they were (e.g., int or float)
+        return habitats
+
+
+    def population(self, colors=None):
+        """ Restore the agents, as created (by blocks of the same type) """
+        types, codes = self.data['types'].tolist(), self.data['codes']
+        agents = Population(types, colors)
+        points = np.column_stack((self.data['x'], self.data['y']))
+        for k in dict.fromkeys(codes.tolist()): # in order of creation
+            block = np.flatnonzero(codes == k)
+            agents.add(types[k], points[block], self.data['habs'][block])
+        if not np.array_equal(agents.codes, codes):
+            raise ValueError('the agents of the checkpoint are not stored by blocks of the same type')
+        return agents
+
+
+    def occupancy(self, hab_types=None, capacity=0):
+        """ Restore the occupancy of the habitats, with its history """
+        occupancy = Occupancy(
+            self.data['hab_names'].tolist(), self.data['types'].tolist(), hab_types, capacity
+        )
+        occupancy.restore(self.data['occupancy'])
+        return occupancy
+
+
+    def recorder(self, capacity, agent_names, hab_names, hab_types):
+        """
+        Restore the recorder of the statistics: the rows not written yet, and
+        the writer where it was (the rows written after the checkpoint, if any,
+        are discarded, as they are written again)
+
+        Returns
+        -------
+        recorder : StatsRecorder, None
+            the recorder, or None if the statistics were not recorded
+        """
+        if 'stats_size' not in self.data:
+            return None
+        writer = None
+        if 'writer_path' in self.data:
+            path, fmt = str(self.data['writer_path']), str(self.data['writer_fmt'])
+            writer = StatsWriter(os.path.splitext(path)[0], fmt)
+            writer.resume(int(self.data['writer_chunks']), int(self.data['writer_nbytes']))
+        recorder = StatsRecorder(capacity, agent_names, hab_names, hab_types, writer)
+        recorder.restore({k: self.data['stats_' + k] for k, _ in StatsRecorder.COLUMNS})
+        return recorder
+
+
+def _rng_state(rng):
+    """ The state of a random generator, as arrays """
+    if rng is None: # global state of `numpy.random`: legacy Mersenne Twister
+        state = np.random.get_state()
+        name, keys, rest = state[0], state[1], state[2:]
+        return {
+            'rng_kind': np.array('legacy'),
+            'rng_state': np.array(json.dumps([name] + [_scalar(v) for v in rest])),
+            'rng_keys': np.asarray(keys).copy()
+        }
+    return {
+        'rng_kind': np.array('bit_generator'),
+        'rng_state': np.array(json.dumps(rng.bit_generator.state, default=_scalar))
+    }
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+# ==============================================================================
+# END: Checkpoint class definition
+# ==============================================================================
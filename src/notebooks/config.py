@@ -21,24 +21,33 @@ import os
 import sys
 import yaml
 import shutil
+import hashlib # cache validation
 import warnings
-import matplotlib.pyplot as plotter # plotter
-import matplotlib.pylab as pylab
 
-# TODO: plotter, env, sys
+# Nothing happens when importing this module: the configuration is loaded on
+# first use (`load_config`), the output directories are only prepared (and
+# cleaned) on demand (`prepare_output`), and the default parameters for the
+# graphs are only set by `init`.
+
+def set_style():
+    """ Set the default parameters for the graphs """
+    import matplotlib.pylab as pylab
+
+    pylab.rcParams['figure.figsize'] = (11, 6.5)
+    pylab.rcParams['axes.titlesize'] = 18.0
+    pylab.rcParams['xtick.labelsize'] = 12
+    pylab.rcParams['ytick.labelsize'] = 12
+    pylab.rcParams['legend.fontsize'] = 12
+    pylab.rcParams['axes.labelsize'] = 12
+    pylab.rcParams['mathtext.fontset'] = 'stix'
+    pylab.rcParams['font.family'] = 'STIXGeneral'
 
-# Default parameters for the graphs
-pylab.rcParams['figure.figsize'] = (11, 6.5)
-pylab.rcParams['axes.titlesize'] = 18.0
-pylab.rcParams['xtick.labelsize'] = 12
-pylab.rcParams['ytick.labelsize'] = 12
-pylab.rcParams['legend.fontsize'] = 12
-pylab.rcParams['axes.labelsize'] = 12
-pylab.rcParams['mathtext.fontset'] = 'stix'
-pylab.rcParams['font.family'] = 'STIXGeneral'
 
 def init():
     """ Initial setup for the application """
+    import matplotlib.pyplot as plotter # plotter
+
+    set_style()
     plotter.ioff() # turn off interactive plotting mode
     warnings.filterwarnings('ignore') # turn off warnings
 
@@ -144,6 +153,41 @@ def mkdir(dirname, basepath='.'):
     return fullpath
 
 
+# parsed configurations by absolute path: (mtime, digest, config)
+_CACHE = dict()
+
+def validate_config(cnf, filename='config'):
+    """
+    Check that a configuration has the keys the application requires
+
+    Parameters
+    ----------
+    cnf : dict
+        the configuration, as loaded from a YAML file
+    filename : string, default 'config'
+        the source of the configuration (for the error messages)
+
+    Raises
+    ------
+    ValueError
+        if a required key is missing or malformed
+    """
+    def require(node, keys, where):
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                raise ValueError(f'<{filename}>: missing key <{where}{key}>')
+
+    require(cnf, ['rootDir', 'outDir', 'paths', 'app'], '')
+    require(cnf['paths'], ['sample', 'graph'], 'paths.')
+    require(cnf['app'], ['threshold', 'counter', 'rain', 'agents'], 'app.')
+    require(cnf['app']['rain'], ['divisor', 'values'], 'app.rain.')
+    if not isinstance(cnf['app']['agents'], list) or not cnf['app']['agents']:
+        raise ValueError(f'<{filename}>: <app.agents> should be a non-empty list')
+    for i, ag_cnf in enumerate(cnf['app']['agents']):
+        require(ag_cnf, ['type', 'quantity', 'color', 'label', 'habs', 'fns'], f'app.agents.{i}.')
+    return cnf
+
+
 def load_config(filename='config.yml'):
     """
     Load the application configuration from an external YAML file.
@@ -154,26 +198,105 @@ def load_config(filename='config.yml'):
         the name of the YAML-formated file containing the required setup to
         configure the application at its startup.
 
+    Returns
+    -------
+    config : dict
+        the parsed and validated configuration
+
     Notes
     -----
     There is no API defining the YAML-based keys yet. That is, the required YAML
     keys are shown in the `config.yml` as an example of references the required
-    keys.
+    keys (see `validate_config`).
+
+    The parsed configuration is cached: the file is only read again if its
+    modification time changed, and only parsed again if its contents did too
+    (SHA-256 digest). The same object is returned until then: copy it before
+    making any change (see `copy.deepcopy`).
     """
     # make sure the config file exists
     if not os.path.isfile(filename):
         raise IOError(f'the filename <{filename}> does not exists.')
 
-    with open(filename, 'r') as configfile:
-        config = yaml.load(configfile)
+    path = os.path.abspath(filename)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[2]
+
+    with open(path, 'rb') as configfile:
+        content = configfile.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if cached is not None and cached[1] == digest: # touched, not changed
+        _CACHE[path] = (mtime, digest, cached[2])
+        return cached[2]
+
+    config = validate_config(yaml.safe_load(content), filename)
+    _CACHE[path] = (mtime, digest, config)
     return config
 
 
-CONFIG = load_config()
-rootDir = get_dirname(CONFIG['rootDir'])
-outDir = get_dirname(CONFIG['outDir'])
-sampleDir = mkdir(CONFIG['paths']['sample'], outDir)
-graphDir = mkdir(CONFIG['paths']['graph'], outDir)
+def get_output_dirs(config=None):
+    """
+    Get the output directories of a configuration, without creating them
+
+    Returns
+    -------
+    dirs : dict
+        the paths keyed by 'root', 'out', 'sample' and 'graph'
+    """
+    config = config or load_config()
+    out = config['outDir']
+    return {
+        'root': config['rootDir'],
+        'out': out,
+        'sample': os.path.join(out, config['paths']['sample']),
+        'graph': os.path.join(out, config['paths']['graph'])
+    }
+
+
+def prepare_output(clean=True, config=None):
+    """
+    Prepare the output directories (samples and graphs) before running the
+    application.
+
+    Parameters
+    ----------
+    clean : bool, default True
+        whether to remove the previous contents of the samples and graphs
+        directories (see `mkdir`). Otherwise, only create the missing ones.
+    config : dict, default None
+        the configuration. If not specified, use `load_config`.
+
+    Returns
+    -------
+    sampleDir, graphDir : string
+        the prepared directories, the same as `get_output_dirs` (hence as
+        `constants.SAMPLE_DIR` and `constants.GRAPH_DIR`). To write the outputs
+        elsewhere, change `outDir` in the configuration.
+    """
+    config = config or load_config()
+    outdir = get_dirname(get_output_dirs(config)['out'])
+    dirs = []
+    for key in ('sample', 'graph'):
+        dirname = config['paths'][key]
+        if clean:
+            dirs.append(mkdir(dirname, outdir))
+        else:
+            dirs.append(os.path.join(outdir, dirname))
+            os.makedirs(dirs[-1], exist_ok=True)
+    return tuple(dirs)
+
+
+def __getattr__(name):
+    # lazy module attributes (PEP 562), formerly set when importing this module
+    if name == 'CONFIG':
+        return load_config()
+    dirs = {'rootDir': 'root', 'outDir': 'out', 'sampleDir': 'sample', 'graphDir': 'graph'}
+    if name in dirs:
+        return get_output_dirs()[dirs[name]]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
 # ==============================================================================
 # END: Config
-# ==============================================================================
\ No newline at end of file
+# ==============================================================================
@@ -17,20 +17,11 @@
 
 # -*- coding: utf-8 -*-
 import config
-
-# Loaded configurations
-CONFIG = config.CONFIG
-
-# Agents' configurations
-CNF_AG = CONFIG['app']['agents']
-TOTAL_AGENT_TYPE = len(CNF_AG)
-TOTAL_AGENTS = sum([ag_cnf['quantity'] for ag_cnf in CNF_AG])
-MAX_AGENT_QTY = max([ag_cnf['quantity'] for ag_cnf in CNF_AG]) + 1
+from types import SimpleNamespace # settings
+from helpers import compile_fns
+from layout import load_layout
 
 # Core elements: unique (used as key identifier)
-PROCESSING_TIME = int(CONFIG['app']['counter']) # time limit for the entire process
-TIME_DIVISOR = CONFIG['app']['rain']['divisor']
-
 LAGOON_ORANGE_SM = 'lagoon-orange-sm'
 LAGOON_ORANGE_LG = 'lagoon-orange-lg'
 LAGOON_BLUE = 'lagoon-blue'
@@ -40,8 +31,6 @@ LAGOON_TYPE_ORANGE = 1
 LAGOON_TYPE_BLUE = 2
 LAGOON_TYPE_GREEN = 3
 
-THRESHOLD = float(CONFIG['app']['threshold']) # threshold to allow agents' movements driven by the probability
-
 # Color palette definition
 COLORS = dict()
 COLORS[LAGOON_ORANGE_LG] = 'orange'
@@ -57,36 +46,16 @@ LABELS[LAGOON_ORANGE_LG] = 'Habitat {} (5cm)'.format(LAGOON_TYPE_ORANGE)
 LABELS[LAGOON_BLUE] = 'Habitat {} (1m)'.format(LAGOON_TYPE_BLUE)
 LABELS[LAGOON_GREEN] = 'Habitat {} (40cm)'.format(LAGOON_TYPE_GREEN)
 LABELS[HUMAN_SETTLEMENT] = 'Humans'
-for ag_cnf in CNF_AG:
-    LABELS[ag_cnf['type']] = ag_cnf['label']
-
-# Directories (paths)
-ROOT_DIR = config.rootDir
-OUT_DIR = config.outDir
-SAMPLE_DIR = config.sampleDir
-GRAPH_DIR = config.graphDir
 
 # In-memory storage
 STORE = dict()
-STORE['env'] = list()
-STORE['stats'] = {
-    'processing_unit': [],
-    'agent_name': [],
-    'agent_x': [],
-    'agent_y': [],
-    'hab_name': [],
-    'hab_type': [],
-    'hab_water_depth': [],
-    'hab_salinity': [],
-    'hab_food': [],
-    'hab_distance': [],
-    'prob_overall': [],
-    'prob_water': [],
-    'prob_salinity': [],
-    'prob_food': [],
-    'prob_distance': [],
-    'has_moved': []
-}
+STORE['occupancy'] = None # Occupancy of the habitats by the agents, over time
+STORE['stats'] = None # StatsRecorder of the agents' statistics
+STORE['epoch'] = 0 # environment epoch: changes every time the habitats' props do
+STORE['probs'] = None # ProbabilityTable of the current habitats
+STORE['renderer'] = None # Renderer of the current habitats
+STORE['gif'] = None # GifWriter streaming the snapshots
+STORE['probe'] = None # Probe timing the phases of the process (see `instrument`)
 
 # Default values for habitats
 DEFAULTS = dict()
@@ -105,18 +74,156 @@ DEFAULTS['props'][LAGOON_ORANGE_LG] ={'w': 0.05, 's': 80, 'f': 2.56}
 DEFAULTS['props'][LAGOON_BLUE] = {'w': 1.0, 's': 10, 'f': 6.41}
 DEFAULTS['props'][LAGOON_GREEN] = {'w': 0.40, 's': 25, 'f': 11.53}
 
-DEFAULTS['rain'] = dict()
-DEFAULTS['rain'][0] = 20
-DEFAULTS['rain'][10] = 200
-DEFAULTS['rain'][20] = 600
-DEFAULTS['rain'][30] = 30
-DEFAULTS['rain'][40] = 0
-DEFAULTS['rain'][50] = 0
+DEFAULTS['rain'] = dict() # rainfall by unit of time (see `configure`)
+
+def default_layout():
+    """
+    The layout of the default habitats (see `layout`): four lagoons and three
+    human settlements
+    """
+    lagoons = (
+        (LAGOON_ORANGE_SM, LAGOON_TYPE_ORANGE),
+        (LAGOON_ORANGE_LG, LAGOON_TYPE_ORANGE),
+        (LAGOON_BLUE, LAGOON_TYPE_BLUE),
+        (LAGOON_GREEN, LAGOON_TYPE_GREEN)
+    )
+    specs = [dict(
+        id=_id, type=_type, label=LABELS[_id], color=COLORS[_id], filled=False, desc='',
+        verts=DEFAULTS['verts'][_id], props=dict(DEFAULTS['props'][_id]), rain=None
+    ) for _id, _type in lagoons]
+    specs += [dict(
+        id=HUMAN_SETTLEMENT, type=HUMAN_SETTLEMENT, label=LABELS[HUMAN_SETTLEMENT],
+        color=COLORS[HUMAN_SETTLEMENT], filled=True, desc='',
+        verts=DEFAULTS['verts'][HUMAN_SETTLEMENT + str(i)], props={}, rain=None
+    ) for i in (1, 2, 3)]
+    return specs
+
+
+def derive(cnf):
+    """
+    Derive the values used across the project from a loaded configuration
+
+    Parameters
+    ----------
+    cnf : dict
+        the application configuration, as loaded from `config.yml`
+
+    Returns
+    -------
+    values : dict
+        the derived values by name (e.g., 'THRESHOLD', 'CNF_AG', 'FNS')
+    """
+    app = cnf['app']
+    dirs = config.get_output_dirs(cnf)
+    agents = app['agents']
+    divisor = app['rain']['divisor']
+    return dict(
+        # Loaded configurations
+        CONFIG = cnf,
+
+        # Directories (paths): prepared by `config.prepare_output`
+        ROOT_DIR = dirs['root'],
+        OUT_DIR = dirs['out'],
+        SAMPLE_DIR = dirs['sample'],
+        GRAPH_DIR = dirs['graph'],
+
+        # Agents' configurations
+        CNF_AG = agents,
+        TOTAL_AGENT_TYPE = len(agents),
+        TOTAL_AGENTS = sum([ag_cnf['quantity'] for ag_cnf in agents]),
+        MAX_AGENT_QTY = max([ag_cnf['quantity'] for ag_cnf in agents]) + 1,
+        FNS = compile_fns(agents), # habitat-preference functions: { '5cm': { 'w': fn } }
+
+        # Habitats' layout: configured (list or GeoJSON/CSV file) or the default one
+        HABITATS = load_layout(app.get('habitats'), HUMAN_SETTLEMENT, COLORS) or default_layout(),
+
+        # Core elements: unique (used as key identifier)
+        PROCESSING_TIME = int(app['counter']), # time limit for the entire process
+        TIME_DIVISOR = divisor,
+        ENGINE = app.get('engine', 'vectorized'), # update engine: vectorized, reference
+        DISTANCE = app.get('distance', 'center'), # distance to settlements: center, edge, point
+        RENDER_WORKERS = int(app.get('render', {}).get('workers', 0)), # background rendering processes
+        RENDER_PNG = bool(app.get('render', {}).get('png', True)), # save snapshots as PNG images too
+        STATS_FORMAT = app.get('stats', {}).get('format', 'csv'), # output format: parquet, csv
+        STATS_CHUNK = int(app.get('stats', {}).get('chunk', 0)), # rows streamed at once (0: at the end)
+        ENSEMBLE_REPLICATES = int(app.get('ensemble', {}).get('replicates', 1)), # realisations per ensemble
+        ENSEMBLE_WORKERS = int(app.get('ensemble', {}).get('workers', 0)), # ensemble processes (0: all cores)
+        ENSEMBLE_SEED = app.get('ensemble', {}).get('seed'), # root seed of the ensemble (None: fresh entropy)
+        INSTRUMENT = bool(app.get('instrument', {}).get('enabled', False)), # per-phase timings and counters
+        INSTRUMENT_FILE = app.get('instrument', {}).get('file'), # JSONL report (None: next to the statistics)
+        CHECKPOINT_EVERY = int(app.get('checkpoint', {}).get('every', 0)), # units of time between checkpoints (0: none)
+        CHECKPOINT_FILE = app.get('checkpoint', {}).get('file'), # checkpoint (None: next to the statistics)
+        RASTER_RESOLUTION = int(app.get('raster', {}).get('resolution', 0)), # cells of the habitats' label grid (0: none)
+        RASTER_SAMPLE = bool(app.get('raster', {}).get('sample', False)), # draw candidate points from the grid
+
+        THRESHOLD = float(app['threshold']), # threshold to allow agents' movements driven by the probability
+
+        # rainfall every `TIME_DIVISOR` units of time: { 0: 20, 10: 200, ... }
+        RAIN = {i * divisor: value for i, value in enumerate(app['rain']['values'])}
+    )
+
+
+def settings(cnf):
+    """
+    Get the values derived from a configuration as a namespace, with the same
+    names as in this module (e.g., `settings(cnf).THRESHOLD`), without changing
+    the values of this module. See `simulation.Simulation`.
+    """
+    return SimpleNamespace(**derive(cnf))
+
+
+def configure(cnf):
+    """
+    Set the values derived from a loaded configuration. This is done with
+    `config.load_config()` the first time any of these values is used, and may
+    be done again with any other configuration (e.g., for a parameter sweep).
+
+    Parameters
+    ----------
+    cnf : dict
+        the application configuration, as loaded from `config.yml`
+
+    Notes
+    -----
+    The state of the process (`STORE`) is not affected; reset it before
+    running a process with the new values (see `core.reset`).
+    """
+    values = derive(cnf)
+    globals().update(values)
+    DEFAULTS['rain'] = values['RAIN']
+    for ag_cnf in values['CNF_AG']:
+        LABELS[ag_cnf['type']] = ag_cnf['label']
+    for spec in values['HABITATS']:
+        COLORS[spec['id']] = spec['color']
+        LABELS[spec['id']] = spec['label']
+
+
+def _ensure_configured():
+    if 'CONFIG' not in globals():
+        configure(config.load_config())
+
+
+def __getattr__(name):
+    # the values derived from the configuration are set on first use (PEP 562)
+    if name in _CONFIGURED:
+        _ensure_configured()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+_CONFIGURED = (
+    'CONFIG', 'CNF_AG', 'TOTAL_AGENT_TYPE', 'TOTAL_AGENTS', 'MAX_AGENT_QTY', 'FNS', 'HABITATS',
+    'PROCESSING_TIME', 'TIME_DIVISOR', 'ENGINE', 'DISTANCE', 'RENDER_WORKERS', 'RENDER_PNG',
+    'STATS_FORMAT', 'STATS_CHUNK', 'ENSEMBLE_REPLICATES', 'ENSEMBLE_WORKERS', 'ENSEMBLE_SEED',
+    'INSTRUMENT', 'INSTRUMENT_FILE', 'CHECKPOINT_EVERY', 'CHECKPOINT_FILE',
+    'RASTER_RESOLUTION', 'RASTER_SAMPLE',
+    'THRESHOLD', 'ROOT_DIR', 'OUT_DIR', 'SAMPLE_DIR', 'GRAPH_DIR', 'RAIN'
+)
 
 # helpers
 def get_agentp(_type, prop):
     """ Fetch the value of a specific property from the loaded configuration (of
     the agents' setup)"""
+    _ensure_configured()
     for ag_cnf in CNF_AG:
         if ag_cnf['type'] == _type:
             return ag_cnf[prop]
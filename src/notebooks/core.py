@@ -17,177 +17,338 @@
 
 # -*- coding: utf-8 -*-
 import os
-import uuid # hasher
-import pandas as pd # dataframe handling
-import copy as cp # copier
-import imageio as gm # gif maker
 import numpy as np # arithmetic computer
-import matplotlib.pyplot as plt # plotter
-import matplotlib.patches as Patches # artist
 from datetime import datetime # datetime handler
-from matplotlib.path import Path # designing field
 from functools import reduce # utils
 
 import constants as C
 from helpers import *
-from habitat import Habitat
-from agent import Agent
-
-def initialize():
+from habitat import Habitat, HabitatCollection
+from agent import Population, PopulationBatch
+from probability import ProbabilityTable
+from recorder import StatsRecorder, StatsWriter
+from occupancy import Occupancy
+from instrument import Probe, NULL_PROBE
+from checkpoint import Checkpoint
+
+def initialize(rng=None):
     """
-    TODO: docs
+    Create the habitats and the agents, and take the first snapshot
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator, default None
+        the source of randomness of the process. If not specified, use the
+        global state of `numpy.random`.
     """
     habitats = create_patches()
     print('==> {} habitats have been created successfully!'.format(len(habitats)))
-    agents = create_agents(habitats)
+    get_probability_table(habitats)
+    agents = create_agents(habitats, rng)
     print('==> {} agents have been created successfully!'.format(len(agents)))
 
     # initialize stats for first run
-    snapshots = {
-        C.LAGOON_ORANGE_SM: {},
-        C.LAGOON_ORANGE_LG: {},
-        C.LAGOON_BLUE: {},
-        C.LAGOON_GREEN: {}
-    }
-    for ag_cnf in C.CNF_AG:
-        for k in snapshots.keys():
-            snapshots[k][ag_cnf['type']] = 0
-
-    for agent in agents:
-        point = agent.get_point()
-        habitat = which_habitat(point, habitats)
-        snapshots[habitat.id][agent.type] += 1
-
-    C.STORE['env'].append(snapshots)
+    get_recorder(habitats, agents)
+    get_occupancy(habitats, agents).record()
     print('--- snapshot for time {}'.format(1))
     print('--- updating agents will start processing...')
     return habitats, agents
 
 
-def create_patches():
-    habitats = []
-    verts, props = C.DEFAULTS['verts'], C.DEFAULTS['props']
-
-    # prepare static patches (habitats and human settlements)
-    orange_sm = Habitat(C.LAGOON_ORANGE_SM, C.LAGOON_TYPE_ORANGE, C.COLORS[C.LAGOON_ORANGE_SM])
-    orange_sm.verts = verts[C.LAGOON_ORANGE_SM]
-    orange_sm.props = props[C.LAGOON_ORANGE_SM]
-    orange_sm.label = C.LABELS[C.LAGOON_ORANGE_SM]
-    orange_sm.build()
-    habitats.append(orange_sm)
-
-    orange_lg = Habitat(C.LAGOON_ORANGE_LG, C.LAGOON_TYPE_ORANGE, C.COLORS[C.LAGOON_ORANGE_LG])
-    orange_lg.verts = verts[C.LAGOON_ORANGE_LG]
-    orange_lg.props = props[C.LAGOON_ORANGE_LG]
-    orange_lg.label = C.LABELS[C.LAGOON_ORANGE_LG]
-    orange_lg.build()
-    habitats.append(orange_lg)
-
-    blue = Habitat(C.LAGOON_BLUE, C.LAGOON_TYPE_BLUE, C.COLORS[C.LAGOON_BLUE])
-    blue.verts = verts[C.LAGOON_BLUE]
-    blue.props = props[C.LAGOON_BLUE]
-    blue.label = C.LABELS[C.LAGOON_BLUE]
-    blue.build()
-    habitats.append(blue)
-
-    green = Habitat(C.LAGOON_GREEN, C.LAGOON_TYPE_GREEN, C.COLORS[C.LAGOON_GREEN])
-    green.verts = verts[C.LAGOON_GREEN]
-    green.props = props[C.LAGOON_GREEN]
-    green.label = C.LABELS[C.LAGOON_GREEN]
-    green.build()
-    habitats.append(green)
-
-    human1 = Habitat(C.HUMAN_SETTLEMENT, C.HUMAN_SETTLEMENT, C.COLORS[C.HUMAN_SETTLEMENT])
-    human1.verts = verts[C.HUMAN_SETTLEMENT+'1']
-    human1.label = C.LABELS[C.HUMAN_SETTLEMENT]
-    human1.build(fill=True)
-    habitats.append(human1)
-
-    human2 = Habitat(C.HUMAN_SETTLEMENT, C.HUMAN_SETTLEMENT, C.COLORS[C.HUMAN_SETTLEMENT])
-    human2.verts = verts[C.HUMAN_SETTLEMENT+'2']
-    human2.label = C.LABELS[C.HUMAN_SETTLEMENT]
-    human2.build(fill=True)
-    habitats.append(human2)
-
-    human3 = Habitat(C.HUMAN_SETTLEMENT, C.HUMAN_SETTLEMENT, C.COLORS[C.HUMAN_SETTLEMENT])
-    human3.verts = verts[C.HUMAN_SETTLEMENT+'3']
-    human3.label = C.LABELS[C.HUMAN_SETTLEMENT]
-    human3.build(fill=True)
-    habitats.append(human3)
+def create_patches(settings=None):
+    """
+    Create the habitats (lagoons and human settlements) of the layout, as
+    configured (see `layout.load_layout`)
+
+    Parameters
+    ----------
+    settings : namespace, default None
+        the values derived from a configuration (see `constants.settings`). If
+        not specified, use the values of `constants`.
+
+    Returns
+    -------
+    habitats : HabitatCollection
+        the habitats, in the order of the layout
+    """
+    settings = C if settings is None else settings
+    habitats = HabitatCollection(settlement=C.HUMAN_SETTLEMENT)
+
+    for spec in settings.HABITATS:
+        habitat = Habitat(spec['id'], spec['type'], spec['color'])
+        habitat.verts = spec['verts']
+        habitat.props = dict(spec['props']) # copied: changes over time
+        habitat.label = spec['label']
+        habitat.desc = spec['desc']
+        habitat.rain = compile_fn(spec['rain']) if spec['rain'] else None
+        habitat.build(fill=spec['filled'])
+        habitats.append(habitat)
     return habitats
 
 
-def create_agents(habitats):
-    agents = []
+def restrict_habitats(habitats, hab_types, first_only=False):
+    """
+    Select the habitats an agent is allowed to use
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        all the created habitats
+    hab_types : list
+        the types of habitats (e.g., [1, 2]) allowed for a category of agents
+    first_only : bool, default False
+        If True, only the first habitat of each type is selected, which is how
+        the destinations of the moving agents are restricted.
+
+    Returns
+    -------
+    restricted_habs : list of Habitat
+        the habitats that can be used
+    """
+    restricted_habs = []
+    for _type in hab_types:
+        for hab in habitats:
+            if hab.type == _type:
+                restricted_habs.append(hab)
+                if first_only:
+                    break
+    return restricted_habs
+
 
-    for ag_cnf in C.CNF_AG:
-        restricted_habs = []
+def create_agents(habitats, rng=None, settings=None):
+    """
+    Create the population of agents within their allowed habitats
+
+    Parameters
+    ----------
+    habitats : HabitatCollection
+        all the created habitats
+    rng : numpy.random.Generator, default None
+        the source of randomness. If not specified, use `numpy.random`.
+    settings : namespace, default None
+        the values derived from the configuration (see `constants.settings`).
+        If not specified, use the ones of the `constants` module.
+
+    Returns
+    -------
+    agents : Population
+        the agents, named after their category (e.g., 1-30cm)
+    """
+    settings = C if settings is None else settings
+    types = [ag_cnf['type'] for ag_cnf in settings.CNF_AG]
+    colors = [ag_cnf['color'] for ag_cnf in settings.CNF_AG]
+    agents = Population(types, colors)
+    resolution = settings.RASTER_RESOLUTION if settings.RASTER_SAMPLE else 0
+
+    for ag_cnf in settings.CNF_AG:
+        restricted_habs = restrict_habitats(habitats, ag_cnf['habs'])
+        sampler = get_sampler(restricted_habs, resolution)
+        points, hab_index = sampler.sample(ag_cnf['quantity'], rng, return_index=True)
+        hab_index = np.array([habitats.index(h) for h in restricted_habs])[hab_index]
+        agents.add(ag_cnf['type'], points, hab_index)
+    return agents
 
-        for _type in ag_cnf['habs']:
-            for hab in habitats:
-                if _type == hab.type:
-                    restricted_habs.append(hab)
 
-        for i in range(ag_cnf['quantity']):
-            x, y = gen_rand_point(restricted_habs, 'in')
-            ag = Agent(ag_cnf['type'], x, y)
-            ag.name = '{}-{}'.format(i + 1, ag_cnf['type']) # name: 1-30cm
-            ag.color = ag_cnf['color']
-            agents.append(ag)
+def create_agents_batch(habitats, rngs, settings=None):
+    """
+    Create independent replicates of the population of agents at once
+
+    Parameters
+    ----------
+    habitats : HabitatCollection
+        all the created habitats
+    rngs : list of numpy.random.Generator
+        the source of randomness of every replicate
+    settings : namespace, default None
+        the values derived from the configuration (see `constants.settings`).
+        If not specified, use the ones of the `constants` module.
+
+    Returns
+    -------
+    agents : PopulationBatch
+        the agents of every replicate
+
+    Notes
+    -----
+    Every replicate draws from its own generator exactly as `create_agents`
+    does, so a replicate is the same as the population created by
+    `create_agents` with the same generator.
+    """
+    settings = C if settings is None else settings
+    types = [ag_cnf['type'] for ag_cnf in settings.CNF_AG]
+    agents = PopulationBatch(types, len(rngs))
+
+    for ag_cnf in settings.CNF_AG:
+        restricted_habs = restrict_habitats(habitats, ag_cnf['habs'])
+        n = ag_cnf['quantity']
+        u = np.stack([rng.random((n, 3)) for rng in rngs]).reshape(-1, 3)
+        points, hab_index = get_sampler(restricted_habs).transform(u)
+        hab_index = np.array([habitats.index(h) for h in restricted_habs])[hab_index]
+        agents.add(ag_cnf['type'], points.reshape(-1, n, 2), hab_index.reshape(-1, n))
     return agents
 
 
-def observe(habitats, agents, counter=0):
+def get_probability_table(habitats):
     """
-    Create and plot figure
-    TODO: docs
+    Get the probability table of the given habitats, up to date with the current
+    environment epoch. The table is built once per set of habitats and only
+    recomputed when the environment changes.
+
+    Returns
+    -------
+    table : ProbabilityTable
+        the cached probabilities of habitat use by agent's type and habitat
     """
-    plt.cla()
-    plt.rcParams['lines.linewidth'] = 1
-    plt.rcParams['lines.markersize'] = 3
-    plt.rcParams['legend.fontsize'] = 10
-    fig = plt.figure(1)
-    ax  = fig.add_subplot(111)
-    leg_handlers = []
+    table = C.STORE['probs']
+    if table is None or table.habitats is not habitats:
+        table = ProbabilityTable(habitats, C.FNS, C.DISTANCE)
+        C.STORE['probs'] = table
+    return table.refresh(C.STORE['epoch'])
 
-    # artists to display (with indicator)
-    for h in habitats:
-        ax.add_patch( cp.copy(h.artist) )
-
-    # group by agent's type: { '5cm': [...agents] }
-    grouped_agents = dict()
-    for ag in agents:
-        if ag.type in grouped_agents:
-            grouped_agents[ag.type].append(ag)
-        else:
-            grouped_agents[ag.type] = [ag]
-
-    for _type, g_ags in grouped_agents.items():
-        points = [ag.get_point() for ag in g_ags] # get all points: [(x1, y1), (x2, y2), ...]
-        x, y = list(zip(*points)) # unzip them: [(x1, x2, ...), (y1, y2, ...)]
-        c = C.get_agentp(_type, 'color')
-        l = C.get_agentp(_type, 'label')
-        leg_handle, = ax.plot(x, y, 'o', mec=c,mfc=c, label=l)
-        leg_handlers.append(leg_handle)
-
-    # legends for the plot through handlers
-    handler_artists = [h.artist for h in habitats[1:5]] # hard-coded order
-    handler_artists.extend(leg_handlers)
-
-    # additional settings for the plot
-    ax.get_xaxis().set_visible(False)
-    ax.get_yaxis().set_visible(False)
-    plt.legend(handles=handler_artists, loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0.)
-    plt.xlabel('Time ' + str(counter + 1))
-    plt.title('Snapshot in time ' + str(counter + 1), fontsize=12) # Identify which image is plotted
-
-    image_path = os.path.join(C.SAMPLE_DIR, str(counter + 1) + '.png')
-    plt.savefig(image_path, bbox_inches='tight', pad_inches=0.1)
-    plt.close(fig)
-    # END: observe
-
-
-def update_one(habitats, agent, time):
+
+def get_recorder(habitats, agents):
+    """
+    Get the recorder of the agents' statistics, created once for the given
+    habitats and agents with room for every unit of time of the process. If
+    streaming is enabled (`app.stats.chunk`), the recorder only holds one chunk
+    of rows at a time and flushes it to a background writer.
+
+    Returns
+    -------
+    recorder : StatsRecorder
+        the columnar store of the statistics
+    """
+    recorder = C.STORE['stats']
+    if recorder is None or len(recorder.agent_names) != len(agents) \
+            or len(recorder.hab_names) != len(habitats):
+        capacity, writer = len(agents) * max(C.PROCESSING_TIME - 1, 1), None
+        if C.STATS_CHUNK > 0:
+            datenow = datetime.now().strftime("%Y%m%d_%H%M%S")
+            capacity = C.STATS_CHUNK
+            writer = StatsWriter(os.path.join(C.GRAPH_DIR, datenow), C.STATS_FORMAT)
+        recorder = StatsRecorder(
+            capacity, agents.names(),
+            [h.id for h in habitats], [h.type for h in habitats], writer
+        )
+        C.STORE['stats'] = recorder
+    return recorder
+
+
+def get_occupancy(habitats, agents):
+    """
+    Get the counts of the agents of each category dwelling in each habitat. The
+    agents are counted once, when the counter is created; the counts are then
+    kept up to date by the update engines as the agents move, and recorded
+    once per unit of time.
+
+    Returns
+    -------
+    occupancy : Occupancy
+        the occupancy counter, indexed by habitat and agent's type
+    """
+    occupancy = C.STORE['occupancy']
+    if occupancy is None or len(occupancy.hab_names) != len(habitats):
+        occupancy = Occupancy(
+            [h.id for h in habitats], agents.types,
+            [h.type for h in habitats], C.PROCESSING_TIME
+        )
+        occupancy.reset(agents.habs, agents.codes)
+        C.STORE['occupancy'] = occupancy
+    return occupancy
+
+
+def get_probe():
+    """
+    Get the probe timing the phases of the process, if the instrumentation is
+    enabled (`app.instrument.enabled`). Its report is written next to the
+    statistics, unless a file is set (`app.instrument.file`).
+
+    Returns
+    -------
+    probe : Probe, NullProbe
+        the probe of the process, or one doing nothing if disabled
+    """
+    probe = C.STORE['probe']
+    if probe is None:
+        probe = NULL_PROBE
+        if C.INSTRUMENT:
+            datenow = datetime.now().strftime("%Y%m%d_%H%M%S")
+            probe = Probe(C.INSTRUMENT_FILE or os.path.join(C.GRAPH_DIR, datenow + '_timings.jsonl'))
+        C.STORE['probe'] = probe
+    return probe
+
+
+def get_checkpoint_file():
+    """ Get the checkpoint file of the process (`app.checkpoint.file`) """
+    return C.CHECKPOINT_FILE or os.path.join(C.GRAPH_DIR, 'checkpoint.npz')
+
+
+def save_checkpoint(habitats, agents, time, filename=None, rng=None):
+    """
+    Save the state of the process at the end of a unit of time, to resume from
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        all the created habitats
+    agents : Population
+        the agents
+    time : int
+        the last completed unit of time
+    filename : string, default None
+        the target file. If not specified, use `get_checkpoint_file`.
+    rng : numpy.random.Generator, default None
+        the source of randomness of the process. If not specified, the global
+        state of `numpy.random`.
+
+    Returns
+    -------
+    filename : string
+        the saved checkpoint (see `Checkpoint`)
+    """
+    checkpoint = Checkpoint.capture(
+        time, habitats, agents, get_occupancy(habitats, agents),
+        get_recorder(habitats, agents), rng, C.STORE['epoch'], C.CONFIG
+    )
+    return checkpoint.save(filename or get_checkpoint_file())
+
+
+def resume(filename=None):
+    """
+    Restore the process saved by `save_checkpoint`, instead of creating a new
+    one with `initialize`. The configuration of the process is restored too.
+
+    Returns
+    -------
+    habitats : HabitatCollection
+        the habitats, with their properties at that time
+    agents : Population
+        the agents
+    time : int
+        the last completed unit of time
+    rng : numpy.random.Generator, None
+        the source of randomness, or None if the process used the global state
+        of `numpy.random` (then restored)
+    """
+    filename = filename or get_checkpoint_file()
+    checkpoint = Checkpoint.load(filename)
+    C.configure(checkpoint.config)
+    reset()
+    rng = checkpoint.rng()
+    habitats = checkpoint.restore_habitats(create_patches())
+    C.STORE['epoch'] = checkpoint.epoch
+    get_probability_table(habitats)
+    agents = checkpoint.population([ag_cnf['color'] for ag_cnf in C.CNF_AG])
+
+    hab_names, hab_types = [h.id for h in habitats], [h.type for h in habitats]
+    capacity = C.STATS_CHUNK if C.STATS_CHUNK > 0 else len(agents) * max(C.PROCESSING_TIME - 1, 1)
+    C.STORE['stats'] = checkpoint.recorder(capacity, agents.names(), hab_names, hab_types)
+    C.STORE['occupancy'] = checkpoint.occupancy(hab_types, C.PROCESSING_TIME)
+    print('==> process resumed at time {} from <{}>'.format(checkpoint.time + 1, filename))
+    return habitats, agents, checkpoint.time, rng
+
+
+def update_one(habitats, agent, time, rng=None, settings=None, probe=None):
     """ Update agent in one unit of time
     Algorithm for simulating random movements
     - given a randomly-selected agent
@@ -200,44 +361,47 @@ def update_one(habitats, agent, time):
     s: salinity of the current habitat
     f: food availability in the current habitat
     """
-    human_settlements = [h for h in habitats if h.id == C.HUMAN_SETTLEMENT]
+    settings = C if settings is None else settings
+    probe = get_probe() if probe is None else probe
     prob = 0.0
 
-    for ag_cnf in C.CNF_AG: # for each category of agent (e.g., 15cm legged)
+    for ag_cnf in settings.CNF_AG: # for each category of agent (e.g., 15cm legged)
         # this agent can use certain areas only
-        restricted_habs = []
-        for _type in ag_cnf['habs']:
-            for hab in habitats:
-                if hab.type == _type:
-                    restricted_habs.append(hab) # are these limited areas
-                    break
+        restricted_habs = restrict_habitats(habitats, ag_cnf['habs'], first_only=True)
 
         # do's and dont's specific to this agent
         if agent.type == ag_cnf['type']:
-            point = gen_rand_point(restricted_habs, 'in')
-            habitat = which_habitat(point, restricted_habs)
-            _d = compute_dist(habitat, human_settlements)
-            min_index = _d.index( min(_d) ) # consider minimal distance
+            with probe.phase('sampling'):
+                point = gen_rand_point(restricted_habs, 'in', rng, probe)
+            with probe.phase('lookup'):
+                habitat = which_habitat(point, restricted_habs, settings.RASTER_RESOLUTION)
+                if settings.DISTANCE == 'point': # from the destination itself
+                    _d = list(habitats.point_settlement_distances([point])[0])
+                else:
+                    _d = list(habitats.settlement_distances(settings.DISTANCE)[habitats.index(habitat)])
+                min_index = _d.index( min(_d) ) # consider minimal distance
 
             # specific characteristics of the selected habitat
             d = _d[min_index] # distance to human settlement
-            w, s, f = habitat.props.values() # water depth, salinity, food availability
+            w, s, f = (habitat.props[penv] for penv in ('w', 's', 'f')) # water depth, salinity, food availability
 
             # this agent knows a specific way to compute certain operations
-            meta_fns = C.get_agentp(agent.type, 'fns')
-            probs = { 'w': 0, 's': 0, 'f': 0, 'd': 0 } # track probabilities
-            for meta_fn in meta_fns:
-                penv = meta_fn['penv'] # which spec: w, s, f, d
-                if penv == 'w': probs['w'] = eval_fn(meta_fn, w)
-                elif penv == 's': probs['s'] = eval_fn(meta_fn, s)
-                elif penv == 'f': probs['f'] = eval_fn(meta_fn, f)
-                else: probs['d'] = eval_fn(meta_fn, d)
-
-            # compute the overall probability of moving to this habitat
-            prob = reduce(lambda acc, val: acc * val, probs.values())
-
-        if prob > C.THRESHOLD:
-            agent.set_point(point)
+            with probe.phase('probability'):
+                meta_fns = ag_cnf['fns']
+                probs = { 'w': 0, 's': 0, 'f': 0, 'd': 0 } # track probabilities
+                for meta_fn in meta_fns:
+                    penv = meta_fn['penv'] # which spec: w, s, f, d
+                    if penv == 'w': probs['w'] = eval_fn(meta_fn, w)
+                    elif penv == 's': probs['s'] = eval_fn(meta_fn, s)
+                    elif penv == 'f': probs['f'] = eval_fn(meta_fn, f)
+                    else: probs['d'] = eval_fn(meta_fn, d)
+
+                # compute the overall probability of moving to this habitat
+                prob = reduce(lambda acc, val: acc * val, probs.values())
+
+        if prob > settings.THRESHOLD:
+            with probe.phase('acceptance'):
+                agent.set_point(point)
 
     stats = {
         'processing_unit': time,
@@ -253,61 +417,296 @@ def update_one(habitats, agent, time):
         'prob_overall': prob,
         'prob_water': probs['w'],
         'prob_salinity': probs['s'],
-        'prob_food': probs['s'],
+        'prob_food': probs['f'],
         'prob_distance': probs['d'],
-        'has_moved': prob > C.THRESHOLD
+        'has_moved': prob > settings.THRESHOLD
     }
     return agent, habitat, stats
     # END: update
 
 
-def update(habitats, agents, time):
+def update_vectorized(habitats, agents, time, recorder, occupancy, rng=None, table=None, settings=None, probe=None):
+    """
+    Update the whole population of agents in one unit of time at once
+
+    Same algorithm as `update_one`, but every stage operates on arrays holding
+    all the agents of a category instead of one agent at a time:
+    - draw a batch of candidate destinations within the allowed habitats, along
+      with the habitat of each candidate point (from their label grid, if
+      enabled: `app.raster`)
+    - look up the probabilities of habitat use for all the candidates
+    - move the agents whose overall probability exceeds the threshold
+    - account for the moves in the occupancy counts
+
+    The probabilities are read from the table of the current environment epoch
+    (see `get_probability_table`) instead of being evaluated for every agent.
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        all the created habitats
+    agents : Population
+        the agents to update
+    time : int
+        the current processing unit
+    recorder : StatsRecorder
+        the store of the tracked data
+    occupancy : Occupancy
+        the counts of agents by habitat and type, updated on every move
+    rng : numpy.random.Generator, default None
+        the source of randomness. If not specified, use `numpy.random`.
+    table : ProbabilityTable, default None
+        the probabilities of habitat use, up to date with the environment. If
+        not specified, use `get_probability_table`.
+    settings : namespace, default None
+        the values derived from the configuration (see `constants.settings`).
+        If not specified, use the ones of the `constants` module.
+    probe : Probe, default None
+        the timers of the phases (see `instrument`). If not specified, use
+        `get_probe`.
+
+    Returns
+    -------
+    agents : Population
+        the updated agents
+    """
+    settings = C if settings is None else settings
+    table = get_probability_table(habitats) if table is None else table
+    probe = get_probe() if probe is None else probe
+    resolution = settings.RASTER_RESOLUTION if settings.RASTER_SAMPLE else 0
+
+    for k, ag_cnf in enumerate(settings.CNF_AG): # for each category of agent (e.g., 15cm legged)
+        indices = agents.indices(ag_cnf['type'])
+        n = len(indices)
+        if n == 0:
+            continue
+
+        # batched candidate points and their habitats
+        restricted_habs = restrict_habitats(habitats, ag_cnf['habs'], first_only=True)
+        with probe.phase('sampling'):
+            points, hab_index = get_sampler(restricted_habs, resolution).sample(n, rng, return_index=True)
+        with probe.phase('lookup'):
+            hab_index = np.array([habitats.index(h) for h in restricted_habs])[hab_index]
+
+        # specific characteristics of the selected habitats:
+        # w: water depth, s: salinity, f: food, d: distance to human settlement
+        with probe.phase('probability'):
+            env, probs, prob = table.lookup(k, hab_index, points) # probabilities of moving
+
+        # masked position update
+        with probe.phase('acceptance'):
+            moved = prob > settings.THRESHOLD
+            movers = indices[moved]
+        with probe.phase('counting'):
+            occupancy.move(agents.codes[movers], agents.habs[movers], hab_index[moved])
+        with probe.phase('acceptance'):
+            agents.set_points(movers, points[moved])
+            agents.habs[movers] = hab_index[moved]
+        probe.count('moves_accepted', len(movers))
+        probe.count('moves_rejected', n - len(movers))
+
+        with probe.phase('recording'):
+            recorder.record_batch(
+                time, agents.ids[indices], agents.x[indices], agents.y[indices],
+                hab_index, env, probs, prob, moved
+            ) # data tracking
+
+    return agents
+
+
+def update_batched(habitats, agents, time, rngs, counts, table=None, settings=None):
+    """
+    Update independent replicates of the agents in one unit of time at once
+
+    Same algorithm as `update_vectorized`, with a leading replicate dimension:
+    every replicate draws its candidate destinations from its own generator,
+    then all the replicates are updated by the same array operations.
+
+    Parameters
+    ----------
+    habitats : HabitatCollection
+        all the created habitats, shared by the replicates
+    agents : PopulationBatch
+        the agents of every replicate
+    time : int
+        the current processing unit
+    rngs : list of numpy.random.Generator
+        the source of randomness of every replicate
+    counts : ndarray of int64, shape (r, n_habitats, n_types)
+        the occupancy counts of every replicate, updated on every move
+    table : ProbabilityTable, default None
+        the probabilities of habitat use, up to date with the environment. If
+        not specified, use `get_probability_table`.
+    settings : namespace, default None
+        the values derived from the configuration (see `constants.settings`).
+        If not specified, use the ones of the `constants` module.
+
+    Returns
+    -------
+    agents : PopulationBatch
+        the updated agents
+    moves : ndarray of int64, shape (r, n_types)
+        the number of agents of each type that moved, by replicate
+    prob : ndarray of float64, shape (r, n_types)
+        the mean overall probability of habitat use by type, by replicate
+
+    Notes
+    -----
+    A replicate draws the same random numbers as `update_vectorized` would with
+    the same generator, so the results do not depend on the batching.
+    """
+    settings = C if settings is None else settings
+    table = get_probability_table(habitats) if table is None else table
+    R, (H, K) = agents.replicates, counts.shape[1:]
+    moves = np.zeros((R, K), dtype=np.int64)
+    prob = np.zeros((R, K))
+
+    # one draw per replicate for all the agents, categories being contiguous
+    u = np.stack([rng.random((len(agents), 3)) for rng in rngs])
+
+    for k, ag_cnf in enumerate(settings.CNF_AG): # for each category of agent (e.g., 15cm legged)
+        indices = agents.indices(ag_cnf['type'])
+        n = len(indices)
+        if n == 0:
+            continue
+
+        # batched candidate points and their habitats, for every replicate
+        restricted_habs = restrict_habitats(habitats, ag_cnf['habs'], first_only=True)
+        points, hab_index = get_sampler(restricted_habs).transform(u[:, indices].reshape(-1, 3))
+        hab_index = np.array([habitats.index(h) for h in restricted_habs])[hab_index]
+        _, _, p = table.lookup(k, hab_index, points) # probabilities of moving
+        p = p.reshape(R, n)
+
+        # masked position update
+        moved = p > settings.THRESHOLD
+        rows, cols = np.nonzero(moved)
+        old, new = agents.habs[rows, indices[cols]], hab_index.reshape(R, n)[moved]
+        size = R * H * K
+        counts -= np.bincount((rows * H + old) * K + k, minlength=size).reshape(R, H, K)
+        counts += np.bincount((rows * H + new) * K + k, minlength=size).reshape(R, H, K)
+        agents.points[rows, indices[cols]] = points.reshape(R, n, 2)[moved]
+        agents.habs[rows, indices[cols]] = new
+
+        moves[:, k] = moved.sum(axis=1)
+        prob[:, k] = p.mean(axis=1)
+
+    return agents, moves, prob
+
+
+def update_reference(habitats, agents, time, recorder, occupancy, rng=None, table=None, settings=None, probe=None):
+    """
+    Update the agents one at a time, in random order, through `update_one`.
+
+    This is the reference engine that `update_vectorized` reproduces. The
+    probabilities are evaluated for every agent, hence no `table` is used.
+
+    Returns
+    -------
+    agents : Population
+        the updated agents
+    """
+    # randomly choose the order in which agents update their status
+    rng = np.random if rng is None else rng
+    probe = get_probe() if probe is None else probe
+    for index in rng.permutation(len(agents)):
+        _, habitat, stats = update_one(habitats, agents[index], time, rng, settings, probe)
+        with probe.phase('recording'):
+            recorder.record(**stats) # data tracking
+        if stats['has_moved']:
+            with probe.phase('counting'):
+                hab = habitats.index(habitat)
+                occupancy.move([agents.codes[index]], [agents.habs[index]], [hab])
+                agents.habs[index] = hab
+        probe.count('moves_accepted' if stats['has_moved'] else 'moves_rejected')
+
+    return agents
+
+
+ENGINES = {
+    'vectorized': update_vectorized,
+    'reference': update_reference
+}
+
+
+def update(habitats, agents, time, engine=None, rng=None):
     """
     This update signifies that, at a time t, some changes should apply to every
     and each single agent of the system.
 
-    TODO: proper docs
+    Parameters
+    ----------
+    habitats : list of Habitat
+        all the created habitats
+    agents : Population
+        the agents to update
+    time : int
+        the current processing unit
+    engine : string = {'vectorized', 'reference'}, default None
+        the update engine to use. If not specified, use the engine set in the
+        configuration (`app.engine`).
+    rng : numpy.random.Generator, default None
+        the source of randomness. If not specified, use `numpy.random`.
+
+    Returns
+    -------
+    agents : Population
+        the updated agents
     """
-    updated_agents = [] # temporary for the new agents' positions
-
-    snapshots = {
-        C.LAGOON_ORANGE_SM: {},
-        C.LAGOON_ORANGE_LG: {},
-        C.LAGOON_BLUE: {},
-        C.LAGOON_GREEN: {}
-    }
-    for ag_cnf in C.CNF_AG:
-        for k in snapshots.keys():
-            snapshots[k][ag_cnf['type']] = 0
-
-    if time % C.TIME_DIVISOR == 0: # every t time steps, change the environment
-        rainfall = C.DEFAULTS['rain'].get(time, 0)
-        for h in habitats:
-            update_habitat_water_depth(h, rainfall)
-
-    while len(agents) > 0:
-        # randomly choose an agent to update its status,
-        agent = agents[ np.random.randint( len(agents) ) ]
-        updated_agent, habitat, stats = update_one(habitats, cp.copy(agent), time)
-        updated_agents.append( updated_agent )
-        agents.remove(agent)
-        for k, v in stats.items(): C.STORE['stats'][k].append(v) # data tracking
-
-    for agent in updated_agents:
-        habitat = which_habitat(agent.get_point(), habitats)
-        snapshots[habitat.id][agent.type] += 1
-
-    C.STORE['env'].append(snapshots)
+    engine = engine or C.ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f'unknown engine <{engine}>. Use one of {list(ENGINES)}')
+
+    probe = get_probe()
+    with probe.phase('environment'):
+        if update_environment(habitats, time):
+            C.STORE['epoch'] += 1 # invalidates the cached probabilities of habitat use
+    recorder = get_recorder(habitats, agents)
+    occupancy = get_occupancy(habitats, agents)
+    updated_agents = ENGINES[engine](habitats, agents, time, recorder, occupancy, rng, probe=probe)
+
+    with probe.phase('counting'):
+        occupancy.record()
+    if recorder.writer is not None:
+        probe.progress('bytes_written', recorder.writer.nbytes)
     print('--- snapshot for time {}'.format(time + 1))
     return updated_agents
 
 
+def update_environment(habitats, time, settings=None):
+    """
+    Change the environment every `TIME_DIVISOR` units of time, according to the
+    rainfall at that time
+
+    Returns
+    -------
+    changed : bool
+        whether the environment changed, which starts a new environment epoch
+        (see `ProbabilityTable.refresh`)
+    """
+    settings = C if settings is None else settings
+    if time % settings.TIME_DIVISOR != 0: # every t time steps, change the environment
+        return False
+    rainfall = settings.RAIN.get(time, 0)
+    for h in habitats:
+        update_habitat_water_depth(h, rainfall)
+    return True
+
+
 def update_habitat_water_depth(h: Habitat, x=0):
     """
-    Simulate change in habitat's characteristics (water depth) over time
-    TODO: docs
+    Simulate change in habitat's characteristics (water depth) over time.
+
+    Parameters
+    ----------
+    h : Habitat
+        the habitat, whose water depth follows its configured function of the
+        rainfall (`rain`), or else the one of the default lagoon of the same id
+    x : float, default 0
+        the rainfall
     """
-    if h.id == C.LAGOON_ORANGE_SM:
+    if h.rain is not None:
+        h.props['w'] = float(h.rain(x))
+    elif h.id == C.LAGOON_ORANGE_SM:
         h.props['w'] = -0.00002*x**2 + 0.064*x + 10.034
     elif h.id == C.LAGOON_ORANGE_LG:
         h.props['w'] = -0.0001*x**2 + 0.0987*x + 6.1176
@@ -318,130 +717,14 @@ def update_habitat_water_depth(h: Habitat, x=0):
 
 
 
-def make_gif(gifname='image.gif', dirname=C.SAMPLE_DIR, storage=[]):
-    """
-    Store or dump all generated png images on disk
-
-    TODO: proper docs
-    """
-    IMG_EXT = '.png'
-    filename = os.path.join(dirname, gifname)
-    if len(storage) == 0:
-        imgnames = [f for f in os.listdir(dirname) if f.lower().endswith(IMG_EXT)]
-        sorted_imgnames = sort_imgnames(imgnames, IMG_EXT)
-        for imgname in sorted_imgnames:
-            image = gm.imread(os.path.join(dirname, imgname))
-            storage.append(image)
-    gm.mimsave(filename, storage)
-    print(f'=> Combined snapshots are saved as GIF at <{filename}>')
-
-
-def sort_imgnames(imgnames, ext='.png', reverse=False):
-    names = list(map(int, [p.split(ext)[0] for p in imgnames]))# convert to integers
-    names.sort(reverse=reverse) # proper sorting for integers
-    return list(map(lambda n: str(n) + ext, names)) # restore names
-
-
-def plot_figure():
-    """Plot a summary of the distribution of the agents within the habitats."""
-    plt.rcParams['axes.grid'] = True
-    plt.rcParams['grid.alpha'] = 0.5
-    plt.rcParams['figure.titlesize'] = 12
-    plt.rcParams['font.size'] = 12
-    plt.rcParams['lines.linewidth'] = 1
-    plt.rcParams['lines.markersize'] = 3
-
-    grouped_agents = dict()
-    for ag_cnf in C.CNF_AG:
-        grouped_agents[ag_cnf['type']] = dict()
-
-    for regions in C.STORE['env']: # snapshot
-        for region_key in regions.keys(): # area key: 'orange-sm'
-            for grouped_key in grouped_agents: # by agent key: '15cm'
-                if region_key not in grouped_agents[grouped_key]:
-                    grouped_agents[grouped_key][region_key] = [] # make sure key exist
-                # final thread: { '15cm': { 'orange-sm': [4, ...] } } ::
-                # of this agent in region for each time t processing
-                grouped_agents[grouped_key][region_key].append(regions[region_key][grouped_key])
-
-    plt.cla()
-    plt.clf()
-    fig = plt.figure(2, figsize=(11, 6.5))
-    t = np.arange(C.PROCESSING_TIME)
-    xlim = [0, C.PROCESSING_TIME]
-    ylim = [0, C.MAX_AGENT_QTY]
-    handlers = []
-
-    panel_A = fig.add_subplot(2,2,1)
-    panel_A.set_xlim(xlim)
-    panel_A.set_ylim(ylim)
-    panel_A.tick_params(axis='y', colors='orange')
-    panel_A.set_xlabel('Times')
-    panel_A.set_ylabel('Waterbirds', color='orange')
-    panel_A.set_title('Distribution in Habitat 1 (Large Lagoon)', fontsize=13)
-
-    panel_B = fig.add_subplot(2,2,2)
-    panel_B.set_xlim(xlim)
-    panel_B.set_ylim(ylim)
-    panel_B.tick_params(axis='y', colors='orange')
-    panel_B.set_xlabel('Times')
-    panel_B.set_ylabel('Waterbirds', color='orange')
-    panel_B.set_title('Distribution in Habitat 1 (Small Lagoon)', fontsize=13)
-
-    panel_C = fig.add_subplot(2,2,3)
-    panel_C.set_xlim(xlim)
-    panel_C.set_ylim(ylim)
-    panel_C.tick_params(axis='y', colors='blue')
-    panel_C.set_xlabel('Times')
-    panel_C.set_ylabel('Waterbirds', color='blue')
-    panel_C.set_title('Distribution in Habitat 2 (Blue Lagoon)', fontsize=13)
-
-    panel_D = fig.add_subplot(2,2,4)
-    panel_D.set_xlim(xlim)
-    panel_D.set_ylim(ylim)
-    panel_D.tick_params(axis='y', colors='green')
-    panel_D.set_xlabel('Times')
-    panel_D.set_ylabel('Waterbirds', color='green')
-    panel_D.set_title('Distribution in Habitat 3 (Green Lagoon)', fontsize=13)
-
-    for gk in grouped_agents.keys():
-        color = C.get_agentp(gk, 'color')
-        label = C.get_agentp(gk, 'label')
-        panel_A.plot(t, grouped_agents[gk][C.LAGOON_ORANGE_LG], '-o', color=color)
-        panel_B.plot(t, grouped_agents[gk][C.LAGOON_ORANGE_SM], '-o', color=color)
-        panel_C.plot(t, grouped_agents[gk][C.LAGOON_BLUE], '-o', color=color)
-        leg_handler, = panel_D.plot(t, grouped_agents[gk][C.LAGOON_GREEN], '-o', color=color, label=label)
-        handlers.append(leg_handler)
-
-    fig.legend(
-        handles=handlers,
-        loc='lower left',
-        bbox_to_anchor=(0.05, 0.98, 0.92, .102),
-        ncol=C.TOTAL_AGENT_TYPE, mode='expand',
-        borderaxespad=0., fancybox=True, shadow=True
-    )
-
-    fig.set_tight_layout(True) # Avoid panel overlaps
-    fig.suptitle('Simulation of Waterbirds in the Tropics', y=1.1, fontsize=14, fontweight='bold')
-    filename = os.path.join(C.GRAPH_DIR, uuid.uuid4().hex +'.pdf') # save in pdf format
-    plt.savefig(filename, bbox_inches='tight', pad_inches=0.1)
-    # plt.show()
-
-
-def finalize():
-    # summarize all snapshots in a GIF image
-    make_gif('snapshots.gif')
-    # display all snapshots' summary in a graph
-    plot_figure()
-    # track data for analysis
-    df = pd.DataFrame(C.STORE['stats'])
-    datenow = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = os.path.join(C.GRAPH_DIR, datenow + '.csv')
-    df.to_csv(filename, index=None, header=True)
-    print(f'=> Statistics successfully saved at <{filename}>')
-    # reset store
-    C.STORE['stats'] = []
-    C.STORE['env'] = []
+def reset():
+    """ Forget the state of the current process, ready for a new one """
+    C.STORE['stats'] = None
+    C.STORE['occupancy'] = None
+    C.STORE['probs'] = None
+    C.STORE['renderer'] = None
+    C.STORE['epoch'] = 0
+    C.STORE['probe'] = None
 
 
 # ==============================================================================
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Ensemble of independent realisations of the process
+
+# ==============================================================================
+# START: Ensemble
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import argparse # command line
+from datetime import datetime # datetime handler
+from concurrent.futures import ProcessPoolExecutor # pool of workers
+import numpy as np # arithmetic computations
+
+import config
+import constants as C
+from core import create_patches, create_agents_batch, update_environment, update_batched
+from probability import ProbabilityTable
+from simulation import Simulation
+
+def run_replicate(replicate, seed, engine=None, cnf=None):
+    """
+    Run one realisation of the process, without rendering nor saving anything
+
+    Parameters
+    ----------
+    replicate : int
+        the index of the replicate within the ensemble
+    seed : numpy.random.SeedSequence
+        the seed of the replicate's random generator
+    engine : string, default None
+        the update engine (see `core.update`)
+    cnf : dict, default None
+        the configuration of the process. If not specified, use the one of
+        `constants` (as loaded by this process).
+
+    Returns
+    -------
+    replicate : int
+        the index of the replicate
+    occupancy : ndarray of int64, shape (n_times, n_habitats, n_types)
+        the occupancy of the habitats over time
+    moves : ndarray of int64, shape (n_times, n_types)
+        the number of agents of each type that moved at each unit of time
+    prob : ndarray of float64, shape (n_times, n_types)
+        the mean overall probability of habitat use by type at each unit of time
+
+    Notes
+    -----
+    Everything random is drawn from the replicate's own generator, and the
+    replicate owns its whole state (see `Simulation`), so the results only
+    depend on the seed, no matter which worker runs the replicate, or after
+    which other one.
+    """
+    # a single unit of time of statistics is held at once, summarized along
+    settings = C.settings(C.CONFIG if cnf is None else cnf)
+    sim = Simulation(settings.CONFIG, rng=np.random.default_rng(seed), engine=engine, capacity=settings.TOTAL_AGENTS)
+    recorder, ntypes = sim.recorder, len(sim.agents.types)
+    moves = np.zeros((settings.PROCESSING_TIME, ntypes), dtype=np.int64)
+    prob = np.zeros((settings.PROCESSING_TIME, ntypes))
+    while not sim.done:
+        time = sim.step().time
+        cols = {k: col[:len(recorder)] for k, col in recorder.columns.items()}
+        codes = sim.agents.codes[cols['agent_name']] # agent code == agent index
+        moves[time] = np.bincount(codes, weights=cols['has_moved'], minlength=ntypes)
+        for k in range(ntypes):
+            if np.any(codes == k):
+                prob[time, k] = cols['prob_overall'][codes == k].mean()
+        recorder.clear()
+
+    return replicate, sim.occupancy.tensor.copy(), moves, prob
+
+
+def run_batch(first, seeds, cnf=None):
+    """
+    Run consecutive replicates of the process at once (see `core.update_batched`),
+    without rendering nor saving anything
+
+    Parameters
+    ----------
+    first : int
+        the index of the first replicate within the ensemble
+    seeds : list of numpy.random.SeedSequence
+        the seeds of the replicates' random generators
+    cnf : dict, default None
+        the configuration of the process. If not specified, use the one of
+        `constants` (as loaded by this process).
+
+    Returns
+    -------
+    replicates : slice
+        the indices of the replicates
+    occupancy : ndarray of int64, shape (n_replicates, n_times, n_habitats, n_types)
+        the occupancy of the habitats over time
+    moves : ndarray of int64, shape (n_replicates, n_times, n_types)
+        the number of agents of each type that moved at each unit of time
+    prob : ndarray of float64, shape (n_replicates, n_times, n_types)
+        the mean overall probability of habitat use by type at each unit of time
+
+    Notes
+    -----
+    A replicate gives the same results as `run_replicate` with the vectorized
+    engine and the same seed.
+    """
+    settings = C.settings(C.CONFIG if cnf is None else cnf)
+    rngs = [np.random.default_rng(seed) for seed in seeds]
+    habitats = create_patches(settings)
+    table = ProbabilityTable(habitats, settings.FNS, settings.DISTANCE).refresh(0)
+    agents = create_agents_batch(habitats, rngs, settings)
+
+    R, H, K, T = len(rngs), len(habitats), len(agents.types), settings.PROCESSING_TIME
+    occupancy = np.zeros((R, T, H, K), dtype=np.int64)
+    moves = np.zeros((R, T, K), dtype=np.int64)
+    prob = np.zeros((R, T, K))
+    keys = (np.arange(R)[:, None] * H + agents.habs) * K + agents.codes
+    counts = np.bincount(keys.ravel(), minlength=R * H * K).reshape(R, H, K)
+    occupancy[:, 0] = counts
+
+    for time in range(1, T):
+        if update_environment(habitats, time, settings):
+            table.refresh(time) # new environment epoch
+        agents, moves[:, time], prob[:, time] = update_batched(habitats, agents, time, rngs, counts, table, settings)
+        occupancy[:, time] = counts
+
+    return slice(first, first + R), occupancy, moves, prob
+
+
+# ------------------------------------------------------------------------------
+# Ensemble class definition
+class Ensemble:
+    """
+    A set of independent realisations (replicates) of the same configuration,
+    run across a pool of worker processes.
+
+    Parameters
+    ----------
+    replicates : int, default None
+        the number of replicates. If not specified, use `app.ensemble.replicates`.
+    seed : int, default None
+        the root seed of the ensemble. If not specified, use `app.ensemble.seed`,
+        or fresh entropy if that is not set either.
+    workers : int, default None
+        the number of worker processes (1: run within the current process). If
+        not specified, use `app.ensemble.workers`, or all the cores.
+    engine : string, default None
+        the update engine (see `core.update`)
+    batch : int, default 1
+        the number of replicates run at once by a worker, as a single array
+        program (see `core.update_batched`). Only for the vectorized engine.
+    cnf : dict, default None
+        the configuration of the replicates. If not specified, use the one of
+        `constants` (e.g., as set by `constants.configure`).
+
+    Attributes
+    ----------
+    entropy : int
+        the entropy of the root seed, enough to reproduce the whole ensemble
+    occupancy : ndarray of int64, shape (n_replicates, n_times, n_habitats, n_types)
+        the occupancy of the habitats over time, by replicate
+    moves : ndarray of int64, shape (n_replicates, n_times, n_types)
+        the number of moves by replicate, unit of time and agent's type
+    prob : ndarray of float64, shape (n_replicates, n_times, n_types)
+        the mean overall probabilities of habitat use, likewise
+
+    Notes
+    -----
+    Every replicate gets its own `numpy.random.Generator`, seeded by a child of
+    the root `SeedSequence` (`SeedSequence.spawn`). Hence the results are
+    bit-for-bit reproducible from the root seed, for any number of workers and
+    any batch size. The configuration is handed over to the workers, so that
+    they run the same process whatever their start method (fork or spawn).
+
+    Examples
+    --------
+    >>> ensemble = Ensemble(replicates=100, seed=2019).run()
+    >>> ensemble.occupancy.mean(axis=0) # expected occupancy over time
+    >>> ensemble.summary() # one row per replicate and agent's type
+    >>> ensemble.save(os.path.join(C.GRAPH_DIR, 'ensemble'))
+    """
+    def __init__(self, replicates=None, seed=None, workers=None, engine=None, batch=1, cnf=None):
+        self.cnf = C.CONFIG if cnf is None else cnf
+        settings = C.settings(self.cnf)
+        self.replicates = int(replicates or settings.ENSEMBLE_REPLICATES)
+        self.seed = np.random.SeedSequence(seed if seed is not None else settings.ENSEMBLE_SEED)
+        self.entropy = self.seed.entropy
+        self.workers = int(workers or settings.ENSEMBLE_WORKERS or os.cpu_count() or 1)
+        self.engine = engine
+        self.batch = max(int(batch or 1), 1)
+        if self.batch > 1 and (engine or settings.ENGINE) != 'vectorized':
+            raise ValueError('batched replicates require the vectorized engine')
+        if self.batch > 1 and settings.RASTER_SAMPLE:
+            raise ValueError('batched replicates cannot draw points from the raster (app.raster.sample)')
+
+        habitats = create_patches(settings)
+        self.hab_names = [h.id for h in habitats]
+        self.hab_types = [h.type for h in habitats]
+        self.types = [ag_cnf['type'] for ag_cnf in settings.CNF_AG]
+        shape = (self.replicates, settings.PROCESSING_TIME)
+        self.occupancy = np.zeros(shape + (len(self.hab_names), len(self.types)), dtype=np.int64)
+        self.moves = np.zeros(shape + (len(self.types),), dtype=np.int64)
+        self.prob = np.zeros(shape + (len(self.types),))
+
+
+    def run(self):
+        """ Run all the replicates and gather their results by replicate index """
+        seeds = self.seed.spawn(self.replicates)
+        if self.batch > 1:
+            firsts = range(0, self.replicates, self.batch)
+            fn, args = run_batch, (firsts, [seeds[r:r + self.batch] for r in firsts], [self.cnf] * len(firsts))
+        else:
+            n = self.replicates
+            fn, args = run_replicate, (range(n), seeds, [self.engine] * n, [self.cnf] * n)
+
+        if self.workers == 1:
+            self._gather(map(fn, *args))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                self._gather(pool.map(fn, *args))
+        return self
+
+
+    def _gather(self, results):
+        for r, occupancy, moves, prob in results:
+            self.occupancy[r] = occupancy
+            self.moves[r] = moves
+            self.prob[r] = prob
+
+
+    def summary(self):
+        """
+        Summarize every replicate by agent's type
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            indexed by (replicate, type), with the total number of moves, the
+            mean overall probability of habitat use and the final number of
+            agents in each lagoon
+        """
+        import pandas as pd # dataframe handling
+
+        lagoons = [h for h, _type in enumerate(self.hab_types) if _type != C.HUMAN_SETTLEMENT]
+        index = pd.MultiIndex.from_product(
+            [range(self.replicates), self.types], names=['replicate', 'type']
+        )
+        data = {
+            'moves': self.moves[:, 1:].sum(axis=1).ravel(),
+            'prob_overall': self.prob[:, 1:].mean(axis=1).ravel()
+        }
+        for h in lagoons:
+            data['final_' + self.hab_names[h]] = self.occupancy[:, -1, h, :].ravel()
+        return pd.DataFrame(data, index=index)
+
+
+    def save(self, basename):
+        """
+        Save the merged results: the arrays in NumPy's `.npz` format and the
+        summary as CSV
+
+        Parameters
+        ----------
+        basename : string
+            the target path, without extension
+
+        Returns
+        -------
+        filenames : tuple of string
+            the `.npz` and `.csv` files
+        """
+        np.savez_compressed(
+            basename + '.npz',
+            occupancy=self.occupancy,
+            moves=self.moves,
+            prob=self.prob,
+            replicates=np.arange(self.replicates),
+            entropy=np.array(str(self.entropy)),
+            hab_names=np.array(self.hab_names, dtype=str),
+            hab_types=np.array([str(t) for t in self.hab_types], dtype=str),
+            types=np.array(self.types, dtype=str)
+        )
+        self.summary().to_csv(basename + '.csv')
+        return basename + '.npz', basename + '.csv'
+
+
+def main(argv=None):
+    """ Command line entry point: run an ensemble and save its results """
+    parser = argparse.ArgumentParser(description='Run an ensemble of replicates of the waterbirds ABM')
+    parser.add_argument('-n', '--replicates', type=int, help='number of replicates')
+    parser.add_argument('-s', '--seed', type=int, help='root seed of the ensemble')
+    parser.add_argument('-w', '--workers', type=int, help='number of worker processes')
+    parser.add_argument('-e', '--engine', choices=['vectorized', 'reference'], help='update engine')
+    parser.add_argument('-b', '--batch', type=int, default=1, help='replicates run at once by a worker')
+    parser.add_argument('-o', '--output', help='output path, without extension')
+    args = parser.parse_args(argv)
+
+    ensemble = Ensemble(args.replicates, args.seed, args.workers, args.engine, args.batch)
+    print(f'=> START: Running {ensemble.replicates} replicates on {ensemble.workers} workers')
+    ensemble.run()
+    datenow = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.output is None:
+        config.prepare_output(clean=False)
+    basename = args.output or os.path.join(C.GRAPH_DIR, 'ensemble_' + datenow)
+    npzname, csvname = ensemble.save(basename)
+    print(f'=> Ensemble (seed entropy {ensemble.entropy}) saved at <{npzname}> and <{csvname}>')
+
+
+# run from the command line (guarded, as the workers may import this module)
+if __name__ == '__main__':
+    main()
+
+# ==============================================================================
+# END: Ensemble
+# ==============================================================================
@@ -0,0 +1,358 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Computational geometry utilities for the polygonal habitats
+
+# ==============================================================================
+# START: Geometry
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+
+__doc__ = """
+Polygon utilities operating on arrays of vertices of shape (m, 2), where the
+polygon is implicitly closed (the last vertex connects to the first one).
+"""
+
+def polygon_area(vertices):
+    """
+    Compute the area of a simple polygon (shoelace formula)
+
+    Parameters
+    ----------
+    vertices : array-like, shape (m, 2)
+        the vertices of the polygon, in either orientation
+
+    Returns
+    -------
+    area : float
+        the (unsigned) area of the polygon
+    """
+    return abs(_signed_area(np.asarray(vertices, dtype=float)))
+
+
+def polygon_areas(polygons):
+    """
+    Compute the areas of many simple polygons at once (shoelace formula)
+
+    Parameters
+    ----------
+    polygons : list of array-like, shape (m_i, 2)
+        the vertices of every polygon, in either orientation
+
+    Returns
+    -------
+    areas : ndarray, shape (k,)
+        the (unsigned) area of each polygon
+    """
+    return np.abs(_moments(polygons)[0])
+
+
+def polygon_centroids(polygons):
+    """
+    Compute the centroids (centers of mass of the surfaces) of many simple
+    polygons at once
+
+    Parameters
+    ----------
+    polygons : list of array-like, shape (m_i, 2)
+        the vertices of every polygon, in either orientation
+
+    Returns
+    -------
+    centroids : ndarray, shape (k, 2)
+        the x- and y-coordinates of the centroid of each polygon
+
+    Notes
+    -----
+    The centroid of an axis-aligned rectangle is the mid point of its diagonal,
+    computed as such. A polygon of no area gets the mean of its vertices (the
+    origin, if it has none).
+    """
+    polygons = [np.asarray(v, dtype=float).reshape(-1, 2) for v in polygons]
+    area, mx, my = _moments(polygons)
+    centroids = np.zeros((len(polygons), 2))
+    flat = area == 0
+    with np.errstate(all='ignore'):
+        centroids[:, 0], centroids[:, 1] = mx / (6 * area), my / (6 * area)
+    for i, v in enumerate(polygons):
+        if is_rectangle(v):
+            centroids[i] = (v.min(axis=0) + v.max(axis=0)) / 2
+        elif flat[i]:
+            centroids[i] = v.mean(axis=0) if len(v) > 0 else 0.0
+    return centroids
+
+
+def _moments(polygons):
+    """ The signed areas and first moments of many polygons, over all their
+    edges at once """
+    v, owners, nxt = _edges(polygons)
+    x, y = v[:, 0], v[:, 1]
+    cross = x * y[nxt] - x[nxt] * y
+    k = len(polygons)
+    area = 0.5 * np.bincount(owners, cross, minlength=k)
+    mx = np.bincount(owners, (x + x[nxt]) * cross, minlength=k)
+    my = np.bincount(owners, (y + y[nxt]) * cross, minlength=k)
+    return area, mx, my
+
+
+def _edges(polygons):
+    """ The vertices of many polygons concatenated, the polygon each one belongs
+    to, and the index of the next vertex along the same polygon """
+    rings = [np.asarray(v, dtype=float).reshape(-1, 2) for v in polygons]
+    sizes = np.array([len(v) for v in rings], dtype=int)
+    v = np.concatenate(rings) if len(rings) > 0 else np.zeros((0, 2))
+    starts = np.cumsum(sizes) - sizes
+    nxt = np.arange(len(v)) + 1
+    nxt[(starts + sizes - 1)[sizes > 0]] = starts[sizes > 0]
+    return v, np.repeat(np.arange(len(rings)), sizes), nxt
+
+
+def _signed_area(v):
+    x, y = v[:, 0], v[:, 1]
+    return 0.5 * (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def is_rectangle(vertices):
+    """
+    Check whether a polygon is an axis-aligned rectangle
+
+    Parameters
+    ----------
+    vertices : array-like, shape (m, 2)
+        the vertices of the polygon
+
+    Returns
+    -------
+    result : bool
+        True if the polygon has 4 vertices forming an axis-aligned rectangle
+    """
+    v = np.asarray(vertices, dtype=float)
+    if len(v) != 4:
+        return False
+    xs, ys = np.unique(v[:, 0]), np.unique(v[:, 1])
+    if len(xs) != 2 or len(ys) != 2:
+        return False
+    corners = {(x, y) for x in xs for y in ys}
+    # consecutive vertices must share either x or y (no crossing diagonals)
+    edges = v - np.roll(v, -1, axis=0)
+    return corners == set(map(tuple, v)) and bool(np.all((edges == 0).any(axis=1)))
+
+
+def triangulate(vertices):
+    """
+    Decompose a simple polygon (convex or not) into triangles by ear clipping
+
+    Parameters
+    ----------
+    vertices : array-like, shape (m, 2)
+        the vertices of the polygon, in either orientation
+
+    Returns
+    -------
+    triangles : ndarray, shape (m - 2, 3, 2)
+        the vertices of the triangles covering the polygon
+    """
+    v = np.asarray(vertices, dtype=float)
+    if _signed_area(v) < 0:
+        v = v[::-1] # counter-clockwise orientation
+    remaining = list(range(len(v)))
+    triangles = []
+
+    while len(remaining) > 3:
+        for i in range(len(remaining)):
+            a, b, c = remaining[i - 1], remaining[i], remaining[(i + 1) % len(remaining)]
+            if _cross(v[a], v[b], v[c]) <= 0:
+                continue # reflex (or flat) vertex
+            others = [j for j in remaining if j not in (a, b, c)]
+            if _any_in_triangle(v[others], v[a], v[b], v[c]):
+                continue # not an ear
+            triangles.append((v[a], v[b], v[c]))
+            remaining.pop(i)
+            break
+        else:
+            raise ValueError('the polygon is not simple, it cannot be triangulated.')
+
+    triangles.append(tuple(v[remaining]))
+    return np.array(triangles, dtype=float).reshape(-1, 3, 2)
+
+
+def points_in_polygon(points, vertices):
+    """
+    Check which points lie within a polygon (even-odd crossing number rule)
+
+    Parameters
+    ----------
+    points : array-like, shape (n, 2)
+        the points to test
+    vertices : array-like, shape (m, 2)
+        the vertices of the polygon
+
+    Returns
+    -------
+    mask : ndarray of bool, shape (n,)
+        True for every point lying within the polygon
+
+    Notes
+    -----
+    The test is vectorized over the points and loops over the m edges only.
+    """
+    p = np.asarray(points, dtype=float).reshape(-1, 2)
+    v = np.asarray(vertices, dtype=float)
+    x, y = p[:, 0], p[:, 1]
+    inside = np.zeros(len(p), dtype=bool)
+
+    for (x0, y0), (x1, y1) in zip(v, np.roll(v, -1, axis=0)):
+        crosses = (y0 > y) != (y1 > y) # the edge straddles the horizontal ray
+        if not crosses.any():
+            continue
+        x_cross = x0 + (y[crosses] - y0) * (x1 - x0) / (y1 - y0)
+        inside[crosses] ^= x[crosses] < x_cross
+    return inside
+
+
+def points_in_polygons(points, owners, polygons, chunk=1 << 20):
+    """
+    Check which points lie within their own polygon, among many polygons, with
+    the same rule as `points_in_polygon`
+
+    Parameters
+    ----------
+    points : array-like, shape (n, 2)
+        the points to test
+    owners : array-like of int, shape (n,)
+        the index (within `polygons`) of the polygon to test each point against
+    polygons : list of array-like, shape (m_i, 2)
+        the vertices of every polygon
+    chunk : int, default 2**20
+        the number of (point, edge) pairs tested at once, which bounds the
+        memory used
+
+    Returns
+    -------
+    mask : ndarray of bool, shape (n,)
+        True for every point lying within its polygon
+
+    Notes
+    -----
+    Every point is paired with each edge of its polygon, and all the pairs are
+    tested at once, whatever the number of polygons: the crossings are then
+    counted by point.
+    """
+    p = np.asarray(points, dtype=float).reshape(-1, 2)
+    owners = np.asarray(owners, dtype=int).reshape(-1)
+    v0, _, nxt = _edges(polygons)
+    v1 = v0[nxt]
+    sizes = np.array([len(v) for v in polygons], dtype=int)
+    starts = np.cumsum(sizes) - sizes
+    inside = np.zeros(len(p), dtype=bool)
+    step = max(chunk // max(sizes.max(initial=0), 1), 1)
+
+    for lo in range(0, len(p), step):
+        pts, own = p[lo:lo + step], owners[lo:lo + step]
+        counts = sizes[own]
+        pair = np.repeat(np.arange(len(pts)), counts)
+        edge = np.repeat(starts[own] - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+        x, y = pts[pair, 0], pts[pair, 1]
+        x0, y0, x1, y1 = v0[edge, 0], v0[edge, 1], v1[edge, 0], v1[edge, 1]
+
+        crosses = (y0 > y) != (y1 > y) # the edge straddles the horizontal ray
+        x0, y0, x1, y1, x, y = x0[crosses], y0[crosses], x1[crosses], y1[crosses], x[crosses], y[crosses]
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        hits = pair[crosses][x < x_cross]
+        inside[lo:lo + step] = np.bincount(hits, minlength=len(pts)) % 2 == 1
+    return inside
+
+
+def boundary_distances(points, vertices):
+    """
+    Compute the distance between each point and the boundary of a polygon
+
+    Parameters
+    ----------
+    points : array-like, shape (n, 2)
+        the points
+    vertices : array-like, shape (m, 2)
+        the vertices of the polygon
+
+    Returns
+    -------
+    distances : ndarray, shape (n,)
+        the shortest distance between each point and the edges of the polygon
+    """
+    p = np.asarray(points, dtype=float).reshape(-1, 1, 2)
+    a = np.asarray(vertices, dtype=float)
+    b = np.roll(a, -1, axis=0)
+    ab = b - a
+    length2 = np.maximum(np.sum(ab**2, axis=1), np.finfo(float).tiny)
+    # projection of each point onto each edge, clamped to the segment
+    t = np.clip(np.sum((p - a) * ab, axis=2) / length2, 0, 1)
+    nearest = a + t[:, :, None] * ab
+    return np.sqrt(np.min(np.sum((p - nearest)**2, axis=2), axis=1))
+
+
+def polygon_distances(points, vertices):
+    """
+    Compute the distance between each point and a polygon (zero inside)
+
+    Parameters
+    ----------
+    points : array-like, shape (n, 2)
+        the points
+    vertices : array-like, shape (m, 2)
+        the vertices of the polygon
+
+    Returns
+    -------
+    distances : ndarray, shape (n,)
+        the distance to the polygon, 0 for the points lying within it
+    """
+    distances = boundary_distances(points, vertices)
+    distances[points_in_polygon(points, vertices)] = 0.0
+    return distances
+
+
+def edge_distance(vertices1, vertices2):
+    """
+    Compute the edge-to-edge distance between two polygons
+
+    Parameters
+    ----------
+    vertices1, vertices2 : array-like, shape (m, 2)
+        the vertices of the polygons
+
+    Returns
+    -------
+    distance : float
+        the shortest distance between the two outlines, 0 if a polygon has a
+        vertex within the other one.
+
+    Notes
+    -----
+    For polygons that do not overlap, the shortest distance is always reached
+    at a vertex of one of them.
+    """
+    return float(min(
+        polygon_distances(vertices1, vertices2).min(),
+        polygon_distances(vertices2, vertices1).min()
+    ))
+
+
+def _cross(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _any_in_triangle(points, a, b, c):
+    p = points.T
+    return bool(np.any((_cross(a, b, p) >= 0) & (_cross(b, c, p) >= 0) & (_cross(c, a, p) >= 0)))
+
+# ==============================================================================
+# END: Geometry
+# ==============================================================================
@@ -14,15 +14,19 @@
 # ==============================================================================
 
 # -*- coding: utf-8 -*-
-import matplotlib.patches as mpatches
-from matplotlib.path import Path
+import numpy as np # arithmetic computations
+from geometry import polygon_distances, edge_distance, points_in_polygon, polygon_areas, polygon_centroids
+
+# the codes of the lines describing a polycurve (as in `matplotlib.path.Path`),
+# so that no plotting library is needed unless the habitats are drawn
+MOVETO, LINETO, CLOSEPOLY = 1, 2, 79
 
 # ------------------------------------------------------------------------------
 # Habitat class definition
 class Habitat:
     """
-    A patch-focused drawing representation of the lagoons, rectangularly shaped
-    and based on additional design settings.
+    A patch-focused drawing representation of the lagoons, shaped as any simple
+    polygon and based on additional design settings.
 
     Parameters
     ----------
@@ -34,17 +38,23 @@ class Habitat:
         the color representation of the lagoon within the system (design focus)
     label : string
         the tag description used to label the lagoon (design focus)
-    verts : tuple of shape(5, 2)
-        the vertices for the patch based on matplotlib's artist
+    verts : tuple of shape(m + 1, 2)
+        the vertices for the patch based on matplotlib's artist, the last one
+        closing the outline (e.g., 5 vertices for a rectangle)
     codes : list
-        the lines describing the polycurve of the artist
+        the lines describing the polycurve of the artist, one per vertex: drawn
+        from the first vertex, along the others, then closed (unless set)
     desc : string
         a long description
     props : dict
         the environmental characteristics a lagoon (water depth, salinity, food
         or prey availability, minimal distance to human settlements, etc.)
+    rain : callable, None
+        the water depth as a function of the rainfall, if configured (see
+        `core.update_habitat_water_depth`)
     artist :
-        the final artist built upon the given design setting
+        the final artist built upon the given design setting, created on first
+        use (requires matplotlib)
 
     Examples
     --------
@@ -73,14 +83,24 @@ class Habitat:
         self.verts = ()
         self.desc = ''
         self.props = {}
-        self.codes = [
-            Path.MOVETO,    # start polycurve here (top-left)
-            Path.LINETO,    # draw line to (top-right)
-            Path.LINETO,    # draw line to (bottom-right)
-            Path.LINETO,    # draw line to (bottom-left)
-            Path.CLOSEPOLY, # finish polycurve here (top-left)
-        ]
-        self.artist = None
+        self.rain = None
+        self.__codes = None
+        self.__style = None
+        self.__artist = None
+
+
+    @property
+    def codes(self):
+        """ The lines describing the polycurve: start at the first vertex, draw
+        lines along the next ones, and close the polycurve at the last one """
+        if self.__codes is not None:
+            return self.__codes
+        n = len(self.verts)
+        return [MOVETO] + [LINETO] * (n - 2) + [CLOSEPOLY] if n > 1 else [MOVETO] * n
+
+    @codes.setter
+    def codes(self, codes):
+        self.__codes = list(codes)
 
 
     def build(self, color=None, fill=False):
@@ -95,52 +115,205 @@ class Habitat:
             If True, the color will be applied to the entire area of the artist.
             Otherwise, only the edge of the figure(artist) will be colored.
 
-        Returns
-        -------
-        artist : PathPatch <matplotlib.patches>
-            the created artist
-
         Notes
         -----
-        See ref: https://matplotlib.org/users/path_tutorial.html for more info.
+        Only the design settings are kept: the artist itself is created on first
+        use (see `artist`), so that simulating without drawing does not require
+        matplotlib. See ref: https://matplotlib.org/users/path_tutorial.html for
+        more info.
         """
         c = color if color is not None else self.color
-        path = Path(self.verts, self.codes)
-        self.artist = mpatches.PathPatch(
-            path, label=self.label,
-            ec=c, fc=c, fill=fill, alpha=0.5
-        )
-        return self.artist
+        self.__style = (c, fill)
+        self.__artist = None
+
+
+    @property
+    def artist(self):
+        """ The artist (PathPatch <matplotlib.patches>) built upon the design settings """
+        if self.__artist is None and self.__style is not None:
+            import matplotlib.patches as mpatches
+            from matplotlib.path import Path
+
+            c, fill = self.__style
+            path = Path(self.verts, self.codes)
+            self.__artist = mpatches.PathPatch(
+                path, label=self.label,
+                ec=c, fc=c, fill=fill, alpha=0.5
+            )
+        return self.__artist
 
 
     def contains_point(self, point):
         """ Check if a point belongs to this specific patch """
-        return self.artist.get_path().contains_point(point)
+        return bool(self.contains_points([point])[0])
+
+
+    def contains_points(self, points):
+        """ Check which points of an array of shape (n, 2) belong to this patch
+
+        Returns
+        -------
+        mask : ndarray of bool, shape (n,)
+            True for every point lying within the patch
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return points_in_polygon(points, self.get_vertices())
+
+
+    def get_vertices(self):
+        """ Get the vertices of the polygon outlining the patch
+
+        Notes
+        -----
+        The vertex paired with the CLOSEPOLY code is ignored (as matplotlib
+        does), since the polygon is implicitly closed.
+
+        Returns
+        -------
+        vertices : ndarray, shape (m, 2)
+            the distinct vertices of the polygon
+        """
+        vertices = np.asarray(self.verts, dtype=float).reshape(-1, 2)
+        if len(self.codes) == len(vertices) and self.codes[-1] == CLOSEPOLY:
+            vertices = vertices[:-1]
+        return vertices
 
 
     def get_center(self):
-        """ Compute the center point of the rectangularly-shaped patch
+        """ Compute the center point (centroid) of the patch
 
         Notes
         -----
-        The center of rectangle is the mid point of the diagonal
-        end points of a rectangle ABCD.
+        The center of a rectangle ABCD is the mid point of its diagonal; the
+        center of any other polygon is the center of mass of its surface. See
+        `geometry.polygon_centroids`.
 
         Returns
         -------
         point: tuple
-            the x- and y-coordinate representing the center point of a given
-            retangular patch
+            the x- and y-coordinate representing the center point of the patch
         """
-        _x, _y = 0, 0
-        if len(self.verts) < 4:
-            return (_x, _y)
-
-        A, B, D = self.verts[0], self.verts[1], self.verts[3]
-        _x = (A[0] + D[0]) / 2 # width
-        _y = (A[1] + B[1]) / 2 # height
+        _x, _y = polygon_centroids([self.get_vertices()])[0]
         return (_x, _y)
 
+
+    def get_area(self):
+        """ Compute the area of the patch """
+        return float(polygon_areas([self.get_vertices()])[0])
+
+
+# ------------------------------------------------------------------------------
+# HabitatCollection class definition
+class HabitatCollection(list):
+    """
+    A list of habitats that owns the data derived from their static geometry,
+    such as the areas, the centers and the distances to the human settlements.
+
+    Parameters
+    ----------
+    habitats : iterable of Habitat
+        the habitats of the system
+    settlement : string, default 'human-settlement'
+        the type of the habitats considered as human settlements
+
+    Notes
+    -----
+    The geometry of the habitats is assumed not to change once collected. The
+    areas and centers of all the habitats are computed at once, and the
+    distance matrices once per metric, on first use:
+    - 'center': distance between the center points of the patches
+    - 'edge': shortest distance between the outlines of the patches
+
+    Examples
+    --------
+    >>> habitats = HabitatCollection(create_patches())
+    >>> habitats.settlement_distances('center').shape # (habitats, settlements)
+    (7, 3)
+    >>> habitats.point_settlement_distances([(0.5, 0.5)]) # per-point metric
+    array([[0.17, 0.403..., 0.390...]])
+    """
+    METRICS = ('center', 'edge', 'point')
+
+    def __init__(self, habitats=(), settlement='human-settlement'):
+        super().__init__(habitats)
+        self.settlement = settlement
+        self.__distances = dict()
+        self.__geometry = dict()
+
+    @property
+    def settlements(self):
+        """The habitats considered as human settlements"""
+        return [h for h in self if h.type == self.settlement]
+
+    @property
+    def lagoons(self):
+        """The habitats that are not human settlements"""
+        return [h for h in self if h.type != self.settlement]
+
+    @property
+    def areas(self):
+        """The area of every habitat, shape (n_habitats,)"""
+        if 'areas' not in self.__geometry:
+            self.__geometry['areas'] = polygon_areas([h.get_vertices() for h in self])
+        return self.__geometry['areas']
+
+    @property
+    def centers(self):
+        """The center point of every habitat, shape (n_habitats, 2)"""
+        if 'centers' not in self.__geometry:
+            self.__geometry['centers'] = polygon_centroids([h.get_vertices() for h in self])
+        return self.__geometry['centers']
+
+
+    def settlement_distances(self, metric='center'):
+        """ Get the distance matrix between the habitats and the settlements
+
+        Parameters
+        ----------
+        metric : string = {'center', 'edge'}, default 'center'
+            how to measure the distance between two patches
+
+        Returns
+        -------
+        distances : ndarray, shape (n_habitats, n_settlements)
+            the distance between each habitat and each human settlement
+        """
+        if metric not in self.__distances:
+            settlements = self.settlements
+            if metric == 'center':
+                centers = self.centers
+                s_centers = centers[[i for i, h in enumerate(self) if h.type == self.settlement]]
+                distances = np.linalg.norm(centers[:, None, :] - s_centers[None, :, :], axis=2)
+            elif metric == 'edge':
+                distances = np.array([
+                    [edge_distance(h.get_vertices(), s.get_vertices()) for s in settlements]
+                    for h in self
+                ], dtype=float).reshape(len(self), len(settlements))
+            else:
+                raise ValueError(f'unknown distance metric <{metric}> between habitats.')
+            self.__distances[metric] = distances
+        return self.__distances[metric]
+
+
+    def point_settlement_distances(self, points):
+        """ Compute the distance between points and the settlements
+
+        Parameters
+        ----------
+        points : array-like, shape (n, 2)
+            the x- and y-coordinates of the points (e.g., agents' positions)
+
+        Returns
+        -------
+        distances : ndarray, shape (n, n_settlements)
+            the distance between each point and the outline of each human
+            settlement (0 if the point lies within the settlement)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        distances = [polygon_distances(points, s.get_vertices()) for s in self.settlements]
+        return np.array(distances, dtype=float).reshape(-1, len(points)).T
+
+
 # ==============================================================================
 # END: Habitat class definition
 # ==============================================================================
\ No newline at end of file
@@ -16,13 +16,51 @@
 # ==============================================================================
 
 # -*- coding: utf-8 -*-
+import ast # function parser
 import numpy as np # arithmetic computations
+from functools import lru_cache # memoizer
+from types import SimpleNamespace # restricted modules
+from sampler import HabitatSampler
+from spatial import HabitatIndex
+from raster import HabitatRaster
+from instrument import NULL_PROBE
 
 __doc__ = """
 TODO
 """
 
-def gen_rand_point(habitats=[], option=None):
+def get_sampler(habitats, resolution=0):
+    """ Get the (cached) area-weighted sampler of a set of patches
+
+    Parameters
+    ----------
+    habitats: list of Habitat
+        a set of patches to sample random points from
+    resolution: int, default 0
+        if positive, draw the points from a label grid of the patches with as
+        many cells along each axis (see `HabitatRaster`) instead
+
+    Returns
+    -------
+    sampler: HabitatSampler, HabitatRaster
+        the sampler drawing points uniformly distributed over the patches
+    """
+    if resolution > 0:
+        return _get_raster(tuple(habitats), int(resolution))
+    return _get_sampler(tuple(habitats))
+
+
+@lru_cache(maxsize=128)
+def _get_sampler(habitats):
+    return HabitatSampler(list(habitats))
+
+
+@lru_cache(maxsize=16)
+def _get_raster(habitats, resolution):
+    return HabitatRaster(list(habitats), resolution)
+
+
+def gen_rand_point(habitats=[], option=None, rng=None, probe=NULL_PROBE):
     """ Generate random point that belongs (or not) to a set of patches
 
     Parameters
@@ -36,40 +74,93 @@ def gen_rand_point(habitats=[], option=None):
         within or out of the patches. If not specified, return just random
         points without considering the patches.
 
+    rng: numpy.random.Generator, default None
+        the source of randomness. If not specified, use `numpy.random`.
+
+    probe: Probe, default NULL_PROBE
+        the counter of the rejected points ('sample_retries', see `instrument`)
+
     Returns
     -------
     (x, y): tuple, of shape (2,)
         a vertex (x_coord, y_coord) of unit rectangle from (0,0) to (1,1).
+
+    Notes
+    -----
+    Points within the patches are drawn directly (see `HabitatSampler`): a patch
+    is chosen proportionally to its area, then a point is drawn inside it. Points
+    out of the patches are drawn by rejection.
     """
+    rng = np.random if rng is None else rng
+    if option == 'in' and len(habitats) > 0:
+        x, y = get_sampler(habitats).sample(1, rng)[0]
+        return (x, y)
+
     # initialize random point(x, y) by generating an array of 2 random values
     # between 0 and 1:: [0.1..., 0.4...]
-    x, y = np.random.rand(2)
-
-    # flag up a condition to assess points within, or out of the patches
-    if option == 'in':
-        condition = lambda f: f
-    elif option == 'out':
-        condition = lambda f: not f
-    elif option is None or len(habitats) is 0:
+    x, y = rng.random(2)
+    if option != 'out' or len(habitats) == 0:
         return (x, y)
 
-    # iterate until the point based on the given condition is found
-    while True:
-        found = False
-        for habitat in habitats:
-            if habitat.contains_point((x, y)):
-                found = True
-        # base condition to fulfill requirements
-        if condition(found):
-            break
-        x, y = np.random.rand(2) # update point(x, y)
+    # iterate until the point out of the patches is found
+    retries = 0
+    while any(habitat.contains_point((x, y)) for habitat in habitats):
+        x, y = rng.random(2) # update point(x, y)
+        retries += 1
+    probe.count('sample_retries', retries)
     return (x, y)
 
 
+def gen_rand_points(habitats, n, option='in', rng=None, probe=NULL_PROBE):
+    """ Generate n random points that belong (or not) to a set of patches
+
+    This is the batched counterpart of `gen_rand_point`.
+
+    Parameters
+    ----------
+    habitats: list of Habitat
+        a set of patches conditioning the random points
+    n : int
+        the number of points to generate
+    option: string = {'in', 'out', None}, default = 'in'
+        determine whether conditioning the random points being generated
+        within or out of the patches.
+    rng: numpy.random.Generator, default None
+        the source of randomness. If not specified, use `numpy.random`.
+    probe: Probe, default NULL_PROBE
+        the counter of the rejected points ('sample_retries', see `instrument`)
+
+    Returns
+    -------
+    points: ndarray, of shape (n, 2)
+        the vertices (x_coord, y_coord) of unit rectangle from (0,0) to (1,1).
+    """
+    rng = np.random if rng is None else rng
+    if option == 'in' and len(habitats) > 0:
+        return get_sampler(habitats).sample(n, rng)
+
+    points = rng.random((n, 2))
+    if option != 'out' or len(habitats) == 0:
+        return points
+
+    pending = np.arange(n) # indices of the points not fulfilling the condition
+    while len(pending) > 0:
+        found = np.zeros(len(pending), dtype=bool)
+        for habitat in habitats:
+            found |= habitat.contains_points(points[pending])
+        pending = pending[found]
+        points[pending] = rng.random((len(pending), 2)) # update points(x, y)
+        probe.count('sample_retries', len(pending))
+    return points
+
+
 def compute_dist(habitat, human_settlements):
     """
     Compute relative distances to the existing human settlements
 
+    See `HabitatCollection.settlement_distances` for the precomputed distances
+    between all the habitats and settlements.
+
     Parameters
     ----------
     habitat : Habitat
@@ -83,19 +174,42 @@ def compute_dist(habitat, human_settlements):
         the corresponding distance between each human settlement and the given
         habitat
     """
-    distances = []
     h_center = np.array( habitat.get_center() ) # center point of the habitat
+    s_centers = np.array([s.get_center() for s in human_settlements]).reshape(-1, 2)
+
+    # compute distance between habitat and settlements
+    distances = np.linalg.norm(s_centers - h_center, axis=1)
+    return list(distances) # order of distances depends on settlements' settings
+
 
-    for settlement in human_settlements:
-        s_center = np.array( settlement.get_center() )
-        # compute distance between habitat and settlement
-        dist = np.linalg.norm(h_center - s_center)
-        distances.append(dist)
+def get_index(habitats, resolution=0):
+    """ Get the (cached) spatial index of a set of habitats
 
-    return distances # order of distances depends on settlements' settings
+    Parameters
+    ----------
+    habitats: list of Habitat
+        a set of habitats to locate points in
+    resolution: int, default 0
+        if positive, locate the points through a label grid of the habitats
+        with as many cells along each axis (see `HabitatRaster`), with the same
+        results
+
+    Returns
+    -------
+    index: HabitatIndex, HabitatRaster
+        the index locating the habitat containing a point
+    """
+    if resolution > 0:
+        return _get_raster(tuple(habitats), int(resolution))
+    return _get_index(tuple(habitats))
 
 
-def which_habitat(point, habitats):
+@lru_cache(maxsize=128)
+def _get_index(habitats):
+    return HabitatIndex(list(habitats))
+
+
+def which_habitat(point, habitats, resolution=0):
     """
     Determine in which habitat dwells the current agent
 
@@ -105,6 +219,9 @@ def which_habitat(point, habitats):
         the x- and y-coordinate of the Cartersian plane
     habitats : list
         a group of habitats where this points possibly lives
+    resolution : int, default 0
+        the resolution of the label grid of the habitats, if any (see
+        `get_index`)
 
     Returns
     -------
@@ -117,15 +234,279 @@ def which_habitat(point, habitats):
     makes that the search returns a unique result (or None if the point is not
     contained in any the habitats).
     """
-    for h in habitats:
-        if h.contains_point(point):
-            return h
+    index = which_habitats([point], habitats, resolution)[0]
+    return habitats[index] if index >= 0 else None
+
+
+def which_habitats(points, habitats, resolution=0):
+    """
+    Determine in which habitat dwells each point of an array of points
+
+    Parameters
+    ----------
+    points : ndarray, shape(n, 2)
+        the x- and y-coordinates of the Cartersian plane
+    habitats : list
+        a group of habitats where these points possibly live
+    resolution : int, default 0
+        the resolution of the label grid of the habitats, if any (see
+        `get_index`)
+
+    Returns
+    -------
+    indices: ndarray of int, shape(n,)
+        the index (within `habitats`) of the habitat that contains each point,
+        or -1 if the point is not contained in any of the habitats.
+
+    Notes
+    -----
+    The points are located all at once through the spatial index of the
+    habitats (see `HabitatIndex`), or their label grid (see `HabitatRaster`),
+    built once per group of habitats.
+    """
+    return get_index(habitats, resolution).locate(points)
+
+
+# restricted namespace: modules that the function definitions may import, where
+# the math functions are replaced by their element-wise (numpy) counterparts, and
+# numpy is reduced to its element-wise functions (no I/O, no foreign libraries)
+SAFE_MODULES = {
+    'math': SimpleNamespace(
+        pi=np.pi, e=np.e, inf=np.inf,
+        log=np.log, log2=np.log2, log10=np.log10, log1p=np.log1p, exp=np.exp,
+        expm1=np.expm1, sqrt=np.sqrt, pow=np.power, fabs=np.fabs, floor=np.floor,
+        ceil=np.ceil, sin=np.sin, cos=np.cos, tan=np.tan, atan=np.arctan,
+        tanh=np.tanh
+    ),
+    'numpy': SimpleNamespace(
+        pi=np.pi, e=np.e, inf=np.inf, nan=np.nan,
+        log=np.log, log2=np.log2, log10=np.log10, log1p=np.log1p, exp=np.exp,
+        expm1=np.expm1, sqrt=np.sqrt, cbrt=np.cbrt, square=np.square,
+        power=np.power, abs=np.abs, absolute=np.absolute, fabs=np.fabs,
+        sign=np.sign, floor=np.floor, ceil=np.ceil, rint=np.rint,
+        sin=np.sin, cos=np.cos, tan=np.tan, arcsin=np.arcsin, arccos=np.arccos,
+        arctan=np.arctan, arctan2=np.arctan2, sinh=np.sinh, cosh=np.cosh,
+        tanh=np.tanh, hypot=np.hypot, minimum=np.minimum, maximum=np.maximum,
+        clip=np.clip, where=np.where
+    ),
+}
+
+# syntax allowed within the function definitions
+SAFE_NODES = (
+    ast.Expression, ast.Lambda, ast.arguments, ast.arg, ast.Load, ast.Name,
+    ast.Constant, ast.Attribute, ast.Call, ast.BinOp, ast.UnaryOp, ast.Add,
+    ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd,
+)
+
+
+class CompiledFn:
+    """
+    A function definition compiled once into a callable accepting numpy arrays
+
+    Parameters
+    ----------
+    source : string
+        the function definition (lambda expression)
+    args : list of string
+        the names of the arguments of the function
+    fn : callable
+        the compiled lambda expression
+    coefs : ndarray, None
+        the coefficients (highest degree first) if the function is a polynomial
+        of its single argument, in which case it is evaluated in that form.
+    meta : dict, default None
+        the meta information it was compiled from (see `compile_fn`)
+
+    Notes
+    -----
+    The result always has the shape of the (broadcast) arguments, so that
+    constant functions (e.g., `lambda: 12.5`) also evaluate element-wise.
+    It is pickled as its meta information, and compiled again once unpickled
+    (e.g., by the worker processes), since the compiled lambda cannot be.
+    """
+    def __init__(self, source, args, fn, coefs=None, meta=None):
+        self.source = source
+        self.args = args
+        self.fn = fn
+        self.coefs = coefs
+        self.meta = meta
+
+    def __call__(self, *args):
+        if len(self.args) > 0 and len(args) != len(self.args):
+            raise RuntimeError(f'Cannot evaluate this function <{self.source}>. Check required arguments')
+        if self.coefs is not None:
+            return np.polyval(self.coefs, args[0] if len(args) > 0 else 0.0)
+        values = self.fn(*args[:len(self.args)])
+        if len(args) == 0:
+            return values
+        return np.broadcast_to(values, np.broadcast(*args).shape) * 1.0
+
+    def __reduce__(self):
+        if self.meta is None:
+            raise TypeError(f'cannot pickle the function <{self.source}>: no meta information')
+        return compile_fn, (self.meta,)
+
+    def __repr__(self):
+        return f'CompiledFn({self.source!r})'
+
+
+def _as_polynomial(node, var):
+    """ Get the coefficients (lowest degree first) of an expression's syntax tree
+    when it is a polynomial of the variable `var`, otherwise None """
+    P = np.polynomial.polynomial
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return np.array([float(node.value)])
+    if isinstance(node, ast.Name) and node.id == var:
+        return np.array([0.0, 1.0])
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        p = _as_polynomial(node.operand, var)
+        return None if p is None else (-p if isinstance(node.op, ast.USub) else p)
+    if not isinstance(node, ast.BinOp):
+        return None
+
+    left, right = _as_polynomial(node.left, var), _as_polynomial(node.right, var)
+    if left is None or right is None:
+        return None
+    if isinstance(node.op, ast.Add):
+        return P.polyadd(left, right)
+    if isinstance(node.op, ast.Sub):
+        return P.polysub(left, right)
+    if isinstance(node.op, ast.Mult):
+        return P.polymul(left, right)
+    if isinstance(node.op, ast.Div) and len(right) == 1 and right[0] != 0:
+        return left / right[0]
+    if isinstance(node.op, ast.Pow) and len(right) == 1 and float(right[0]).is_integer() and 0 <= right[0] <= 16:
+        return P.polypow(left, int(right[0]))
     return None
 
 
+def _namespace(fn_deps):
+    """ Build the restricted namespace from the dependencies (import statements)
+    of a function definition """
+    namespace = {'__builtins__': {}}
+    deps = [fn_deps] if isinstance(fn_deps, str) else (fn_deps or [])
+    for dep in deps:
+        for node in ast.parse(dep).body:
+            if not isinstance(node, (ast.Import, ast.ImportFrom)):
+                raise ValueError(f'the dependency <{dep}> is not an import statement.')
+            if isinstance(node, ast.ImportFrom):
+                module = SAFE_MODULES.get(node.module)
+                if module is None:
+                    raise ValueError(f'the dependency <{dep}> is not allowed.')
+                for alias in node.names:
+                    namespace[alias.asname or alias.name] = getattr(module, alias.name)
+                continue
+            for alias in node.names:
+                if alias.name not in SAFE_MODULES:
+                    raise ValueError(f'the dependency <{dep}> is not allowed.')
+                namespace[alias.asname or alias.name] = SAFE_MODULES[alias.name]
+    return namespace
+
+
+@lru_cache(maxsize=None)
+def _compile(fn_def, fn_args, fn_deps):
+    tree = ast.parse(fn_def.strip(), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, SAFE_NODES):
+            raise ValueError(f'the function <{fn_def}> uses a forbidden syntax: {type(node).__name__}.')
+        if isinstance(node, ast.Attribute) and node.attr.startswith('_'):
+            raise ValueError(f'the function <{fn_def}> uses a forbidden attribute: {node.attr}.')
+    if not isinstance(tree.body, ast.Lambda):
+        raise ValueError(f'the function <{fn_def}> is not a lambda expression.')
+
+    params = [a.arg for a in tree.body.args.args]
+    namespace = _namespace(list(fn_deps))
+    modules = {name for name, value in namespace.items() if name not in params and any(value is m for m in SAFE_MODULES.values())}
+    for node in ast.walk(tree):
+        # only the functions of an imported module: `module.func`, no deeper
+        if isinstance(node, ast.Attribute) and not (
+            isinstance(node.value, ast.Name) and node.value.id in modules
+            and hasattr(namespace[node.value.id], node.attr)
+        ):
+            raise ValueError(f'the function <{fn_def}> uses a forbidden attribute: {node.attr}.')
+
+    coefs = None
+    if len(params) <= 1:
+        p = _as_polynomial(tree.body.body, params[0] if params else None)
+        coefs = None if p is None else p[::-1].copy() # highest degree first
+    fn = eval(compile(tree, '<config>', 'eval'), namespace)
+    meta = {'def': fn_def, 'args': list(fn_args), 'deps': list(fn_deps)}
+    return CompiledFn(fn_def, list(fn_args), fn, coefs, meta)
+
+
+def compile_fn(meta_fn):
+    """
+    Compile a function definition into a cached callable
+    The keys required as meta information are:
+    'def' : holds the function definition
+    'args' : holds the list of arguments of the function, if any
+    'deps' : holds the list of dependencies for the function to execute properly
+    'coefs' : (optional) the polynomial coefficients, highest degree first, used
+              instead of the function definition
+
+    Parameters
+    ----------
+    meta_fn : dict
+        the meta information required to compile a function (def, args, deps)
+
+    Returns
+    -------
+    fn : CompiledFn
+        the callable, accepting scalars or numpy arrays as arguments
+
+    Examples
+    --------
+    >>> fn = compile_fn({'def': 'lambda x: 2*x**2 + 1', 'args': ['x'], 'deps': None})
+    >>> fn.coefs
+    array([2., 0., 1.])
+    >>> fn(np.array([1, 2]))
+    array([3., 9.])
+
+    Notes
+    -----
+    The definitions are evaluated in a restricted namespace: no builtins, and
+    only the modules listed in `SAFE_MODULES` can be imported as dependencies,
+    whose functions are only reachable directly (`module.func`).
+    The same definition is compiled only once.
+    """
+    fn_args = tuple(meta_fn.get('args') or ())
+    if meta_fn.get('coefs') is not None:
+        coefs = np.asarray(meta_fn['coefs'], dtype=float)
+        meta = {'def': meta_fn.get('def', ''), 'args': list(fn_args), 'coefs': coefs.tolist()}
+        return CompiledFn(meta['def'], list(fn_args), None, coefs, meta)
+    fn_deps = meta_fn.get('deps')
+    fn_deps = (fn_deps,) if isinstance(fn_deps, str) else tuple(fn_deps or ())
+    return _compile(meta_fn['def'], fn_args, fn_deps)
+
+
+def compile_fns(agents_config):
+    """
+    Compile the functions of every category of agents
+
+    Parameters
+    ----------
+    agents_config : list of dict
+        the agents' configurations (`app.agents` in config.yml)
+
+    Returns
+    -------
+    fns : dict
+        the compiled functions by agent's type and by environmental property:
+        { '5cm': { 'w': CompiledFn, 's': ..., 'f': ..., 'd': ... } }. Any `penv`
+        other than w, s, and f refers to the distance d.
+    """
+    fns = dict()
+    for ag_cnf in agents_config:
+        fns[ag_cnf['type']] = dict()
+        for meta_fn in ag_cnf['fns']:
+            penv = meta_fn['penv'] if meta_fn['penv'] in ('w', 's', 'f') else 'd'
+            fns[ag_cnf['type']][penv] = compile_fn(meta_fn)
+    return fns
+
+
 def eval_fn(meta_fn, *args):
     """
-    Evaluate a function within the python environment
+    Evaluate a function within a restricted python environment
     The keys required as meta information are:
     'def' : holds the function definition
     'args' : holds the list of arguments of the function, if any
@@ -144,41 +525,31 @@ def eval_fn(meta_fn, *args):
     --------
     Evaluate a function with no argument or dependencies
 
-    >>> meta = {'def': 'lambda: print("cool evaluation")', 'args': None, 'deps': None }
-    >>> eval_fn(meta) # print the value
-    cool evaluation
+    >>> meta = {'def': 'lambda: 12.5', 'args': None, 'deps': None }
+    >>> eval_fn(meta)
+    12.5
 
     Evaluate a function with arguments but no dependencies
 
     >>> meta = {'def': 'lambda x: x**2', 'args': ['x'], 'deps': None }
     >>> eval_fn(meta, 3) # compute square of 3
-    9
+    9.0
 
     Evaluate a function with arguments and dependencies
 
     >>> meta = {'def': 'lambda x, y: math.pow(x, y)', 'args': ['x', 'y'], 'deps': 'import math' }
     >>> eval_fn(meta, 2, 3) # compute 2 to the power of 3
-    8
+    8.0
     >>> eval_fn(meta, *[2, 3]) # compute 2 to the power of 3
-    8
+    8.0
 
     Notes
     -----
     The evaluation of a given function is callable if and only if the conditions
     for running it are proper. Any violation will raise a runtime exception.
+    The function is compiled once (see `compile_fn`) and then reused.
     """
-    fn_def, fn_args, fn_deps = meta_fn['def'], meta_fn['args'], meta_fn['deps']
-    if isinstance(fn_deps, list):
-        for dep in fn_deps: exec(dep, globals()) # execute deps if any
-    fn = eval(fn_def)
-
-    if not isinstance(fn_args, list) or len(fn_args) == 0: # no args required
-        return fn()
-    elif len(fn_args) == len(args):
-        kwargs = dict(zip(fn_args, args)) # zip into keyworded args: {'k': v, ...}
-        return fn(**kwargs)
-    else:
-        raise RuntimeError(f'Cannot evaluate this function <{fn_def}>. Check required arguments')
+    return compile_fn(meta_fn)(*args)
 
 # ==============================================================================
 # END: Helpers
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definitions for the instrumentation of the process: per-phase timers and
+# counters, reported once per unit of time
+
+# ==============================================================================
+# START: Instrumentation class definitions
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import json
+import time as timer # monotonic clock
+import contextlib
+
+# ------------------------------------------------------------------------------
+# Probe class definition
+class Probe:
+    """
+    Timers around the phases of the process and counters of quantities of
+    interest, accumulated along a unit of time and written as one JSON line per
+    unit of time (JSONL).
+
+    Parameters
+    ----------
+    filename : string, default None
+        the path of the JSONL file. If not specified, the records are only kept
+        in memory (see `records`).
+
+    Attributes
+    ----------
+    phases : dict
+        the time spent (in nanoseconds) in each phase along the current unit
+    counters : dict
+        the counts along the current unit
+    records : list of dict
+        the records of the units of time so far, if not written to a file
+
+    Notes
+    -----
+    The phases of the process are:
+    'environment', 'sampling', 'lookup', 'probability', 'acceptance',
+    'counting', 'recording' and 'rendering'. The counters are, among others:
+    'moves_accepted', 'moves_rejected', 'sample_retries' and 'bytes_written'.
+    Phases may nest (e.g., 'sampling' within an agent's update), in which case
+    the time is accounted for in both.
+
+    Examples
+    --------
+    >>> probe = Probe('timings.jsonl')
+    >>> with probe.phase('sampling'):
+    ...     points = sampler.sample(n, rng)
+    >>> probe.count('moves_accepted', 12)
+    >>> probe.step(time) # {"time": 1, "wall": ..., "phases": {...}, "counters": {...}}
+    >>> probe.close()
+    """
+    enabled = True
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.phases = dict()
+        self.counters = dict()
+        self.records = []
+        self.__totals = dict()
+        self.__file = open(filename, 'w') if filename is not None else None
+        self.__last = timer.perf_counter_ns()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Time the enclosed block as (part of) a phase """
+        start = timer.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + timer.perf_counter_ns() - start
+
+
+    def count(self, name, n=1):
+        """ Add `n` to a counter """
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+
+    def progress(self, name, total):
+        """ Count the increase of a cumulative quantity (e.g., a file size) """
+        self.count(name, total - self.__totals.get(name, 0))
+        self.__totals[name] = total
+
+
+    def step(self, time):
+        """
+        Report the current unit of time, then start a new one
+
+        Returns
+        -------
+        record : dict
+            'time': the unit of time
+            'wall': the seconds elapsed since the previous report
+            'phases': the seconds spent by phase
+            'counters': the counts
+        """
+        now = timer.perf_counter_ns()
+        record = {
+            'time': int(time),
+            'wall': (now - self.__last) / 1e9,
+            'phases': {name: ns / 1e9 for name, ns in self.phases.items()},
+            'counters': dict(self.counters)
+        }
+        if self.__file is not None:
+            self.__file.write(json.dumps(record) + '\n')
+            self.__file.flush()
+        else:
+            self.records.append(record)
+        self.phases.clear()
+        self.counters.clear()
+        self.__last = now
+        return record
+
+
+    def close(self):
+        """ Close the JSONL file, if any """
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+
+# ------------------------------------------------------------------------------
+# NullProbe class definition
+class NullProbe:
+    """
+    A probe that does nothing, used when the instrumentation is disabled, so
+    that the instrumented code needs no condition and costs (almost) nothing
+    """
+    enabled = False
+    filename = None
+
+    def phase(self, name):
+        return _NULL_CONTEXT
+
+    def count(self, name, n=1):
+        pass
+
+    def progress(self, name, total):
+        pass
+
+    def step(self, time):
+        pass
+
+    def close(self):
+        pass
+
+_NULL_CONTEXT = contextlib.nullcontext()
+NULL_PROBE = NullProbe()
+
+# ==============================================================================
+# END: Instrumentation class definitions
+# ==============================================================================
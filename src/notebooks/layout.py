@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Layout of the habitats: described in the configuration or in a GeoJSON or CSV
+# file
+
+# ==============================================================================
+# START: Layout
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import csv
+import json
+
+__doc__ = """
+The layout of the habitats is a list of specifications, one per habitat, with
+the keys:
+- 'id': the key identifier of the habitat (shared by several habitats at will)
+- 'type': the category of the habitat (e.g., 1), as listed in the agents' `habs`
+- 'label', 'color', 'filled': the design settings
+- 'verts': the vertices of the outline, the last one closing it
+- 'props': the environmental characteristics (water depth 'w', salinity 's' and
+  food 'f', required but for the human settlements)
+- 'rain': the water depth as a function of the rainfall, as the meta information
+  of a function (see `helpers.compile_fn`), or None
+"""
+
+# the keys of a habitat that are not environmental characteristics
+RESERVED = ('id', 'type', 'label', 'color', 'filled', 'desc', 'rain', 'props')
+# long names of the environmental characteristics
+ALIASES = {'water': 'w', 'salinity': 's', 'food': 'f'}
+PENVS = ('w', 's', 'f')
+
+def load_layout(source, settlement='human-settlement', colors=None):
+    """
+    Load the layout of the habitats
+
+    Parameters
+    ----------
+    source : list of dict, string, None
+        the habitats, as listed in the configuration (`app.habitats`), or the
+        path of a GeoJSON (.geojson, .json) or CSV (.csv) file describing them
+    settlement : string, default 'human-settlement'
+        the type of the habitats considered as human settlements, which need no
+        environmental characteristics and are filled by default
+    colors : dict, default None
+        the default colors by habitat id or type
+
+    Returns
+    -------
+    specs : list of dict, None
+        the specifications of the habitats (see the module's notes), or None if
+        no source is given
+
+    Raises
+    ------
+    ValueError
+        if a habitat is malformed, or the file is of an unknown format
+
+    Examples
+    --------
+    >>> load_layout('lagoons.geojson')
+    [{'id': 'lagoon-1', 'type': 1, 'verts': ((0.1, 0.1), ..., (0.1, 0.1)), ...}, ...]
+    """
+    if not source:
+        return None
+    if isinstance(source, str):
+        ext = os.path.splitext(source)[1].lower()
+        if ext in ('.geojson', '.json'):
+            items = read_geojson(source)
+        elif ext == '.csv':
+            items = read_csv(source)
+        else:
+            raise ValueError(f'unknown format of the habitats <{source}>: GeoJSON (.geojson, .json) or CSV (.csv)')
+    elif isinstance(source, list):
+        items = source
+    else:
+        raise ValueError('<app.habitats> should be a list of habitats, or the path of a GeoJSON or CSV file')
+    return [_spec(item, f'{source}: habitat {i}' if isinstance(source, str) else f'app.habitats.{i}', settlement, colors or {})
+        for i, item in enumerate(items)]
+
+
+def read_geojson(filename):
+    """
+    Read the habitats of a GeoJSON file: a feature per habitat, outlined by a
+    polygon (or a habitat per polygon of a multipolygon), with the properties
+    of the habitat. Any property other than the reserved ones (id, type, label,
+    color, filled, desc, rain) is an environmental characteristic.
+
+    Returns
+    -------
+    items : list of dict
+        the habitats, as listed in the configuration
+    """
+    with open(filename) as f:
+        data = json.load(f)
+    features = data.get('features', []) if data.get('type') == 'FeatureCollection' else [data]
+
+    items = []
+    for i, feature in enumerate(features):
+        geometry = feature.get('geometry') or {}
+        properties = dict(feature.get('properties') or {})
+        if 'id' not in properties and 'id' in feature:
+            properties['id'] = feature['id']
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            raise ValueError(f'<{filename}>: feature {i} is not a polygon ({geometry.get("type")})')
+
+        for rings in polygons:
+            if len(rings) != 1:
+                raise ValueError(f'<{filename}>: feature {i} has holes, which habitats cannot have')
+            item = _split(properties)
+            item['verts'] = rings[0]
+            items.append(item)
+    return items
+
+
+def read_csv(filename):
+    """
+    Read the habitats of a CSV file: a row per vertex, with the columns 'id',
+    'type', 'x' and 'y', and the other properties of the habitat (taken from
+    its first row). The rows of a habitat are consecutive: a new habitat starts
+    when the id changes, or once the outline is closed (its first vertex
+    repeated), so that several habitats may share an id.
+
+    Returns
+    -------
+    items : list of dict
+        the habitats, as listed in the configuration
+    """
+    with open(filename, newline='') as f:
+        rows = list(csv.DictReader(f))
+    if rows and not {'id', 'type', 'x', 'y'} <= set(rows[0]):
+        raise ValueError(f'<{filename}>: the columns id, type, x and y are required')
+
+    items, item = [], None
+    for row in rows:
+        if item is None or row['id'] != item['id'] or _closed(item['verts']):
+            properties = {k: _value(v) for k, v in row.items() if k not in ('x', 'y') and v not in ('', None)}
+            properties['id'] = row['id']
+            item = _split(properties)
+            item['verts'] = []
+            items.append(item)
+        item['verts'].append((float(row['x']), float(row['y'])))
+    return items
+
+
+def _split(properties):
+    """ Separate the environmental characteristics from the other properties """
+    item = {k: properties[k] for k in RESERVED if k in properties}
+    props = dict(properties.get('props') or {})
+    props.update({k: v for k, v in properties.items() if k not in RESERVED})
+    item['props'] = props
+    return item
+
+
+def _spec(item, where, settlement, colors):
+    """ Check and complete the specification of a habitat """
+    for key in ('id', 'type', 'verts'):
+        if not isinstance(item, dict) or item.get(key) is None:
+            raise ValueError(f'<{where}>: missing key <{key}>')
+
+    verts = [(float(x), float(y)) for x, y in item['verts']]
+    if len(verts) > 1 and verts[0] == verts[-1]:
+        verts = verts[:-1]
+    if len(set(verts)) < 3:
+        raise ValueError(f'<{where}>: a habitat needs at least 3 distinct vertices')
+    verts.append(verts[0]) # closing vertex
+
+    props = {ALIASES.get(k, k): v for k, v in (item.get('props') or {}).items()}
+    missing = [penv for penv in PENVS if props.get(penv) is None]
+    if item['type'] != settlement and missing:
+        raise ValueError(f'<{where}>: missing environmental characteristics <{", ".join(missing)}>')
+    # water depth, salinity and food first, as expected by the agents
+    props = {**{penv: props[penv] for penv in PENVS if penv in props}, **props}
+
+    rain = item.get('rain')
+    if isinstance(rain, str):
+        rain = {'def': rain, 'args': ['x'], 'deps': None}
+    elif isinstance(rain, (list, tuple)):
+        rain = {'coefs': list(rain), 'args': ['x']}
+
+    return {
+        'id': item['id'],
+        'type': item['type'],
+        'label': item.get('label') or str(item['id']),
+        'color': item.get('color') or colors.get(item['id'], colors.get(item['type'], 'gray')),
+        'filled': bool(item.get('filled', item['type'] == settlement)),
+        'desc': item.get('desc') or '',
+        'verts': tuple(verts),
+        'props': props,
+        'rain': rain
+    }
+
+
+def _closed(verts):
+    return len(verts) > 2 and verts[0] == verts[-1]
+
+
+def _value(text):
+    """ The number a CSV cell holds, if any, otherwise the text itself """
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+# ==============================================================================
+# END: Layout
+# ==============================================================================
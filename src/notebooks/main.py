@@ -15,9 +15,11 @@
 # ==============================================================================
 
 # -*- coding: utf-8 -*-
+import argparse # command line
 import config
 import constants
-from core import initialize, observe, update, finalize
+from core import initialize, update, get_probe, save_checkpoint, resume
+from output import start_pipeline, observe, finalize, close_gif, close_recorder, resume_gif
 
 # ==============================================================================
 # END: Preamble
@@ -29,28 +31,69 @@ from core import initialize, observe, update, finalize
 
 # main entry point for the application
 # TODO: proper docs
-def application():
+def application(resume_from=None, checkpoint_every=None):
+    """
+    Run the simulation
 
+    Parameters
+    ----------
+    resume_from : string or bool, default None
+        the checkpoint to resume the process from (True: the default one, see
+        `core.get_checkpoint_file`). If not specified, start a new process.
+    checkpoint_every : int, default None
+        the number of units of time between checkpoints (0: none). If not
+        specified, use the configured number (`app.checkpoint.every`).
+    """
     # pre-conditions
     config.init() # initialize internal config for the app
-    time = 0 # define stopwatch for the process
+    config.prepare_output(clean=not resume_from) # clean the samples and graphs directories
+    time, rng = 0, None # define stopwatch for the process
 
      # process for t times
     print('=> START: Running simulation for waterbirds ABM')
-    habitats, agents = initialize()
-    observe(habitats, agents, time)
+    if resume_from: # where the previous process saved its last checkpoint
+        habitats, agents, time, rng = resume(None if resume_from is True else resume_from)
+        resume_gif(time + 1) # the snapshots up to the checkpoint
+    else:
+        habitats, agents = initialize()
+    pipeline = start_pipeline(habitats) # render in the background, if enabled
+    try:
+        if not resume_from:
+            observe(habitats, agents, time, pipeline)
+            get_probe().step(time) # timings of the unit of time, if enabled
+        every = constants.CHECKPOINT_EVERY if checkpoint_every is None else checkpoint_every
 
-    for time in range(1, constants.PROCESSING_TIME):
-        agents = update(habitats, agents, time) # override agents when being updated
-        observe(habitats, agents, time)
+        for time in range(time + 1, constants.PROCESSING_TIME):
+            agents = update(habitats, agents, time, rng=rng) # override agents when being updated
+            observe(habitats, agents, time, pipeline)
+            get_probe().step(time)
+            if every > 0 and time % every == 0:
+                print('--- checkpoint saved at <{}>'.format(save_checkpoint(habitats, agents, time, rng=rng)))
 
-    print('=> END: Running simulation for waterbirds ABM')
+        if pipeline is not None:
+            pipeline.close() # wait for the remaining snapshots
+        print('=> END: Running simulation for waterbirds ABM')
 
-    # post-conditions
-    finalize()
+        # post-conditions
+        finalize()
+    finally:
+        # on failure, keep what was recorded and rendered so far (no-op once finalized)
+        try:
+            if pipeline is not None:
+                pipeline.close()
+        finally:
+            close_recorder()
+            close_gif()
 
-# run application
-application()
+# run application (guarded, as the rendering workers may import this module)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the simulation of the waterbirds ABM')
+    parser.add_argument('-r', '--resume', nargs='?', const=True, metavar='CHECKPOINT',
+        help='resume from a checkpoint (default: the one of the configuration)')
+    parser.add_argument('-c', '--checkpoint', type=int, metavar='N',
+        help='save a checkpoint every N units of time (default: app.checkpoint.every)')
+    args = parser.parse_args()
+    application(args.resume, args.checkpoint)
 
 # ==============================================================================
 # END: Application
@@ -0,0 +1,181 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the occupancy of the habitats
+
+# ==============================================================================
+# START: Occupancy class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+
+# ------------------------------------------------------------------------------
+# Occupancy class definition
+class Occupancy:
+    """
+    The number of agents of each type dwelling in each habitat, maintained
+    incrementally as the agents move, along with its history over time.
+
+    Parameters
+    ----------
+    hab_names : list of string
+        the ids of the habitats, indexed by habitat index
+    types : list of string
+        the agents' types, indexed by type code
+    hab_types : list, default None
+        the types of the habitats, indexed by habitat index
+    capacity : int, default 0
+        the expected number of units of time, so that the history is allocated
+        once (it grows as needed anyway)
+
+    Attributes
+    ----------
+    counts : ndarray of int64, shape (n_habitats, n_types)
+        the current counts
+    tensor : ndarray of int64, shape (n_times, n_habitats, n_types)
+        the recorded counts, one slice per unit of time
+
+    Examples
+    --------
+    >>> occupancy = Occupancy([h.id for h in habitats], agents.types)
+    >>> occupancy.reset(agents.habs, agents.codes) # full count, once
+    >>> occupancy.move(codes, old_habs, new_habs) # accepted moves only
+    >>> occupancy.record() # once per unit of time
+    >>> occupancy.tensor[:, h, k] # time series of type k in habitat h
+    """
+    def __init__(self, hab_names, types, hab_types=None, capacity=0):
+        self.hab_names = list(hab_names)
+        self.types = list(types)
+        self.hab_types = list(hab_types) if hab_types is not None else [None] * len(self.hab_names)
+        self.counts = np.zeros((len(self.hab_names), len(self.types)), dtype=np.int64)
+        self.__history = np.zeros((capacity,) + self.counts.shape, dtype=np.int64)
+        self.__size = 0
+
+    def __len__(self):
+        return self.__size
+
+    @property
+    def tensor(self):
+        return self.__history[:self.__size]
+
+    def _count(self, habs, codes):
+        habs, codes = np.asarray(habs), np.asarray(codes)
+        valid = habs >= 0 # agents out of any habitat are not counted
+        keys = habs[valid].astype(np.int64) * len(self.types) + codes[valid]
+        return np.bincount(keys, minlength=self.counts.size).reshape(self.counts.shape)
+
+
+    def reset(self, habs, codes):
+        """
+        Count all the agents from scratch
+
+        Parameters
+        ----------
+        habs : ndarray of int, shape (n,)
+            the habitat index of each agent (-1 if none)
+        codes : ndarray of int, shape (n,)
+            the type code of each agent
+        """
+        self.counts = self._count(habs, codes)
+
+
+    def move(self, codes, old_habs, new_habs):
+        """
+        Account for the agents moving from a habitat to another
+
+        Parameters
+        ----------
+        codes : ndarray of int, shape (n,)
+            the type codes of the moving agents
+        old_habs, new_habs : ndarray of int, shape (n,)
+            the habitats the agents leave and enter
+        """
+        if len(codes) == 0:
+            return
+        self.counts -= self._count(old_habs, codes)
+        self.counts += self._count(new_habs, codes)
+
+
+    def snapshot(self):
+        """ Get a copy of the current counts, shape (n_habitats, n_types) """
+        return self.counts.copy()
+
+
+    def record(self):
+        """ Append the current counts to the history """
+        if self.__size == len(self.__history): # grow geometrically
+            grown = np.zeros((max(2 * self.__size, 1),) + self.counts.shape, dtype=np.int64)
+            grown[:self.__size] = self.__history
+            self.__history = grown
+        self.__history[self.__size] = self.counts
+        self.__size += 1
+
+
+    def save(self, filename):
+        """
+        Save the history in NumPy's `.npz` format
+
+        Parameters
+        ----------
+        filename : string
+            the target file
+
+        Notes
+        -----
+        The archive holds the arrays `occupancy` (time x habitat x type),
+        `hab_names`, `hab_types` and `types`, loadable without this module:
+        >>> data = np.load(filename)
+        >>> data['occupancy'][:, h, k]
+        """
+        np.savez_compressed(
+            filename,
+            occupancy=self.tensor,
+            hab_names=np.array(self.hab_names, dtype=str),
+            hab_types=np.array([str(t) for t in self.hab_types], dtype=str),
+            types=np.array(self.types, dtype=str)
+        )
+        return filename
+
+
+    def restore(self, tensor):
+        """
+        Replace the history with recorded counts, the current counts being the
+        last recorded ones
+
+        Parameters
+        ----------
+        tensor : ndarray of int, shape (n_times, n_habitats, n_types)
+            the recorded counts (see `tensor`)
+        """
+        tensor = np.asarray(tensor, dtype=np.int64)
+        if tensor.shape[1:] != self.counts.shape:
+            raise ValueError(f'occupancy of shape {tensor.shape[1:]} instead of {self.counts.shape}')
+        self.__history = np.zeros((max(len(self.__history), len(tensor)),) + self.counts.shape, dtype=np.int64)
+        self.__history[:len(tensor)] = tensor
+        self.__size = len(tensor)
+        if len(tensor):
+            self.counts = tensor[-1].copy()
+
+
+    @classmethod
+    def load(cls, filename):
+        """ Restore the history saved with `save` """
+        with np.load(filename) as data:
+            tensor = data['occupancy']
+            occupancy = cls(
+                data['hab_names'].tolist(), data['types'].tolist(),
+                data['hab_types'].tolist(), len(tensor)
+            )
+        occupancy.restore(tensor)
+        return occupancy
+
+# ==============================================================================
+# END: Occupancy class definition
+# ==============================================================================
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Visualization and export of the outputs of the process. The simulation itself
+# (see `core`) never imports this module, so that headless workers do not pay
+# for the plotting and IO libraries.
+
+# ==============================================================================
+# START: Output
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import uuid # hasher
+import imageio as gm # gif maker
+import numpy as np # arithmetic computer
+import matplotlib.pyplot as plt # plotter
+from datetime import datetime # datetime handler
+
+import constants as C
+from core import reset, get_probe
+from renderer import Renderer, GifWriter
+from pipeline import FramePipeline
+
+def get_renderer(habitats):
+    """
+    Get the renderer of the given habitats, built once and reused across all
+    the snapshots in time.
+
+    Returns
+    -------
+    renderer : Renderer
+        the persistent figure plotting the agents within the habitats
+    """
+    renderer = C.STORE['renderer']
+    if renderer is None or renderer.habitats is not habitats:
+        types = [ag_cnf['type'] for ag_cnf in C.CNF_AG]
+        colors = [ag_cnf['color'] for ag_cnf in C.CNF_AG]
+        labels = [ag_cnf['label'] for ag_cnf in C.CNF_AG]
+        renderer = Renderer(habitats, types, colors, labels, C.SAMPLE_DIR)
+        C.STORE['renderer'] = renderer
+    return renderer
+
+
+def start_pipeline(habitats, workers=None):
+    """
+    Start the background rendering of the snapshots
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        all the created habitats
+    workers : int, default None
+        the number of rendering processes. If not specified, use the number set
+        in the configuration (`app.render.workers`).
+
+    Returns
+    -------
+    pipeline : FramePipeline, None
+        the started pipeline, or None if no worker is required (the snapshots
+        are then rendered by the simulation process itself)
+    """
+    workers = C.RENDER_WORKERS if workers is None else workers
+    if workers <= 0:
+        return None
+    types = [ag_cnf['type'] for ag_cnf in C.CNF_AG]
+    colors = [ag_cnf['color'] for ag_cnf in C.CNF_AG]
+    labels = [ag_cnf['label'] for ag_cnf in C.CNF_AG]
+    on_frame = lambda result: get_gif_writer().append(result[1]) # in order
+    return FramePipeline(
+        habitats, types, colors, labels, C.SAMPLE_DIR, workers,
+        on_frame=on_frame, png=C.RENDER_PNG
+    )
+
+
+def get_gif_writer(gifname='snapshots.gif'):
+    """
+    Get the GIF image the snapshots are streamed into, opened on first use
+
+    Returns
+    -------
+    writer : GifWriter
+        the streaming GIF encoder
+    """
+    if C.STORE['gif'] is None:
+        C.STORE['gif'] = GifWriter(os.path.join(C.SAMPLE_DIR, gifname))
+    return C.STORE['gif']
+
+
+def resume_gif(frames, gifname='snapshots.gif'):
+    """
+    Continue the GIF image of a resumed process (see `core.resume`) after its
+    first `frames` frames, instead of starting it over
+
+    Parameters
+    ----------
+    frames : int
+        the number of frames rendered before the checkpoint (its time + 1)
+    gifname : string, default 'snapshots.gif'
+        the name of the GIF image
+
+    Returns
+    -------
+    writer : GifWriter
+        the streaming GIF encoder, the resumed process appends its frames to
+
+    Notes
+    -----
+    The frames rendered before the checkpoint are encoded again from the
+    existing GIF image (losslessly, as they already fit its palette), and the
+    ones rendered after it are dropped. A GIF image is only written once
+    complete, so a process killed abruptly leaves none: the frames of the
+    resumed process then go to a new image, numbered after its first frame
+    (e.g., 'snapshots-21.gif'), next to the one of the previous process.
+    """
+    filename = os.path.join(C.SAMPLE_DIR, gifname)
+    prevname = filename + '.prev'
+    if os.path.isfile(prevname) and not os.path.isfile(filename): # interrupted while resuming
+        os.replace(prevname, filename)
+    if _count_frames(filename, frames) < frames:
+        base, ext = os.path.splitext(filename)
+        filename = f'{base}-{frames + 1}{ext}'
+        print(f'--- the snapshots before time {frames + 1} are missing, the next ones go to <{filename}>')
+        C.STORE['gif'] = GifWriter(filename)
+        return C.STORE['gif']
+
+    os.replace(filename, prevname)
+    writer = GifWriter(filename)
+    reader = gm.get_reader(prevname)
+    try:
+        for i, frame in enumerate(reader):
+            if i >= frames:
+                break
+            writer.append(np.asarray(frame)[:, :, :3])
+    finally:
+        reader.close()
+    os.remove(prevname)
+    C.STORE['gif'] = writer
+    return writer
+
+
+def _count_frames(filename, limit):
+    """ Count the readable frames of a GIF image, up to `limit` """
+    if not os.path.isfile(filename):
+        return 0
+    count = 0
+    try:
+        reader = gm.get_reader(filename)
+        try:
+            for _ in reader:
+                count += 1
+                if count >= limit:
+                    break
+        finally:
+            reader.close()
+    except Exception: # truncated or corrupted: only the frames read so far
+        pass
+    return count
+
+
+def observe(habitats, agents, counter=0, pipeline=None):
+    """
+    Plot the agents within the habitats and append the figure as a frame of the
+    GIF image of the snapshots (and save it as a PNG image, if enabled)
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        all the created habitats
+    agents : Population
+        the agents to plot
+    counter : int, default 0
+        the current processing unit
+    pipeline : FramePipeline, default None
+        if given, the snapshot is queued for background rendering instead
+    """
+    probe = get_probe()
+    with probe.phase('rendering'):
+        if pipeline is not None:
+            pipeline.submit(agents.x, agents.y, agents.codes, counter)
+            return
+        renderer = get_renderer(habitats)
+        image_path, frame = renderer.snapshot(agents.x, agents.y, agents.codes, counter, C.RENDER_PNG)
+        get_gif_writer().append(frame)
+    if image_path is not None:
+        probe.count('bytes_written', os.path.getsize(image_path))
+    # END: observe
+
+
+def make_gif(gifname='image.gif', dirname=None, storage=None):
+    """
+    Combine images into a single GIF image: the given ones, or else the PNG
+    snapshots of a directory, in the order of their units of time
+
+    Parameters
+    ----------
+    gifname : string, default 'image.gif'
+        the name of the GIF image
+    dirname : string, default None
+        the directory holding the PNG snapshots (named '<counter>.png', see
+        `Renderer.snapshot`), where the GIF image is saved. If not specified,
+        use the samples directory (`C.SAMPLE_DIR`).
+    storage : list of ndarray, default None
+        the frames to combine, in order. If not specified (or empty), the PNG
+        snapshots of `dirname` are read instead.
+
+    Notes
+    -----
+    The snapshots rendered by `observe` are already streamed into a GIF image
+    (see `close_gif`). This function combines existing PNG images instead
+    (e.g., saved with `app.render.png`), all held in memory at once.
+
+    Examples
+    --------
+    >>> make_gif('snapshots.gif', dirname='samples') # samples/1.png, 2.png, ...
+    """
+    IMG_EXT = '.png'
+    dirname = C.SAMPLE_DIR if dirname is None else dirname
+    filename = os.path.join(dirname, gifname)
+    storage = [] if storage is None else storage
+    if len(storage) == 0:
+        imgnames = [f for f in os.listdir(dirname) if f.lower().endswith(IMG_EXT)]
+        sorted_imgnames = sort_imgnames(imgnames, IMG_EXT)
+        for imgname in sorted_imgnames:
+            image = gm.imread(os.path.join(dirname, imgname))
+            storage.append(image)
+    gm.mimsave(filename, storage)
+    print(f'=> Combined snapshots are saved as GIF at <{filename}>')
+
+
+def close_gif():
+    """ Finish the GIF image the snapshots have been streamed into, if any """
+    writer = C.STORE['gif']
+    if writer is None:
+        return
+    writer.close()
+    C.STORE['gif'] = None
+    print(f'=> Combined snapshots are saved as GIF at <{writer.filename}>')
+
+
+def close_recorder():
+    """ Write the statistics recorded so far, if streamed, and wait for the
+    writer: safe to call more than once, and on failure """
+    recorder = C.STORE['stats']
+    if recorder is not None and recorder.writer is not None:
+        recorder.close()
+
+
+def sort_imgnames(imgnames, ext='.png', reverse=False):
+    names = list(map(int, [p.split(ext)[0] for p in imgnames]))# convert to integers
+    names.sort(reverse=reverse) # proper sorting for integers
+    return list(map(lambda n: str(n) + ext, names)) # restore names
+
+
+def plot_figure(occupancy=None):
+    """
+    Plot a summary of the distribution of the agents within the habitats: one
+    panel per lagoon, one line per agent's type.
+
+    Parameters
+    ----------
+    occupancy : Occupancy, default None
+        the occupancy history to plot. If not specified, use the one of the
+        current process.
+    """
+    plt.rcParams['axes.grid'] = True
+    plt.rcParams['grid.alpha'] = 0.5
+    plt.rcParams['figure.titlesize'] = 12
+    plt.rcParams['font.size'] = 12
+    plt.rcParams['lines.linewidth'] = 1
+    plt.rcParams['lines.markersize'] = 3
+
+    if occupancy is None:
+        occupancy = C.STORE['occupancy']
+    counts = occupancy.tensor # (time, habitat, agent's type)
+    lagoons = [h for h, _type in enumerate(occupancy.hab_types) if _type != C.HUMAN_SETTLEMENT]
+    colors = [C.get_agentp(_type, 'color') for _type in occupancy.types]
+    labels = [C.get_agentp(_type, 'label') for _type in occupancy.types]
+
+    plt.cla()
+    plt.clf()
+    ncols = min(len(lagoons), 2)
+    nrows = -(-len(lagoons) // ncols)
+    fig = plt.figure(2, figsize=(5.5 * ncols, 3.25 * nrows))
+    t = np.arange(len(counts))
+    xlim = [0, max(len(counts), 1)]
+    ylim = [0, max(C.MAX_AGENT_QTY, counts.max(initial=0) + 1)]
+    handlers = []
+
+    for i, h in enumerate(lagoons):
+        hab_name = occupancy.hab_names[h]
+        color = C.COLORS.get(hab_name, 'black')
+        panel = fig.add_subplot(nrows, ncols, i + 1)
+        panel.set_xlim(xlim)
+        panel.set_ylim(ylim)
+        panel.tick_params(axis='y', colors=color)
+        panel.set_xlabel('Times')
+        panel.set_ylabel('Waterbirds', color=color)
+        panel.set_title('Distribution in {}'.format(hab_name), fontsize=13)
+        panel.set_prop_cycle(color=colors)
+        handlers = panel.plot(t, counts[:, h, :], '-o') # a line per agent's type
+
+    fig.legend(
+        handles=handlers,
+        labels=labels,
+        loc='lower left',
+        bbox_to_anchor=(0.05, 0.98, 0.92, .102),
+        ncol=len(labels), mode='expand',
+        borderaxespad=0., fancybox=True, shadow=True
+    )
+
+    fig.set_tight_layout(True) # Avoid panel overlaps
+    fig.suptitle('Simulation of Waterbirds in the Tropics', y=1.1, fontsize=14, fontweight='bold')
+    filename = os.path.join(C.GRAPH_DIR, uuid.uuid4().hex +'.pdf') # save in pdf format
+    plt.savefig(filename, bbox_inches='tight', pad_inches=0.1)
+    # plt.show()
+
+
+def finalize():
+    # summarize all snapshots in a GIF image
+    close_gif()
+    # display all snapshots' summary in a graph
+    plot_figure()
+    # track data for analysis
+    recorder = C.STORE['stats']
+    if recorder.writer is not None: # streamed along the process
+        recorder.close()
+        filename = recorder.writer.path
+    else:
+        df = recorder.to_frame()
+        datenow = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = os.path.join(C.GRAPH_DIR, datenow + '.csv')
+        df.to_csv(filename, index=None, header=True)
+    print(f'=> Statistics successfully saved at <{filename}>')
+    # occupancy of the habitats over time, alongside the statistics
+    filename = C.STORE['occupancy'].save(os.path.splitext(filename)[0] + '.npz')
+    print(f'=> Occupancy successfully saved at <{filename}>')
+    # timings of the phases, if enabled
+    probe = get_probe()
+    probe.close()
+    if probe.filename is not None:
+        print(f'=> Timings successfully saved at <{probe.filename}>')
+    # reset store
+    if C.STORE['renderer'] is not None:
+        C.STORE['renderer'].close()
+    reset()
+
+# ==============================================================================
+# END: Output
+# ==============================================================================
@@ -0,0 +1,146 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the background rendering of the snapshots in time
+
+# ==============================================================================
+# START: FramePipeline class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+from collections import deque # ordered queue
+from concurrent.futures import ProcessPoolExecutor # pool of workers
+import numpy as np # arithmetic computations
+from renderer import Renderer
+
+# renderer of the current worker process (see `_init_worker`)
+_RENDERER = None
+
+def _init_worker(*args):
+    global _RENDERER
+    import config
+    config.set_style() # same graphs' parameters as the main process
+    _RENDERER = Renderer(*args)
+
+
+def _render(x, y, codes, counter, png):
+    return _RENDERER.snapshot(x, y, codes, counter, png)
+
+
+# ------------------------------------------------------------------------------
+# FramePipeline class definition
+class FramePipeline:
+    """
+    An asynchronous rendering pipeline, where a pool of worker processes draws
+    the snapshots in time while the simulation keeps running.
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        the (built) habitats to display
+    types : list of string
+        the agents' types, whose order defines the type codes
+    colors : list of string
+        the color representation of each type of agents
+    labels : list of string
+        the legend label of each type of agents
+    dirname : string, default '.'
+        the directory where the snapshots are saved
+    workers : int, default 2
+        the number of worker processes, each owning its own `Renderer`
+    maxsize : int, default None
+        the maximum number of frames queued or being rendered. When reached,
+        `submit` blocks until the oldest frame is done (back-pressure). If not
+        specified, twice the number of workers.
+    on_frame : callable, default None
+        a function called with the result of every rendered frame, strictly in
+        the order of submission. The result is a tuple (image_path, frame), see
+        `Renderer.snapshot`.
+    png : bool, default True
+        whether to save every snapshot as a PNG image too
+
+    Notes
+    -----
+    The simulation only hands over copies of the position arrays, which are
+    cheap to transfer to the workers. Frames may be rendered out of order, but
+    they complete (`on_frame`) in the order they were submitted. A frame is not
+    kept once handed over to `on_frame`: at most `maxsize` frames are held at
+    any time, however long the process.
+    The snapshots of `main.py` are rendered in the background once enabled in
+    the configuration (`app.render.workers`, see `output.start_pipeline`).
+
+    Examples
+    --------
+    >>> with FramePipeline(habitats, types, colors, labels, C.SAMPLE_DIR) as pipeline:
+    ...     for time in range(1, 35):
+    ...         agents = update(habitats, agents, time)
+    ...         pipeline.submit(agents.x, agents.y, agents.codes, time)
+    """
+    def __init__(self, habitats, types, colors, labels, dirname='.', workers=2, maxsize=None, on_frame=None, png=True):
+        self.maxsize = maxsize or 2 * workers
+        self.on_frame = on_frame
+        self.png = png
+        self.count = 0 # completed frames
+        self.pending = deque()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(habitats, types, colors, labels, dirname)
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def submit(self, x, y, codes, counter=0):
+        """
+        Queue a snapshot of the agents to be rendered
+
+        Parameters
+        ----------
+        x, y : ndarray, shape (n,)
+            the coordinates of the agents
+        codes : ndarray of int, shape (n,)
+            the type codes of the agents
+        counter : int, default 0
+            the current processing unit
+        """
+        while len(self.pending) >= self.maxsize:
+            self._complete_one() # back-pressure
+        args = (np.array(x, copy=True), np.array(y, copy=True), np.array(codes, copy=True), counter, self.png)
+        self.pending.append(self.executor.submit(_render, *args))
+
+
+    def _complete_one(self):
+        result = self.pending.popleft().result() # oldest frame first
+        self.count += 1
+        if self.on_frame is not None:
+            self.on_frame(result)
+
+
+    def close(self):
+        """ Wait for all the queued frames, then stop the workers
+
+        Returns
+        -------
+        count : int
+            the number of rendered frames
+        """
+        try:
+            while len(self.pending) > 0:
+                self._complete_one()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        return self.count
+
+# ==============================================================================
+# END: FramePipeline class definition
+# ==============================================================================
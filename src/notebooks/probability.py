@@ -0,0 +1,154 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the cached probabilities of habitat use
+
+# ==============================================================================
+# START: ProbabilityTable class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+
+# ------------------------------------------------------------------------------
+# ProbabilityTable class definition
+class ProbabilityTable:
+    """
+    A memoized table of the probabilities of habitat use by agent's type and by
+    habitat, valid for one environment epoch.
+
+    Between two changes of the environment (e.g., rain events), the habitats'
+    properties are constant, and so is the distance between a habitat and its
+    closest human settlement. The probability for an agent to move into a
+    habitat then depends only on the agent's type and the target habitat.
+
+    Parameters
+    ----------
+    habitats : HabitatCollection
+        all the created habitats, whose order defines the habitat index
+    fns : dict
+        the compiled functions by agent's type and by environmental property:
+        { '5cm': { 'w': fn, 's': fn, 'f': fn, 'd': fn } }
+    metric : string = {'center', 'edge', 'point'}, default 'center'
+        how to measure the distance to the closest human settlement. With the
+        'point' metric, the distance depends on the agent's destination, so the
+        related probability is evaluated per agent (see `lookup`).
+
+    Attributes
+    ----------
+    types : list of string
+        the agents' types, whose order defines the type index
+    env : ndarray, shape (n_habitats, 4)
+        the water depth, salinity, food availability and minimal distance to a
+        human settlement of every habitat
+    probs : ndarray, shape (n_types, n_habitats, 4)
+        the probabilities related to each environmental property (w, s, f, d)
+    overall : ndarray, shape (n_types, n_habitats)
+        the overall probability of moving into a habitat
+    epoch : int, None
+        the environment epoch the table has been computed for
+
+    Examples
+    --------
+    >>> table = ProbabilityTable(habitats, C.FNS)
+    >>> table.refresh(epoch=0) # compute once for the current environment
+    >>> table.overall[table.types.index('5cm'), 0]
+    0.0540...
+    """
+    PENVS = ('w', 's', 'f', 'd')
+
+    def __init__(self, habitats, fns, metric='center'):
+        if metric not in habitats.METRICS:
+            raise ValueError(f'unknown distance metric <{metric}>. Use one of {list(habitats.METRICS)}')
+        self.habitats = habitats
+        self.fns = fns
+        self.metric = metric
+        self.types = list(fns.keys())
+        self.epoch = None
+
+        n_habs = len(habitats)
+        self.env = np.zeros((n_habs, len(self.PENVS)))
+        self.probs = np.zeros((len(self.types), n_habs, len(self.PENVS)))
+        self.overall = np.zeros((len(self.types), n_habs))
+
+        # static: distance between a habitat and its closest human settlement
+        if metric != 'point' and len(habitats.settlements) > 0:
+            self.env[:, 3] = habitats.settlement_distances(metric).min(axis=1)
+
+
+    def invalidate(self):
+        """ Discard the computed probabilities """
+        self.epoch = None
+
+
+    def refresh(self, epoch):
+        """
+        Recompute the table if it has not been computed for the given epoch
+
+        Parameters
+        ----------
+        epoch : int
+            the current environment epoch
+
+        Returns
+        -------
+        table : ProbabilityTable
+            the up-to-date table itself
+        """
+        if self.epoch == epoch:
+            return self
+
+        for i, h in enumerate(self.habitats):
+            self.env[i, :3] = [h.props.get(penv, 0) for penv in self.PENVS[:3]]
+
+        with np.errstate(all='ignore'): # human settlements have no properties
+            for k, _type in enumerate(self.types):
+                for j, penv in enumerate(self.PENVS):
+                    fn = self.fns[_type].get(penv)
+                    self.probs[k, :, j] = fn(self.env[:, j]) if fn is not None else 0
+        self.overall = np.prod(self.probs, axis=2)
+        self.epoch = epoch
+        return self
+
+
+    def lookup(self, k, hab_index, points=None):
+        """
+        Read the probabilities of habitat use for a batch of destinations
+
+        Parameters
+        ----------
+        k : int
+            the type index of the agents
+        hab_index : ndarray of int, shape (n,)
+            the habitat index of each destination
+        points : ndarray, shape (n, 2), default None
+            the destinations, required with the 'point' metric only
+
+        Returns
+        -------
+        env : ndarray, shape (n, 4)
+            the environmental values (w, s, f, d) of each destination
+        probs : ndarray, shape (n, 4)
+            the probabilities related to each environmental property
+        overall : ndarray, shape (n,)
+            the overall probability of moving to each destination
+        """
+        env = self.env[hab_index]
+        probs = self.probs[k, hab_index]
+        if self.metric != 'point':
+            return env, probs, self.overall[k, hab_index]
+
+        fn = self.fns[self.types[k]].get('d')
+        env[:, 3] = self.habitats.point_settlement_distances(points).min(axis=1)
+        probs[:, 3] = fn(env[:, 3]) if fn is not None else 0
+        return env, probs, np.prod(probs, axis=1)
+
+# ==============================================================================
+# END: ProbabilityTable class definition
+# ==============================================================================
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for a rasterized map of the habitats
+
+# ==============================================================================
+# START: HabitatRaster class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+from spatial import HabitatIndex
+
+BOUNDARY = -2 # label of the cells crossed by the outline of a habitat
+EPS = 1e-6 # margin (in cells) within which an outline is deemed to cross a cell
+
+# ------------------------------------------------------------------------------
+# HabitatRaster class definition
+class HabitatRaster:
+    """
+    A label grid of the habitats, locating the habitat that contains each point
+    with a single lookup, and drawing random points within the habitats.
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        the habitats to burn into the grid
+    resolution : int, default 512
+        the number of cells along each axis of the grid covering the habitats
+
+    Attributes
+    ----------
+    labels : ndarray of int32, shape (resolution, resolution)
+        the label of each cell (indexed by x then y): the index of the habitat
+        (within `habitats`) covering the whole cell, -1 if none, or `BOUNDARY`
+        if the outline of a habitat crosses the cell
+    index : HabitatIndex
+        the exact locator of the points within the boundary cells
+
+    Notes
+    -----
+    A cell that no outline crosses lies within the same habitats everywhere, so
+    it is labelled after its center, as are its neighbours along the same
+    column up to the next boundary cell. The points within the boundary cells
+    are located with the exact polygon tests (see `HabitatIndex`), hence
+    `locate` gives the same results as `HabitatIndex.locate`, whatever the
+    resolution: the resolution only trades memory for the share of exact tests.
+
+    Examples
+    --------
+    >>> raster = HabitatRaster(habitats, resolution=1024)
+    >>> raster.locate([(0.75, 0.6), (0.0, 0.0)])
+    array([ 0, -1])
+    >>> points, hab_index = raster.sample(1000, rng, return_index=True)
+    """
+    def __init__(self, habitats, resolution=512):
+        self.habitats = habitats
+        self.index = HabitatIndex(habitats)
+        self.extent = self.index.extent
+        self.cells = max(int(resolution), 1)
+        self.cell_size = np.maximum((self.extent[2:] - self.extent[:2]) / self.cells, np.finfo(float).eps)
+
+        # contiguous interior cells (along y) lie within the same habitats: one
+        # exact test per run of cells, at the center of its first cell
+        interior = ~self._burn_outlines([h.get_vertices() for h in habitats])
+        starts = interior & ~np.pad(interior, ((0, 0), (1, 0)))[:, :-1]
+        runs = np.cumsum(starts.ravel()) - 1
+        centers = self.extent[:2] + (np.column_stack(np.nonzero(starts)) + 0.5) * self.cell_size
+        self.labels = np.full((self.cells, self.cells), BOUNDARY, dtype=np.int32)
+        self.labels.ravel()[interior.ravel()] = self.index.locate(centers)[runs[interior.ravel()]]
+
+        # cells to draw random points from: any cell that may hold a habitat
+        self.candidates = np.flatnonzero(self.labels.ravel() != -1)
+
+
+    def _burn_outlines(self, vertices):
+        """ Mark the cells crossed by any edge of the outlines (supercover) """
+        n = self.cells
+        edges = [
+            np.column_stack((v, np.roll(v, -1, axis=0))) for v in vertices if len(v) > 0
+        ]
+        if len(edges) == 0:
+            return np.zeros((n, n), dtype=bool)
+        x0, y0, x1, y1 = (np.concatenate(edges).T - np.tile(self.extent[:2], 2)[:, None]) \
+            / np.tile(self.cell_size, 2)[:, None] # in cells
+
+        # every column an edge goes through
+        lo = np.clip(np.floor(np.minimum(x0, x1) - EPS).astype(int), 0, n - 1)
+        hi = np.clip(np.floor(np.maximum(x0, x1) + EPS).astype(int), 0, n - 1)
+        counts = hi - lo + 1
+        edge = np.repeat(np.arange(len(x0)), counts)
+        cx = lo[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        # the span of the edge within each column
+        dx = x1[edge] - x0[edge]
+        vertical = dx == 0
+        dx[vertical] = 1.0
+        ta = np.where(vertical, 0.0, np.clip((cx - EPS - x0[edge]) / dx, 0, 1))
+        tb = np.where(vertical, 1.0, np.clip((cx + 1 + EPS - x0[edge]) / dx, 0, 1))
+        dy = y1[edge] - y0[edge]
+        ya, yb = y0[edge] + ta * dy, y0[edge] + tb * dy
+        ylo = np.clip(np.floor(np.minimum(ya, yb) - EPS).astype(int), 0, n - 1)
+        yhi = np.clip(np.floor(np.maximum(ya, yb) + EPS).astype(int), 0, n - 1)
+
+        # mark the rows [ylo, yhi] of each column at once (difference array)
+        marks = np.zeros((n, n + 1), dtype=np.int32)
+        np.add.at(marks, (cx, ylo), 1)
+        np.add.at(marks, (cx, yhi + 1), -1)
+        return np.cumsum(marks, axis=1)[:, :n] > 0
+
+
+    def _cells(self, points):
+        cxy = np.floor((points - self.extent[:2]) / self.cell_size).astype(int)
+        return np.clip(cxy, 0, self.cells - 1)
+
+
+    def locate(self, points):
+        """
+        Determine in which habitat dwells each point
+
+        Parameters
+        ----------
+        points : array-like, shape (n, 2)
+            the x- and y-coordinates of the Cartersian plane
+
+        Returns
+        -------
+        indices : ndarray of int, shape (n,)
+            the index (within `habitats`) of the habitat that contains each
+            point, or -1 if the point is not contained in any of the habitats.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        result = np.full(len(points), -1, dtype=int)
+        valid = np.flatnonzero(np.all((points >= self.extent[:2]) & (points <= self.extent[2:]), axis=1))
+        cxy = self._cells(points[valid])
+        result[valid] = self.labels[cxy[:, 0], cxy[:, 1]]
+
+        boundary = np.flatnonzero(result == BOUNDARY)
+        if len(boundary) > 0:
+            result[boundary] = self.index.locate(points[boundary])
+        return result
+
+
+    def sample(self, n, rng=None, return_index=False):
+        """
+        Draw random points uniformly distributed over the habitats: a cell is
+        drawn among the ones that may hold a habitat, then a point within it,
+        which is drawn again if it falls out of the habitats (boundary cells).
+
+        Parameters
+        ----------
+        n : int
+            the number of points to draw
+        rng : numpy.random.Generator, default None
+            the random generator to draw from. If not specified, the global
+            numpy random state is used.
+        return_index : bool, default False
+            If True, also return the index of the habitat containing each point
+
+        Returns
+        -------
+        points : ndarray, shape (n, 2)
+            the random points
+        hab_index : ndarray of int, shape (n,)
+            (only if `return_index`) the habitat index of each point
+        """
+        if len(self.candidates) == 0:
+            raise ValueError('cannot sample points within habitats of no area.')
+        rng = np.random if rng is None else rng
+        points = np.empty((n, 2))
+        hab_index = np.full(n, -1, dtype=int)
+        pending = np.arange(n)
+
+        while len(pending) > 0:
+            u = rng.random((len(pending), 3))
+            cells = self.candidates[np.minimum((u[:, 0] * len(self.candidates)).astype(int), len(self.candidates) - 1)]
+            cxy = np.column_stack(np.unravel_index(cells, self.labels.shape))
+            points[pending] = self.extent[:2] + (cxy + u[:, 1:]) * self.cell_size
+
+            labels = self.labels[cxy[:, 0], cxy[:, 1]]
+            boundary = labels == BOUNDARY
+            labels[boundary] = self.index.locate(points[pending[boundary]])
+            hab_index[pending] = labels
+            pending = pending[labels < 0] # out of the habitats: draw again
+
+        return (points, hab_index) if return_index else points
+
+# ==============================================================================
+# END: HabitatRaster class definition
+# ==============================================================================
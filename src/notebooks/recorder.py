@@ -0,0 +1,410 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Recording and streaming of the agents' statistics
+
+# ==============================================================================
+# START: Recorder
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import queue # bounded buffer
+import threading # background writer
+import importlib.util # optional dependencies
+import numpy as np # arithmetic computations
+
+# ------------------------------------------------------------------------------
+# StatsRecorder class definition
+class StatsRecorder:
+    """
+    A columnar store of the statistics tracked for every agent at every unit of
+    time, backed by preallocated numpy arrays.
+
+    Parameters
+    ----------
+    capacity : int
+        the number of rows to preallocate (e.g., agents x time steps). The
+        columns grow on demand if more rows are recorded. With a writer, this is
+        the number of rows kept in memory before being flushed.
+    agent_names : list of string
+        the names of the agents, indexed by agent code (their id)
+    hab_names : list of string
+        the ids of the habitats, indexed by habitat code (their index)
+    hab_types : list
+        the types of the habitats, indexed by habitat code
+    writer : StatsWriter, default None
+        if given, the recorded rows are streamed to it in chunks of `capacity`
+        rows, so that the memory used stays flat along the process.
+
+    Notes
+    -----
+    Names are stored as integer codes (categories): the agents by id and the
+    habitats by index. `to_frame` turns them into categorical columns without
+    copying the numeric columns.
+
+    Examples
+    --------
+    >>> recorder = StatsRecorder(22 * 34, agents.names(), hab_names, hab_types)
+    >>> recorder.record_batch(1, agents.ids, agents.x, agents.y, hab_index, env, probs, prob, moved)
+    >>> df = recorder.to_frame() # same columns as the former C.STORE['stats']
+    """
+    COLUMNS = (
+        ('processing_unit', np.int32),
+        ('agent_name', np.int32), # agent code
+        ('agent_x', np.float64),
+        ('agent_y', np.float64),
+        ('hab_name', np.int16), # habitat code
+        ('hab_water_depth', np.float64),
+        ('hab_salinity', np.float64),
+        ('hab_food', np.float64),
+        ('hab_distance', np.float64),
+        ('prob_overall', np.float64),
+        ('prob_water', np.float64),
+        ('prob_salinity', np.float64),
+        ('prob_food', np.float64),
+        ('prob_distance', np.float64),
+        ('has_moved', np.bool_),
+    )
+    FIELDS = (
+        'processing_unit', 'agent_name', 'agent_x', 'agent_y', 'hab_name',
+        'hab_type', 'hab_water_depth', 'hab_salinity', 'hab_food', 'hab_distance',
+        'prob_overall', 'prob_water', 'prob_salinity', 'prob_food',
+        'prob_distance', 'has_moved'
+    )
+
+    def __init__(self, capacity, agent_names, hab_names, hab_types, writer=None):
+        self.writer = writer
+        self.agent_names = list(agent_names)
+        self.hab_names = list(hab_names)
+        self.hab_types = list(hab_types)
+        self.size = 0
+        self.columns = {k: np.empty(max(int(capacity), 1), dtype=t) for k, t in self.COLUMNS}
+
+        self.__agent_codes = {name: i for i, name in enumerate(self.agent_names)}
+        self.__hab_codes = dict()
+        for i, name in enumerate(self.hab_names):
+            self.__hab_codes.setdefault(name, i)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.columns['processing_unit'])
+
+    @property
+    def nbytes(self):
+        """The memory consumed by the columns"""
+        return sum(col.nbytes for col in self.columns.values())
+
+
+    def _reserve(self, n):
+        if self.size + n <= self.capacity:
+            return
+        if self.writer is not None:
+            self.flush()
+            if n <= self.capacity:
+                return
+        capacity = max(2 * self.capacity, self.size + n)
+        for k, col in self.columns.items():
+            grown = np.empty(capacity, dtype=col.dtype)
+            grown[:self.size] = col[:self.size]
+            self.columns[k] = grown
+
+
+    def record_batch(self, processing_unit, agents, agent_x, agent_y, habs, env, probs, prob, moved):
+        """
+        Record the statistics of a batch of agents at once
+
+        Parameters
+        ----------
+        processing_unit : int
+            the current unit of time
+        agents : ndarray of int, shape (n,)
+            the agent codes (ids)
+        agent_x, agent_y : ndarray, shape (n,)
+            the positions of the agents after the update
+        habs : ndarray of int, shape (n,)
+            the habitat codes of the agents' destinations
+        env : ndarray, shape (n, 4)
+            the water depth, salinity, food and distance of the destinations
+        probs : ndarray, shape (n, 4)
+            the related probabilities
+        prob : ndarray, shape (n,)
+            the overall probabilities
+        moved : ndarray of bool, shape (n,)
+            whether the agents moved
+        """
+        n = len(agents)
+        self._reserve(n)
+        rows = slice(self.size, self.size + n)
+        cols = self.columns
+        cols['processing_unit'][rows] = processing_unit
+        cols['agent_name'][rows] = agents
+        cols['agent_x'][rows] = agent_x
+        cols['agent_y'][rows] = agent_y
+        cols['hab_name'][rows] = habs
+        for j, k in enumerate(('hab_water_depth', 'hab_salinity', 'hab_food', 'hab_distance')):
+            cols[k][rows] = env[:, j]
+        for j, k in enumerate(('prob_water', 'prob_salinity', 'prob_food', 'prob_distance')):
+            cols[k][rows] = probs[:, j]
+        cols['prob_overall'][rows] = prob
+        cols['has_moved'][rows] = moved
+        self.size += n
+
+
+    def record(self, **row):
+        """
+        Record the statistics of a single agent
+
+        Parameters
+        ----------
+        **row
+            the values keyed by field name (see `FIELDS`), where the agent and
+            the habitat are given by name.
+        """
+        self._reserve(1)
+        for k, _ in self.COLUMNS:
+            value = row[k]
+            if k == 'agent_name':
+                value = self.__agent_codes[value]
+            elif k == 'hab_name':
+                value = self.__hab_codes[value]
+            self.columns[k][self.size] = value
+        self.size += 1
+
+
+    def flush(self):
+        """ Hand over the recorded rows to the writer (if any), then clear them """
+        if self.writer is None or self.size == 0:
+            return
+        self.writer.write(self.to_frame(copy=True))
+        self.clear()
+
+
+    def close(self):
+        """ Flush the remaining rows and wait for the writer to finish """
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+
+
+    def clear(self):
+        """ Forget the recorded rows, keeping the allocated columns """
+        self.size = 0
+
+
+    def restore(self, columns):
+        """
+        Replace the recorded rows (e.g., from a checkpoint)
+
+        Parameters
+        ----------
+        columns : dict
+            the arrays of the rows, keyed by column (see `COLUMNS`)
+        """
+        self.clear()
+        n = len(columns['processing_unit'])
+        if n > self.capacity: # kept in memory whatever the writer
+            for k, col in self.columns.items():
+                self.columns[k] = np.empty(n, dtype=col.dtype)
+        for k, col in self.columns.items():
+            col[:n] = columns[k]
+        self.size = n
+
+
+    def to_frame(self, copy=False):
+        """
+        Convert the recorded rows into a pandas DataFrame
+
+        Parameters
+        ----------
+        copy : bool, default False
+            If True, the numeric columns are copied, so that the frame outlives
+            the recorded rows (e.g., after `clear`).
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            the statistics, one row per agent and unit of time. The numeric
+            columns are views of the recorded arrays (no copy), the names are
+            categorical.
+        """
+        import pandas as pd # dataframe handling
+
+        data = {k: col[:self.size].copy() if copy else col[:self.size] for k, col in self.columns.items()}
+        hab_codes = data['hab_name']
+        data['agent_name'] = pd.Categorical.from_codes(data['agent_name'], self.agent_names)
+        data['hab_name'] = _categorical(pd, self.hab_names, hab_codes)
+        data['hab_type'] = _categorical(pd, self.hab_types, hab_codes)
+        return pd.DataFrame({k: data[k] for k in self.FIELDS}, copy=False)
+
+
+# ------------------------------------------------------------------------------
+# StatsWriter class definition
+class StatsWriter:
+    """
+    A streaming writer of the statistics, where chunks of rows are written to
+    disk by a background thread while the simulation keeps running.
+
+    Parameters
+    ----------
+    basename : string
+        the path of the output without extension (e.g., 'graphs/20200106_1633')
+    fmt : string = {'parquet', 'csv'}, default 'parquet'
+        the output format. Parquet (binary, columnar) requires pyarrow or
+        fastparquet; CSV is used as a fallback when neither is installed.
+    maxsize : int, default 4
+        the maximum number of chunks waiting to be written. When reached,
+        `write` blocks until a chunk is done (back-pressure).
+
+    Attributes
+    ----------
+    path : string
+        the output: a directory of part files for Parquet (one complete file per
+        chunk), or a single file for CSV (appended and flushed per chunk)
+    nbytes : int
+        the number of bytes written so far
+
+    Notes
+    -----
+    Every chunk is complete on disk as soon as it is written, so that a process
+    interrupted midway leaves all the previously flushed rows usable: a Parquet
+    part is written under a hidden temporary name first (ignored by the readers
+    of the directory), then renamed. The writer thread does not keep the
+    process alive: close the recorder (e.g., in a `finally` clause) so that the
+    queued chunks are not lost on failure.
+
+    Examples
+    --------
+    >>> writer = StatsWriter(os.path.join(C.GRAPH_DIR, '20200106_163332'))
+    >>> recorder = StatsRecorder(100000, names, hab_names, hab_types, writer)
+    >>> ... # record
+    >>> recorder.close() # flush the remaining rows, wait for the writer
+    >>> df = pd.read_parquet(writer.path)
+    """
+    def __init__(self, basename, fmt='parquet', maxsize=4):
+        if fmt not in ('parquet', 'csv'):
+            raise ValueError(f'unknown format <{fmt}> for the statistics. Use parquet or csv')
+        if fmt == 'parquet' and not has_parquet():
+            print('The statistics are saved as CSV (install pyarrow for Parquet).')
+            fmt = 'csv'
+        self.fmt = fmt
+        self.path = basename + ('.parquet' if fmt == 'parquet' else '.csv')
+        self.chunks = 0
+        self.nbytes = 0
+        if fmt == 'parquet':
+            os.makedirs(self.path, exist_ok=True)
+
+        self.__error = None
+        self.__queue = queue.Queue(maxsize=maxsize)
+        self.__thread = threading.Thread(target=self._run, name='stats-writer', daemon=True)
+        self.__thread.start()
+
+
+    def _run(self):
+        while True:
+            df = self.__queue.get()
+            try:
+                if df is None:
+                    return
+                if self.__error is None:
+                    self._write_chunk(df)
+            except Exception as e: # reported to the simulation thread
+                self.__error = e
+            finally:
+                self.__queue.task_done()
+
+
+    def _write_chunk(self, df):
+        if self.fmt == 'parquet':
+            filename = os.path.join(self.path, 'part-{:05d}.parquet'.format(self.chunks))
+            tmpname = os.path.join(self.path, '.' + os.path.basename(filename) + '.tmp')
+            for k in df.columns: # parquet requires homogeneous categories
+                if hasattr(df[k], 'cat') and df[k].cat.categories.dtype == object:
+                    df[k] = df[k].cat.rename_categories(str)
+            with open(tmpname, 'wb') as f:
+                df.to_parquet(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpname, filename) # never a truncated part
+            self.nbytes += os.path.getsize(filename)
+        else:
+            with open(self.path, 'a', newline='') as f:
+                df.to_csv(f, index=None, header=self.chunks == 0)
+                f.flush()
+                os.fsync(f.fileno())
+            self.nbytes = os.path.getsize(self.path)
+        self.chunks += 1
+
+
+    def _check(self):
+        if self.__error is not None:
+            raise IOError(f'the statistics cannot be written at <{self.path}>') from self.__error
+
+
+    def write(self, df):
+        """ Queue a chunk (pandas DataFrame) of statistics to be written """
+        self._check()
+        self.__queue.put(df)
+
+
+    def sync(self):
+        """ Wait for all the queued chunks to be written """
+        self.__queue.join()
+        self._check()
+
+
+    def resume(self, chunks, nbytes):
+        """
+        Continue an output where it was after `chunks` chunks (e.g., from a
+        checkpoint), discarding whatever was written after them
+
+        Parameters
+        ----------
+        chunks : int
+            the number of chunks written
+        nbytes : int
+            the number of bytes written
+        """
+        self.sync()
+        if self.fmt == 'parquet':
+            for name in os.listdir(self.path):
+                if name.startswith('.part-') or (name.startswith('part-') and int(name[5:10]) >= chunks):
+                    os.remove(os.path.join(self.path, name))
+        elif os.path.exists(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(nbytes)
+        self.chunks, self.nbytes = chunks, nbytes
+
+
+    def close(self):
+        """ Wait for all the queued chunks to be written, then stop the thread """
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        self._check()
+
+
+def has_parquet():
+    """ Check whether a Parquet engine (pyarrow or fastparquet) is installed """
+    return any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet'))
+
+
+def _categorical(pd, values, codes):
+    """ Build the categorical column of `values[codes]`, where `values` may hold
+    duplicates (e.g., the ids of the human settlements) """
+    categories = list(dict.fromkeys(values)) # unique, ordered
+    lookup = np.array([categories.index(v) for v in values], dtype=np.int32)
+    return pd.Categorical.from_codes(lookup[codes], categories)
+
+# ==============================================================================
+# END: Recorder
+# ==============================================================================
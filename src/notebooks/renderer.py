@@ -0,0 +1,204 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the rendering of the snapshots in time
+
+# ==============================================================================
+# START: Renderer class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import copy as cp # copier
+import imageio as gm # gif maker
+import numpy as np # arithmetic computations
+from matplotlib.figure import Figure # figure without global state
+from matplotlib.backends.backend_agg import FigureCanvasAgg # raster canvas
+
+# ------------------------------------------------------------------------------
+# Renderer class definition
+class Renderer:
+    """
+    A persistent figure plotting the agents within the habitats, built once and
+    then updated at every snapshot in time.
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        the (built) habitats to display
+    types : list of string
+        the agents' types, whose order defines the type codes
+    colors : list of string
+        the color representation of each type of agents
+    labels : list of string
+        the legend label of each type of agents
+    dirname : string, default '.'
+        the directory where the snapshots are saved
+
+    Notes
+    -----
+    The habitat patches, the legend and the axes are created in the constructor
+    only. Each type of agents is drawn as a single line artist whose data is
+    replaced at every snapshot, so that drawing a snapshot costs no more than
+    the rasterization of the figure, once: the PNG image, if any, is encoded
+    from the same pixels as the frame of the GIF image.
+
+    Examples
+    --------
+    >>> renderer = Renderer(habitats, agents.types, colors, labels, C.SAMPLE_DIR)
+    >>> renderer.draw(agents.x, agents.y, agents.codes, counter=0) # 1.png
+    >>> renderer.close()
+    """
+    def __init__(self, habitats, types, colors, labels, dirname='.'):
+        self.habitats = habitats
+        self.types = list(types)
+        self.dirname = dirname
+
+        self.fig = Figure()
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot(111)
+
+        # artists to display (with indicator): one legend entry per label
+        handler_artists, seen = [], set()
+        for h in habitats:
+            artist = cp.copy(h.artist) # an artist belongs to a single figure
+            artist.set_linewidth(1)
+            self.ax.add_patch(artist)
+            if artist.get_label() not in seen:
+                seen.add(artist.get_label())
+                handler_artists.append(artist)
+
+        self.lines = []
+        for c, l in zip(colors, labels):
+            line, = self.ax.plot([], [], 'o', mec=c, mfc=c, ms=3, label=l)
+            self.lines.append(line)
+        handler_artists.extend(self.lines)
+
+        # additional settings for the plot
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(0, 1)
+        self.ax.get_xaxis().set_visible(False)
+        self.ax.get_yaxis().set_visible(False)
+        self.ax.legend(
+            handles=handler_artists, loc='upper left', fontsize=10,
+            bbox_to_anchor=(1.02, 1), borderaxespad=0.
+        )
+        self.fig.subplots_adjust(left=0.02, right=0.80) # keep the legend on the canvas
+
+
+    def update(self, x, y, codes, counter=0):
+        """
+        Update the agents' positions and the titles of the figure
+
+        Parameters
+        ----------
+        x, y : ndarray, shape (n,)
+            the coordinates of the agents
+        codes : ndarray of int, shape (n,)
+            the type codes of the agents
+        counter : int, default 0
+            the current processing unit
+        """
+        for k, line in enumerate(self.lines):
+            selected = codes == k
+            line.set_data(x[selected], y[selected])
+        self.ax.set_xlabel('Time ' + str(counter + 1))
+        self.ax.set_title('Snapshot in time ' + str(counter + 1), fontsize=12) # Identify which image is plotted
+
+
+    def draw(self, x, y, codes, counter=0):
+        """
+        Plot a snapshot of the agents and save it as `<counter + 1>.png`
+
+        Returns
+        -------
+        image_path : string
+            the path of the saved image
+        """
+        return self.snapshot(x, y, codes, counter, png=True)[0]
+
+
+    def frame(self, x, y, codes, counter=0):
+        """
+        Plot a snapshot of the agents and take it straight from the canvas
+
+        Returns
+        -------
+        frame : ndarray of uint8, shape (height, width, 3)
+            the RGB pixels of the figure
+        """
+        self.update(x, y, codes, counter)
+        self.canvas.draw()
+        return np.asarray(self.canvas.buffer_rgba())[:, :, :3].copy()
+
+
+    def snapshot(self, x, y, codes, counter=0, png=True):
+        """
+        Plot a snapshot of the agents as a frame and, optionally, as a PNG image
+
+        Returns
+        -------
+        image_path : string, None
+            the path of the saved image, if any
+        frame : ndarray of uint8, shape (height, width, 3)
+            the RGB pixels of the figure
+        """
+        frame = self.frame(x, y, codes, counter)
+        image_path = None
+        if png:
+            image_path = os.path.join(self.dirname, str(counter + 1) + '.png')
+            gm.imwrite(image_path, frame)
+        return image_path, frame
+
+
+    def close(self):
+        """ Release the figure """
+        self.fig.clear()
+
+
+# ------------------------------------------------------------------------------
+# GifWriter class definition
+class GifWriter:
+    """
+    A streaming GIF encoder, where the frames are appended as they are rendered
+    so that only one frame is held in memory at a time.
+
+    Parameters
+    ----------
+    filename : string
+        the path of the GIF image
+
+    Examples
+    --------
+    >>> with GifWriter('snapshots.gif') as gif:
+    ...     gif.append(renderer.frame(agents.x, agents.y, agents.codes))
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.count = 0
+        self.writer = gm.get_writer(filename, mode='I')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, frame):
+        """ Encode a frame (ndarray of shape (height, width, 3)) """
+        self.writer.append_data(frame)
+        self.count += 1
+
+    def close(self):
+        """ Finish the GIF image """
+        self.writer.close()
+
+# ==============================================================================
+# END: Renderer class definition
+# ==============================================================================
@@ -0,0 +1,141 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the sampling of random points within the habitats
+
+# ==============================================================================
+# START: HabitatSampler class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+from geometry import polygon_area, is_rectangle, triangulate
+
+# ------------------------------------------------------------------------------
+# HabitatSampler class definition
+class HabitatSampler:
+    """
+    A direct sampler of random points uniformly distributed over a set of
+    (non-overlapping) habitats.
+
+    Each habitat is decomposed into pieces: a single piece for axis-aligned
+    rectangles, or the triangles of a triangulation for general polygons. A
+    piece is chosen with a probability proportional to its area, then a point
+    is drawn within it. No point is ever rejected.
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        the habitats to sample points from
+
+    Attributes
+    ----------
+    area : float
+        the total area covered by the habitats
+
+    Examples
+    --------
+    >>> sampler = HabitatSampler(habitats)
+    >>> points, hab_index = sampler.sample(1000, return_index=True)
+    >>> points.shape
+    (1000, 2)
+    """
+    def __init__(self, habitats):
+        self.habitats = habitats
+
+        origins, edges1, edges2, triangles, owners, areas = [], [], [], [], [], []
+        for i, h in enumerate(habitats):
+            vertices = h.get_vertices()
+            if is_rectangle(vertices):
+                (x0, y0), (x1, y1) = vertices.min(axis=0), vertices.max(axis=0)
+                origins.append((x0, y0))
+                edges1.append((x1 - x0, 0.0))
+                edges2.append((0.0, y1 - y0))
+                triangles.append(False)
+                owners.append(i)
+                areas.append(polygon_area(vertices))
+                continue
+            for a, b, c in triangulate(vertices):
+                origins.append(a)
+                edges1.append(b - a)
+                edges2.append(c - a)
+                triangles.append(True)
+                owners.append(i)
+                areas.append(polygon_area((a, b, c)))
+
+        self.origins = np.array(origins, dtype=float).reshape(-1, 2)
+        self.edges1 = np.array(edges1, dtype=float).reshape(-1, 2)
+        self.edges2 = np.array(edges2, dtype=float).reshape(-1, 2)
+        self.triangles = np.array(triangles, dtype=bool)
+        self.owners = np.array(owners, dtype=int)
+        self.area = float(np.sum(areas))
+        self.cumulative = np.cumsum(areas) / self.area if self.area > 0 else np.array([])
+
+
+    def transform(self, u):
+        """
+        Map uniform random numbers onto points within the habitats
+
+        Parameters
+        ----------
+        u : ndarray, shape (n, 3)
+            uniform random numbers in [0, 1): the first column chooses the piece
+            (area-weighted), the remaining ones locate the point within it.
+
+        Returns
+        -------
+        points : ndarray, shape (n, 2)
+            the random points
+        hab_index : ndarray of int, shape (n,)
+            the index (within `habitats`) of the habitat containing each point
+        """
+        if len(self.owners) == 0:
+            raise ValueError('cannot sample points within habitats of no area.')
+        pieces = np.searchsorted(self.cumulative, u[:, 0], side='right')
+        pieces = np.minimum(pieces, len(self.owners) - 1)
+        a, b = u[:, 1].copy(), u[:, 2].copy()
+
+        # fold the upper half of the parallelogram onto the triangle
+        fold = self.triangles[pieces] & (a + b > 1)
+        a[fold], b[fold] = 1 - a[fold], 1 - b[fold]
+
+        points = self.origins[pieces] \
+            + a[:, None] * self.edges1[pieces] \
+            + b[:, None] * self.edges2[pieces]
+        return points, self.owners[pieces]
+
+
+    def sample(self, n, rng=None, return_index=False):
+        """
+        Draw random points uniformly distributed over the habitats
+
+        Parameters
+        ----------
+        n : int
+            the number of points to draw
+        rng : numpy.random.Generator, default None
+            the random generator to draw from. If not specified, the global
+            numpy random state is used.
+        return_index : bool, default False
+            If True, also return the index of the habitat containing each point
+
+        Returns
+        -------
+        points : ndarray, shape (n, 2)
+            the random points
+        hab_index : ndarray of int, shape (n,)
+            (only if `return_index`) the habitat index of each point
+        """
+        rng = np.random if rng is None else rng
+        points, hab_index = self.transform(rng.random((n, 3)))
+        return (points, hab_index) if return_index else points
+
+# ==============================================================================
+# END: HabitatSampler class definition
+# ==============================================================================
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for a self-contained simulation of the process
+
+# ==============================================================================
+# START: Simulation class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import copy
+import numpy as np # arithmetic computations
+
+import config
+import constants as C
+from core import create_patches, create_agents, update_environment, ENGINES
+from probability import ProbabilityTable
+from recorder import StatsRecorder
+from occupancy import Occupancy
+from instrument import NULL_PROBE
+from checkpoint import Checkpoint
+
+# ------------------------------------------------------------------------------
+# Simulation class definition
+class Simulation:
+    """
+    A realisation of the process that owns its whole state: configuration,
+    habitats, agents, random generator, probabilities and recorders. Unlike the
+    functions of `core` driven by `initialize` and `update`, it does not rely on
+    the state of the module `constants` (`STORE`), so that several simulations
+    can live side by side in the same process, even in different threads.
+
+    Parameters
+    ----------
+    cnf : dict, default None
+        the application configuration. If not specified, use the loaded one
+        (`config.load_config`). It is copied, hence never modified.
+    seed : int or numpy.random.SeedSequence, default None
+        the seed of the random generator, if `rng` is not given
+    rng : numpy.random.Generator, default None
+        the source of randomness
+    engine : string = {'vectorized', 'reference'}, default None
+        the update engine (see `core.update`). If not specified, use the engine
+        set in the configuration (`app.engine`).
+    record : bool, default True
+        whether to record the agents' statistics (see `StatsRecorder`)
+    capacity : int, default None
+        the number of rows of statistics allocated at once. If not specified,
+        room for the entire process.
+    probe : Probe, default None
+        the timers of the phases and counters, reported once per unit of time
+        (see `instrument`). If not specified, nothing is measured.
+
+    Attributes
+    ----------
+    settings : namespace
+        the values derived from the configuration (see `constants.settings`)
+    time : int
+        the current unit of time (0 once created)
+    habitats : HabitatCollection
+        the habitats, whose properties change over time
+    agents : Population
+        the agents
+    table : ProbabilityTable
+        the probabilities of habitat use, up to date with the environment
+    recorder : StatsRecorder, None
+        the agents' statistics, if recorded
+    occupancy : Occupancy
+        the occupancy of the habitats over time
+
+    Examples
+    --------
+    >>> sim = Simulation(seed=2019)
+    >>> sim.step() # one unit of time
+    >>> sim.run() # up to the end of the process (`app.counter`)
+    >>> results = sim.results()
+    >>> results['occupancy'].shape # (time, habitat, agent's type)
+    (35, 7, 4)
+
+    Save the state along the way, and resume from it (e.g., once pre-empted)
+    >>> sim.checkpoint('checkpoint.npz')
+    >>> sim = Simulation.resume('checkpoint.npz').run()
+    """
+    def __init__(self, cnf=None, seed=None, rng=None, engine=None, record=True, capacity=None, probe=None):
+        self.config = copy.deepcopy(cnf if cnf is not None else config.load_config())
+        self.settings = C.settings(self.config)
+        self.engine = engine or self.settings.ENGINE
+        if self.engine not in ENGINES:
+            raise ValueError(f'unknown engine <{self.engine}>. Use one of {list(ENGINES)}')
+        self.rng = rng if rng is not None else np.random.default_rng(seed)
+        self.probe = probe if probe is not None else NULL_PROBE
+
+        self.time = 0
+        self.epoch = 0
+        self.habitats = create_patches(self.settings)
+        self.table = ProbabilityTable(self.habitats, self.settings.FNS, self.settings.DISTANCE)
+        self.table.refresh(self.epoch)
+        self.agents = create_agents(self.habitats, self.rng, self.settings)
+
+        hab_names = [h.id for h in self.habitats]
+        hab_types = [h.type for h in self.habitats]
+        self.recorder = None
+        if record:
+            if capacity is None:
+                capacity = len(self.agents) * max(self.settings.PROCESSING_TIME - 1, 1)
+            self.recorder = StatsRecorder(capacity, self.agents.names(), hab_names, hab_types)
+        self.occupancy = Occupancy(hab_names, self.agents.types, hab_types, self.settings.PROCESSING_TIME)
+        self.occupancy.reset(self.agents.habs, self.agents.codes)
+        self.occupancy.record()
+        self.probe.step(self.time)
+
+    def __len__(self):
+        return self.time + 1 # number of recorded units of time
+
+    @property
+    def done(self):
+        """Whether the process reached its end (`app.counter`)"""
+        return self.time >= self.settings.PROCESSING_TIME - 1
+
+
+    def step(self):
+        """
+        Update the environment and the agents in one unit of time
+
+        Returns
+        -------
+        sim : Simulation
+            the simulation itself
+        """
+        self.time += 1
+        with self.probe.phase('environment'):
+            if update_environment(self.habitats, self.time, self.settings):
+                self.epoch += 1
+                self.table.refresh(self.epoch)
+
+        recorder = self.recorder if self.recorder is not None else _NullRecorder()
+        ENGINES[self.engine](
+            self.habitats, self.agents, self.time, recorder, self.occupancy,
+            self.rng, self.table, self.settings, self.probe
+        )
+        with self.probe.phase('counting'):
+            self.occupancy.record()
+        self.probe.step(self.time)
+        return self
+
+
+    def run(self, n=None):
+        """
+        Run several units of time
+
+        Parameters
+        ----------
+        n : int, default None
+            the number of units of time. If not specified, run up to the end of
+            the process (`app.counter`).
+
+        Returns
+        -------
+        sim : Simulation
+            the simulation itself
+        """
+        n = self.settings.PROCESSING_TIME - 1 - self.time if n is None else n
+        for _ in range(max(n, 0)):
+            self.step()
+        return self
+
+
+    def checkpoint(self, filename):
+        """
+        Save the state of the simulation, to resume from (see `resume`)
+
+        Returns
+        -------
+        filename : string
+            the saved checkpoint (see `checkpoint.Checkpoint`)
+        """
+        checkpoint = Checkpoint.capture(
+            self.time, self.habitats, self.agents, self.occupancy, self.recorder,
+            self.rng, self.epoch, self.config
+        )
+        return checkpoint.save(filename)
+
+
+    @classmethod
+    def resume(cls, filename, engine=None, probe=None):
+        """
+        Restore a simulation saved with `checkpoint`, which then continues as
+        if it had never stopped
+
+        Parameters
+        ----------
+        filename : string
+            the checkpoint
+        engine : string, default None
+            the update engine. If not specified, use the one of the saved
+            configuration.
+        probe : Probe, default None
+            the timers of the phases (see `instrument`)
+
+        Returns
+        -------
+        sim : Simulation
+            the restored simulation
+        """
+        checkpoint = Checkpoint.load(filename)
+        sim = cls.__new__(cls)
+        sim.config = checkpoint.config
+        sim.settings = C.settings(sim.config)
+        sim.engine = engine or sim.settings.ENGINE
+        if sim.engine not in ENGINES:
+            raise ValueError(f'unknown engine <{sim.engine}>. Use one of {list(ENGINES)}')
+        sim.rng = checkpoint.rng()
+        if sim.rng is None:
+            raise ValueError(f'the checkpoint <{filename}> holds the global state of numpy.random')
+        sim.probe = probe if probe is not None else NULL_PROBE
+
+        sim.time = checkpoint.time
+        sim.epoch = checkpoint.epoch
+        sim.habitats = checkpoint.restore_habitats(create_patches(sim.settings))
+        sim.table = ProbabilityTable(sim.habitats, sim.settings.FNS, sim.settings.DISTANCE)
+        sim.table.refresh(sim.epoch)
+        sim.agents = checkpoint.population([ag_cnf['color'] for ag_cnf in sim.settings.CNF_AG])
+
+        hab_names = [h.id for h in sim.habitats]
+        hab_types = [h.type for h in sim.habitats]
+        capacity = len(sim.agents) * max(sim.settings.PROCESSING_TIME - 1, 1)
+        sim.recorder = checkpoint.recorder(capacity, sim.agents.names(), hab_names, hab_types)
+        sim.occupancy = checkpoint.occupancy(hab_types, sim.settings.PROCESSING_TIME)
+        return sim
+
+
+    def results(self):
+        """
+        Get the results of the simulation so far
+
+        Returns
+        -------
+        results : dict
+            'occupancy' : ndarray of shape (time, habitat, agent's type)
+            'hab_names', 'hab_types', 'types' : the labels of its dimensions
+            'stats' : pandas.DataFrame of the agents' statistics, if recorded
+        """
+        results = {
+            'occupancy': self.occupancy.tensor.copy(),
+            'hab_names': list(self.occupancy.hab_names),
+            'hab_types': list(self.occupancy.hab_types),
+            'types': list(self.occupancy.types)
+        }
+        if self.recorder is not None:
+            results['stats'] = self.recorder.to_frame(copy=True)
+        return results
+
+
+class _NullRecorder:
+    """ A recorder that drops everything (see `Simulation(record=False)`) """
+    def record_batch(self, *args, **kwargs):
+        pass
+
+    def record(self, **row):
+        pass
+
+# ==============================================================================
+# END: Simulation class definition
+# ==============================================================================
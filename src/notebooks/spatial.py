@@ -0,0 +1,124 @@
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Class definition for the spatial index of the habitats
+
+# ==============================================================================
+# START: HabitatIndex class definition
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+from geometry import is_rectangle, points_in_polygons
+
+# ------------------------------------------------------------------------------
+# HabitatIndex class definition
+class HabitatIndex:
+    """
+    A spatial index locating the habitat that contains each point of an array
+    of points, built once from the habitats' geometry.
+
+    Parameters
+    ----------
+    habitats : list of Habitat
+        the (non-overlapping) habitats to index
+    cells : int, default None
+        the number of cells along each axis of the uniform grid covering the
+        habitats. If not specified, it grows with the square root of the number
+        of habitats.
+
+    Notes
+    -----
+    Each grid cell lists the habitats whose bounding box overlaps it, so that a
+    point is only tested against the few habitats of its cell. The bounding box
+    test is exact for axis-aligned rectangles (fast path); other polygons are
+    then tested with a crossing number rule, over all the remaining (point,
+    habitat) pairs at once (see `geometry.points_in_polygons`).
+
+    Examples
+    --------
+    >>> index = HabitatIndex(habitats)
+    >>> index.locate([(0.75, 0.6), (0.0, 0.0)])
+    array([ 0, -1])
+    """
+    def __init__(self, habitats, cells=None):
+        self.habitats = habitats
+        self.vertices = [h.get_vertices() for h in habitats]
+        self.rectangles = np.array([is_rectangle(v) for v in self.vertices], dtype=bool)
+        self.bounds = np.array(
+            [np.concatenate((v.min(axis=0), v.max(axis=0))) for v in self.vertices],
+            dtype=float
+        ).reshape(-1, 4) # xmin, ymin, xmax, ymax
+
+        n_habs = len(habitats)
+        self.cells = cells or max(1, int(np.ceil(2 * np.sqrt(n_habs))))
+        if n_habs > 0:
+            self.extent = np.concatenate((self.bounds[:, :2].min(axis=0), self.bounds[:, 2:].max(axis=0)))
+        else:
+            self.extent = np.zeros(4)
+        self.cell_size = np.maximum((self.extent[2:] - self.extent[:2]) / self.cells, np.finfo(float).eps)
+
+        # compressed lists of the habitats overlapping every cell
+        members = [[] for _ in range(self.cells ** 2)]
+        for i, (lo, hi) in enumerate(zip(self._cell_xy(self.bounds[:, :2]), self._cell_xy(self.bounds[:, 2:]))):
+            for cx in range(lo[0], hi[0] + 1):
+                for cy in range(lo[1], hi[1] + 1):
+                    members[cx * self.cells + cy].append(i)
+        self.offsets = np.cumsum([0] + [len(m) for m in members])
+        self.members = np.array([i for m in members for i in m], dtype=int)
+
+
+    def _cell_xy(self, points):
+        cxy = np.floor((points - self.extent[:2]) / self.cell_size).astype(int)
+        return np.clip(cxy, 0, self.cells - 1)
+
+
+    def locate(self, points):
+        """
+        Determine in which habitat dwells each point
+
+        Parameters
+        ----------
+        points : array-like, shape (n, 2)
+            the x- and y-coordinates of the Cartersian plane
+
+        Returns
+        -------
+        indices : ndarray of int, shape (n,)
+            the index (within `habitats`) of the habitat that contains each
+            point, or -1 if the point is not contained in any of the habitats.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        n_habs = len(self.habitats)
+        result = np.full(len(points), n_habs, dtype=int)
+
+        # candidate (point, habitat) pairs from the grid cells
+        valid = np.all((points >= self.extent[:2]) & (points <= self.extent[2:]), axis=1)
+        pts = np.flatnonzero(valid)
+        cxy = self._cell_xy(points[pts])
+        cells = cxy[:, 0] * self.cells + cxy[:, 1]
+        counts = self.offsets[cells + 1] - self.offsets[cells]
+        pair_pts = np.repeat(pts, counts)
+        firsts = np.repeat(self.offsets[cells] - (np.cumsum(counts) - counts), counts)
+        pair_habs = self.members[firsts + np.arange(len(pair_pts))]
+
+        # bounding boxes: exact test for the rectangles
+        p, b = points[pair_pts], self.bounds[pair_habs]
+        inside = (p[:, 0] >= b[:, 0]) & (p[:, 0] <= b[:, 2]) & (p[:, 1] >= b[:, 1]) & (p[:, 1] <= b[:, 3])
+        pending = np.flatnonzero(inside & ~self.rectangles[pair_habs])
+        inside[pending] = points_in_polygons(p[pending], pair_habs[pending], self.vertices)
+
+        # first habitat containing the point, in the order of the habitats
+        np.minimum.at(result, pair_pts[inside], pair_habs[inside])
+        result[result == n_habs] = -1
+        return result
+
+# ==============================================================================
+# END: HabitatIndex class definition
+# ==============================================================================
@@ -0,0 +1,474 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Parameter sweeps over the values of the configuration
+
+# ==============================================================================
+# START: Sweep
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import copy
+import json
+import yaml
+import hashlib # keys of the points
+import argparse # command line
+import itertools # grid
+from concurrent.futures import ProcessPoolExecutor, as_completed # pool of workers
+import numpy as np # arithmetic computations
+
+import constants as C
+from helpers import compile_fn
+from ensemble import Ensemble
+
+__doc__ = """
+A sweep runs an ensemble of replicates (see `ensemble.py`) for every point of
+a set of configurations. The parameters are the dotted paths to the values of
+`config.yml`, where the items of a list are selected by position, or by their
+`type` (agents) or `penv` (functions):
+
+    app.threshold
+    app.rain.divisor
+    app.rain.values
+    app.agents.30cm.quantity
+    app.agents.5cm.fns.s.coefs.0   # polynomial coefficient, highest degree first
+
+A sweep specification, e.g. `sweep.yml`:
+
+    method: lhs        # grid (all the combinations) or lhs (Latin hypercube)
+    samples: 20        # lhs only: number of points
+    replicates: 4      # replicates per point
+    seed: 2019         # root seed, shared by all the points
+    params:            # grid: list of values; lhs: [low, high]
+      app.threshold: [1.0e-8, 1.0e-6]
+      app.agents.30cm.quantity: [5, 50]
+
+    $ python sweep.py sweep.yml -o ../../sweeps/threshold -w 8
+
+Running the same command again resumes the sweep: the points already in the
+results store are skipped. A store only resumes the very same sweep: the same
+specification and the same base configuration (`config.yml`, with the layout
+of the habitats), otherwise the sweep is refused.
+"""
+
+def _position(items, key, path):
+    if key.lstrip('-').isdigit():
+        return int(key)
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and key in (str(item.get('type')), str(item.get('penv'))):
+            return i
+    raise KeyError(f'no item <{key}> in <{path}>')
+
+
+def set_param(cnf, path, value):
+    """
+    Set a value of a configuration given its dotted path
+
+    Parameters
+    ----------
+    cnf : dict
+        the configuration, modified in place
+    path : string
+        the dotted path to the value, e.g., 'app.agents.30cm.quantity'
+    value :
+        the new value
+
+    Notes
+    -----
+    The coefficients of a function (`coefs`) that is only given by its
+    definition are taken from the definition first, if it is a polynomial.
+    """
+    node = cnf
+    keys = path.split('.')
+    for key in keys[:-1]:
+        if isinstance(node, list):
+            node = node[_position(node, key, path)]
+            continue
+        if key == 'coefs' and node.get('coefs') is None:
+            coefs = compile_fn(node).coefs
+            if coefs is None:
+                raise ValueError(f'<{path}>: the function is not a polynomial')
+            node['coefs'] = coefs.tolist()
+        node = node[key]
+
+    if isinstance(node, list):
+        node[_position(node, keys[-1], path)] = value
+    else:
+        node[keys[-1]] = value
+    return cnf
+
+
+def grid(params):
+    """
+    Get all the combinations of the values of the parameters
+
+    Parameters
+    ----------
+    params : dict
+        the values of every parameter: { path: [value, ...] }
+
+    Returns
+    -------
+    points : list of dict
+        the points of the grid: [{ path: value }, ...]
+    """
+    paths = list(params)
+    return [dict(zip(paths, values)) for values in itertools.product(*params.values())]
+
+
+def latin_hypercube(params, samples, seed=None):
+    """
+    Sample the parameters' space with a Latin hypercube: the range of every
+    parameter is split into `samples` strata, each of them sampled exactly once.
+
+    Parameters
+    ----------
+    params : dict
+        the range of every parameter: { path: [low, high] }. The values are
+        rounded if both bounds are integers.
+    samples : int
+        the number of points
+    seed : int, default None
+        the seed of the sampling
+
+    Returns
+    -------
+    points : list of dict
+        the sampled points: [{ path: value }, ...]
+    """
+    rng = np.random.default_rng(seed)
+    columns = dict()
+    for path, (low, high) in params.items():
+        u = (rng.permutation(samples) + rng.random(samples)) / samples
+        values = low + u * (high - low)
+        if isinstance(low, int) and isinstance(high, int):
+            columns[path] = [int(v) for v in np.rint(values)]
+        else:
+            columns[path] = [float(v) for v in values]
+    return [{path: columns[path][i] for path in params} for i in range(samples)]
+
+
+def point_key(point):
+    """ Get the key identifier of a point, after its parameters' values """
+    text = json.dumps(point, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def config_digest(cnf):
+    """ Get the digest of a base configuration, including the layout of the
+    habitats it refers to (e.g., a GeoJSON file) """
+    text = json.dumps({'config': cnf, 'habitats': C.settings(cnf).HABITATS}, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def run_point(base, point, dirname, replicates=1, seed=None, engine=None):
+    """
+    Run the ensemble of a point of the sweep and save its results
+
+    Parameters
+    ----------
+    base : dict
+        the base configuration
+    point : dict
+        the values of the parameters: { path: value }
+    dirname : string
+        the directory of the results store
+    replicates : int, default 1
+        the number of replicates
+    seed : int, default None
+        the root seed of the ensemble
+    engine : string, default None
+        the update engine (see `core.update`)
+
+    Returns
+    -------
+    record : dict
+        the entry of the point in the index of the results store
+    """
+    key = point_key(point)
+    cnf = copy.deepcopy(base)
+    for path, value in point.items():
+        set_param(cnf, path, value)
+
+    ensemble = Ensemble(replicates, seed, 1, engine, cnf=cnf).run()
+    filename, _ = ensemble.save(os.path.join(dirname, 'point-' + key))
+
+    summary = dict()
+    for k, _type in enumerate(ensemble.types):
+        summary['moves_' + _type] = float(ensemble.moves[:, 1:, k].sum(axis=1).mean())
+    for h, hab_type in enumerate(ensemble.hab_types):
+        if hab_type != C.HUMAN_SETTLEMENT:
+            summary['final_' + ensemble.hab_names[h]] = float(ensemble.occupancy[:, -1, h].sum(axis=1).mean())
+    return {
+        'key': key, 'params': point, 'file': os.path.basename(filename),
+        'entropy': str(ensemble.entropy), 'summary': summary
+    }
+
+
+# ------------------------------------------------------------------------------
+# SweepStore class definition
+class SweepStore:
+    """
+    The results of a sweep, indexed by the values of the parameters
+
+    Parameters
+    ----------
+    dirname : string
+        the directory holding the results: `sweep.json` (the specification of
+        the sweep and the digest of its base configuration), `points.json` (all
+        the points of the sweep), `index.jsonl` (one line per completed point)
+        and the files of every point (`point-<key>.npz`, `point-<key>.csv`, see
+        `Ensemble.save`)
+    """
+    def __init__(self, dirname):
+        self.dirname = dirname
+        os.makedirs(dirname, exist_ok=True)
+        self.__index = os.path.join(dirname, 'index.jsonl')
+        self.__points = os.path.join(dirname, 'points.json')
+        self.__spec = os.path.join(dirname, 'sweep.json')
+
+    def __len__(self):
+        return len(self.records())
+
+    def get_points(self):
+        """ Get the points of the sweep, if already saved """
+        if not os.path.isfile(self.__points):
+            return None
+        with open(self.__points, 'r') as f:
+            return json.load(f)
+
+    def set_points(self, points):
+        """ Save the points of the sweep """
+        with open(self.__points, 'w') as f:
+            json.dump(points, f, indent=2)
+
+    def get_spec(self):
+        """ Get the specification of the sweep, if already saved """
+        if not os.path.isfile(self.__spec):
+            return None
+        with open(self.__spec, 'r') as f:
+            return json.load(f)
+
+    def set_spec(self, spec):
+        """ Save the specification of the sweep """
+        with open(self.__spec, 'w') as f:
+            json.dump(spec, f, indent=2)
+
+    def records(self):
+        """ Get the entries of the completed points, keyed by point key """
+        records = dict()
+        if os.path.isfile(self.__index):
+            with open(self.__index, 'r') as f:
+                for line in f:
+                    if line.strip(): # an interrupted write leaves a partial line
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        records[record['key']] = record
+        return records
+
+    def add(self, record):
+        """ Add the entry of a completed point """
+        with open(self.__index, 'ab+') as f:
+            if f.seek(0, os.SEEK_END) > 0: # start on a new line, after a partial one
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            f.write((json.dumps(record) + '\n').encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self, point):
+        """
+        Load the results of a point
+
+        Returns
+        -------
+        data : dict
+            the arrays saved by `Ensemble.save` (occupancy, moves, prob, ...)
+        """
+        record = self.records()[point_key(point)]
+        with np.load(os.path.join(self.dirname, record['file'])) as data:
+            return dict(data)
+
+    def to_frame(self):
+        """
+        Get the summaries of the completed points
+
+        Returns
+        -------
+        df : pandas.DataFrame
+            one row per point, indexed by the values of the parameters
+        """
+        import pandas as pd # dataframe handling
+
+        records = list(self.records().values())
+        if not records:
+            return pd.DataFrame()
+        paths = list(records[0]['params'])
+        keys = [
+            tuple(tuple(v) if isinstance(v, list) else v for v in r['params'].values())
+            for r in records
+        ]
+        index = pd.MultiIndex.from_tuples(keys, names=paths) if len(paths) > 1 \
+            else pd.Index([k[0] for k in keys], name=paths[0])
+        df = pd.DataFrame([r['summary'] for r in records], index=index)
+        df['key'] = [r['key'] for r in records]
+        return df.sort_index()
+
+
+# ------------------------------------------------------------------------------
+# Sweep class definition
+class Sweep:
+    """
+    A parameter sweep, farming out the points to a pool of worker processes
+
+    Parameters
+    ----------
+    params : dict
+        the parameters to sweep by dotted path: a list of values (grid), or the
+        range [low, high] (Latin hypercube)
+    dirname : string
+        the directory of the results store (see `SweepStore`)
+    method : string = {'grid', 'lhs'}, default 'grid'
+        how to choose the points
+    samples : int, default None
+        the number of points of a Latin hypercube
+    replicates : int, default 1
+        the number of replicates for every point
+    seed : int, default None
+        the root seed, shared by the ensembles of all the points (common random
+        numbers), and the seed of the Latin hypercube
+    workers : int, default None
+        the number of worker processes (1: within the current process). If not
+        specified, use all the cores.
+    engine : string, default None
+        the update engine (see `core.update`)
+    cnf : dict, default None
+        the base configuration of the points. If not specified, use the one of
+        `constants` (as loaded from `config.yml`).
+
+    Raises
+    ------
+    ValueError
+        if the method or its parameters are invalid, or if the store holds the
+        results of another sweep (another specification or base configuration)
+
+    Notes
+    -----
+    The sweep never touches `config.yml`, nor the samples and graphs directories:
+    every point runs on a copy of the base configuration, and the results only
+    go to the store. Running an incomplete sweep again resumes it.
+
+    Examples
+    --------
+    >>> sweep = Sweep({'app.threshold': [1e-8, 1e-7, 1e-6]}, '../../sweeps/threshold')
+    >>> sweep.run()
+    >>> sweep.store.to_frame()
+    """
+    def __init__(self, params, dirname, method='grid', samples=None, replicates=1,
+                 seed=None, workers=None, engine=None, cnf=None):
+        if method not in ('grid', 'lhs'):
+            raise ValueError(f'unknown method <{method}>. Use one of [\'grid\', \'lhs\']')
+        if method == 'lhs':
+            if not isinstance(samples, int) or isinstance(samples, bool) or samples <= 0:
+                raise ValueError(f'the method <lhs> requires a positive number of samples, not <{samples}>')
+            for path, bounds in dict(params).items():
+                if not isinstance(bounds, (list, tuple)) or len(bounds) != 2:
+                    raise ValueError(f'the method <lhs> requires a range [low, high] for <{path}>')
+        self.params = dict(params)
+        self.method = method
+        self.samples = samples
+        self.replicates = int(replicates)
+        self.seed = seed
+        self.workers = int(workers or os.cpu_count() or 1)
+        self.engine = engine
+        self.cnf = C.CONFIG if cnf is None else cnf
+        self.store = SweepStore(dirname)
+
+        spec = {
+            'params': self.params, 'method': method, 'samples': samples, 'replicates': self.replicates,
+            'seed': seed, 'engine': engine, 'config': config_digest(self.cnf)
+        }
+        spec = json.loads(json.dumps(spec)) # as saved (e.g., tuples as lists)
+        self.points = self.store.get_points() # resumed sweep: same points
+        if self.points is not None or len(self.store) > 0:
+            saved = self.store.get_spec()
+            if saved != spec:
+                changed = sorted(k for k in spec if saved is None or saved.get(k) != spec[k])
+                raise ValueError(
+                    f'the store <{dirname}> holds the results of another sweep (changed: '
+                    f'{", ".join(changed)}). Use another directory, or empty this one.'
+                )
+        if self.points is None:
+            if method == 'grid':
+                self.points = grid(self.params)
+            else:
+                self.points = latin_hypercube(self.params, samples, seed)
+            self.store.set_spec(spec)
+            self.store.set_points(self.points)
+
+    def pending(self):
+        """ Get the points not completed yet """
+        done = self.store.records()
+        return [p for p in self.points if point_key(p) not in done]
+
+    def run(self):
+        """ Run the pending points, saving every result as soon as it is done """
+        pending = self.pending()
+        total, done = len(self.points), len(self.points) - len(pending)
+        print(f'=> {done}/{total} points already done, {len(pending)} pending')
+        args = (self.store.dirname, self.replicates, self.seed, self.engine)
+
+        if self.workers == 1:
+            for point in pending:
+                done += 1
+                self.store.add(run_point(self.cnf, point, *args))
+                print(f'--- point {done}/{total}: {point}')
+            return self
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(run_point, self.cnf, point, *args): point for point in pending}
+            for future in as_completed(futures):
+                done += 1
+                self.store.add(future.result())
+                print(f'--- point {done}/{total}: {futures[future]}')
+        return self
+
+
+def main(argv=None):
+    """ Command line entry point: run (or resume) a sweep from its specification """
+    parser = argparse.ArgumentParser(description='Run a parameter sweep of the waterbirds ABM')
+    parser.add_argument('spec', help='YAML specification of the sweep')
+    parser.add_argument('-o', '--output', required=True, help='directory of the results store')
+    parser.add_argument('-w', '--workers', type=int, help='number of worker processes')
+    parser.add_argument('-e', '--engine', choices=['vectorized', 'reference'], help='update engine')
+    args = parser.parse_args(argv)
+
+    with open(args.spec, 'r') as specfile:
+        spec = yaml.safe_load(specfile)
+    sweep = Sweep(
+        spec['params'], args.output, spec.get('method', 'grid'), spec.get('samples'),
+        spec.get('replicates', 1), spec.get('seed'), args.workers, args.engine
+    )
+    sweep.run()
+    print(f'=> Sweep results saved at <{sweep.store.dirname}>')
+
+
+# run from the command line (guarded, as the workers may import this module)
+if __name__ == '__main__':
+    main()
+
+# ==============================================================================
+# END: Sweep
+# ==============================================================================
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Shared fixtures of the tests
+
+# ==============================================================================
+# START: Fixtures
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import sys
+import copy
+import pytest
+
+# the modules of the project are flat scripts (see `notebooks`), loaded along
+# with their configuration (`config.yml`) from their own directory
+NOTEBOOKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'notebooks')
+sys.path.insert(0, NOTEBOOKS)
+
+import config
+import constants as C
+from core import reset
+
+
+@pytest.fixture(scope='session', autouse=True)
+def notebooks_dir():
+    """ Run from the directory of the configuration """
+    cwd = os.getcwd()
+    os.chdir(NOTEBOOKS)
+    yield NOTEBOOKS
+    os.chdir(cwd)
+
+
+@pytest.fixture(scope='session')
+def base_config(notebooks_dir):
+    """ The default configuration (`config.yml`), never to be modified """
+    return config.load_config()
+
+
+@pytest.fixture
+def cnf(base_config):
+    """ A copy of the default configuration, free to be modified """
+    return copy.deepcopy(base_config)
+
+
+@pytest.fixture
+def configured(base_config):
+    """ Restore the default configuration and state of the process once done """
+    yield
+    C.configure(base_config)
+    reset()
+
+
+def small_config(cnf, quantity=50, counter=12):
+    """ Shrink a configuration: `quantity` agents of each type, `counter` units
+    of time """
+    for ag_cnf in cnf['app']['agents']:
+        ag_cnf['quantity'] = quantity
+    cnf['app']['counter'] = counter
+    return cnf
+
+# ==============================================================================
+# END: Fixtures
+# ==============================================================================
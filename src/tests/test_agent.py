@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the array-backed population of agents
+
+# ==============================================================================
+# START: Agent tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+from agent import Agent, Population
+
+
+@pytest.fixture
+def population():
+    population = Population(['15cm', '30cm'], ['#afaf3a', '#6CC2BD'])
+    population.add('30cm', [(0.1, 0.2), (0.3, 0.4), (0.5, 0.6)], habs=[0, 1, 1])
+    population.add('15cm', [(0.7, 0.8), (0.9, 0.1)])
+    return population
+
+
+def test_blocks_of_agents(population):
+    assert len(population) == 5
+    assert population.codes.tolist() == [1, 1, 1, 0, 0]
+    assert population.ids.tolist() == [0, 1, 2, 3, 4]
+    assert population.habs.tolist() == [0, 1, 1, -1, -1] # unknown
+    assert population.indices('15cm').tolist() == [3, 4]
+    assert population.names() == ['1-30cm', '2-30cm', '3-30cm', '1-15cm', '2-15cm']
+    assert population.names([4, 0]) == ['2-15cm', '1-30cm']
+    assert np.array_equal(population.points, [(0.1, 0.2), (0.3, 0.4), (0.5, 0.6), (0.7, 0.8), (0.9, 0.1)])
+
+
+def test_contiguous_arrays(population):
+    columns = (population.x, population.y, population.codes, population.ids, population.habs)
+    assert [c.dtype for c in columns] == [np.float64, np.float64, np.int16, np.int64, np.int16]
+    assert all(c.flags['C_CONTIGUOUS'] for c in columns)
+    assert population.nbytes == 5 * (8 + 8 + 2 + 8 + 2)
+
+
+def test_set_points(population):
+    population.set_points(population.indices('15cm'), [(0.2, 0.5), (0.3, 0.5)])
+    assert population.x.tolist() == [0.1, 0.3, 0.5, 0.2, 0.3]
+    assert population.y.tolist() == [0.2, 0.4, 0.6, 0.5, 0.5]
+
+
+def test_views_read_and_write_the_arrays(population):
+    agent = population[3]
+    assert (agent.type, agent.color, agent.name) == ('15cm', '#afaf3a', '1-15cm')
+    assert agent.get_point() == (0.7, 0.8)
+    agent.set_point((0.25, 0.75))
+    assert (population.x[3], population.y[3]) == (0.25, 0.75)
+    assert population[-1].name == '2-15cm'
+    assert [a.name for a in population] == population.names()
+    with pytest.raises(IndexError):
+        population[5]
+
+
+@pytest.mark.parametrize('agent_fn', [lambda p: p[0], lambda p: Agent('15cm')])
+def test_views_behave_as_agents(population, agent_fn):
+    agent = agent_fn(population)
+    with pytest.raises(TypeError, match='not iterable'):
+        agent.set_point(0.5)
+    with pytest.raises(TypeError, match='2 elements'):
+        agent.set_point((0.1, 0.2, 0.3))
+
+# ==============================================================================
+# END: Agent tests
+# ==============================================================================
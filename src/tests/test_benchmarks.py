@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Benchmarks of the hot paths (see `benchmark`) as pytest-benchmark cases, e.g.:
+#   python -m pytest tests/test_benchmarks.py --benchmark-autosave
+#   python -m pytest tests/test_benchmarks.py --benchmark-compare
+# Skip them with `--benchmark-skip`.
+
+# ==============================================================================
+# START: Benchmark cases
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from benchmark import BENCHMARKS, prepare, teardown
+
+SIZES = (22, 1000) # the scaling sizes of `benchmark` take minutes
+STEPS = 10
+ROUNDS = 3
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('name', [name for name in BENCHMARKS if name != 'update'])
+def test_benchmark(benchmark, configured, tmp_path, name, size):
+    steps = STEPS if BENCHMARKS[name][1] else None
+    run_benchmark(benchmark, name, size, steps, None, str(tmp_path))
+
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('engine', ['vectorized', 'reference'])
+def test_benchmark_update(benchmark, configured, tmp_path, engine, size):
+    run_benchmark(benchmark, 'update', size, STEPS, engine, str(tmp_path))
+
+
+def run_benchmark(benchmark, name, size, steps, engine, outdir):
+    """ Time a benchmark, set up before every round, but not timed """
+    benchmark.group = f'{name}-{size}'
+    benchmark.extra_info.update(size=size, steps=steps, engine=engine)
+    setup = lambda: ((prepare(name, size, steps, engine, outdir),), {})
+    benchmark.pedantic(lambda run: run(), setup=setup, teardown=lambda run: teardown(), rounds=ROUNDS)
+
+# ==============================================================================
+# END: Benchmark cases
+# ==============================================================================
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the checkpoints: a process resumed from one continues as if it
+# had never stopped
+
+# ==============================================================================
+# START: Checkpoint tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import numpy as np # arithmetic computations
+import pytest
+
+from checkpoint import Checkpoint
+from simulation import Simulation
+from .conftest import small_config
+
+
+@pytest.mark.parametrize('engine', ['vectorized', 'reference'])
+def test_resumed_simulation_matches_uninterrupted_run(cnf, tmp_path, engine):
+    cnf = small_config(cnf)
+    cnf['app']['engine'] = engine # saved along with the checkpoint
+    expected = Simulation(cnf, seed=2019).run().results()
+
+    filename = str(tmp_path / 'checkpoint.npz')
+    Simulation(cnf, seed=2019).run(5).checkpoint(filename)
+    sim = Simulation.resume(filename)
+    assert sim.time == 5 and sim.engine == engine
+    results = sim.run().results()
+
+    assert np.array_equal(results['occupancy'], expected['occupancy'])
+    assert results['stats'].equals(expected['stats'])
+
+
+def test_checkpoint_round_trip(cnf, tmp_path):
+    sim = Simulation(small_config(cnf), seed=2019).run(3)
+    filename = sim.checkpoint(str(tmp_path / 'checkpoint.npz'))
+    assert os.listdir(tmp_path) == ['checkpoint.npz'] # no temporary file left
+
+    checkpoint = Checkpoint.load(filename)
+    assert checkpoint.time == 3 and checkpoint.epoch == sim.epoch
+    assert checkpoint.config == sim.config
+    assert np.array_equal(checkpoint.data['x'], sim.agents.x)
+    assert checkpoint.rng().bit_generator.state == sim.rng.bit_generator.state
+
+
+def test_unsupported_checkpoint_version(cnf, tmp_path):
+    filename = Simulation(small_config(cnf), seed=2019).checkpoint(str(tmp_path / 'checkpoint.npz'))
+    with np.load(filename) as archive:
+        data = dict(archive)
+    data['version'] = np.array(int(data['version']) + 1)
+    np.savez_compressed(filename, **data)
+    with pytest.raises(ValueError, match='unsupported checkpoint version'):
+        Checkpoint.load(filename)
+
+# ==============================================================================
+# END: Checkpoint tests
+# ==============================================================================
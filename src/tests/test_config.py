@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the configuration: loading and output directories
+
+# ==============================================================================
+# START: Config tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import sys
+import shutil
+import subprocess
+import pytest
+
+import config
+import constants as C
+
+
+def test_prepared_output_is_where_the_outputs_go(cnf, tmp_path):
+    cnf['outDir'] = str(tmp_path / 'out')
+    settings = C.settings(cnf)
+    assert config.prepare_output(config=cnf) == (settings.SAMPLE_DIR, settings.GRAPH_DIR)
+    assert os.path.isdir(settings.SAMPLE_DIR) and os.path.isdir(settings.GRAPH_DIR)
+
+
+def test_prepare_output_cleans_on_demand(cnf, tmp_path):
+    cnf['outDir'] = str(tmp_path)
+    sample_dir, graph_dir = config.prepare_output(config=cnf)
+    for dirname in (sample_dir, graph_dir):
+        open(os.path.join(dirname, 'previous.txt'), 'w').close()
+
+    config.prepare_output(clean=False, config=cnf)
+    assert os.listdir(sample_dir) == os.listdir(graph_dir) == ['previous.txt']
+    config.prepare_output(config=cnf)
+    assert os.listdir(sample_dir) == os.listdir(graph_dir) == []
+
+# ==============================================================================
+# END: Config tests
+
+
+def test_imports_have_no_side_effects(notebooks_dir, tmp_path):
+    # neither the configuration read nor any directory created
+    env = dict(os.environ, PYTHONPATH=notebooks_dir, MPLBACKEND='Agg')
+    subprocess.run([sys.executable, '-c', 'import config, constants, core'], cwd=str(tmp_path), env=env, check=True)
+    assert os.listdir(str(tmp_path)) == []
+
+
+@pytest.fixture
+def config_file(notebooks_dir, tmp_path):
+    filename = str(tmp_path / 'config.yml')
+    shutil.copy(os.path.join(notebooks_dir, 'config.yml'), filename)
+    return filename
+
+
+def test_load_config_is_cached_until_changed(config_file):
+    cnf = config.load_config(config_file)
+    assert config.load_config(config_file) is cnf
+
+    mtime = os.stat(config_file).st_mtime_ns
+    os.utime(config_file, ns=(mtime + 10**9, mtime + 10**9)) # touched, not changed
+    assert config.load_config(config_file) is cnf
+
+    with open(config_file, 'r') as f:
+        text = f.read()
+    with open(config_file, 'w') as f:
+        f.write(text.replace('counter: {}'.format(cnf['app']['counter']), 'counter: 3', 1))
+    os.utime(config_file, ns=(mtime + 2 * 10**9, mtime + 2 * 10**9))
+    changed = config.load_config(config_file)
+    assert changed is not cnf and changed['app']['counter'] == 3
+    assert config.load_config(config_file) is changed
+
+
+def test_load_config_validates_the_keys(config_file):
+    with open(config_file, 'w') as f:
+        f.write('rootDir: .\noutDir: out\npaths: {sample: s}\napp: {}\n')
+    with pytest.raises(ValueError, match='missing key <paths.graph>'):
+        config.load_config(config_file)
+    with pytest.raises(IOError, match='does not exists'):
+        config.load_config(config_file + '.missing')
+
+# ==============================================================================
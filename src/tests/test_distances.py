@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the distances between the habitats and the human settlements
+
+# ==============================================================================
+# START: Distance tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from core import create_patches
+from geometry import edge_distance, polygon_distances
+from helpers import compute_dist
+from probability import ProbabilityTable
+from simulation import Simulation
+
+PROPS = {'w': 0.2, 's': 15, 'f': 8}
+
+
+def square(x, y, size=0.1):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size)]
+
+
+@pytest.fixture
+def habitats(cnf):
+    cnf['app']['habitats'] = [
+        {'id': 'a', 'type': 1, 'verts': square(0.1, 0.1), 'props': PROPS},
+        {'id': 'b', 'type': 1, 'verts': [(0.5, 0.1), (0.7, 0.1), (0.6, 0.3)], 'props': PROPS},
+        {'id': C.HUMAN_SETTLEMENT, 'type': C.HUMAN_SETTLEMENT, 'verts': square(0.3, 0.1)},
+        {'id': C.HUMAN_SETTLEMENT, 'type': C.HUMAN_SETTLEMENT, 'verts': square(0.3, 0.4)}
+    ]
+    return create_patches(C.settings(cnf))
+
+
+def test_center_distances(base_config):
+    habitats = create_patches(C.settings(base_config))
+    distances = habitats.settlement_distances('center')
+    assert distances.shape == (7, 3)
+    for i, h in enumerate(habitats):
+        assert distances[i] == pytest.approx(compute_dist(h, habitats.settlements))
+
+
+def test_edge_distances(habitats):
+    distances = habitats.settlement_distances('edge')
+    assert distances[0] == pytest.approx([0.1, np.hypot(0.1, 0.2)]) # corner to corner
+    assert distances[1, 0] == pytest.approx(0.1) # vertex to edge
+    assert distances[2, 0] == 0 and distances[3, 1] == 0 # themselves
+    assert edge_distance(square(0, 0, 1), square(0.5, 0.5, 1)) == 0 # overlapping
+    assert habitats.settlement_distances('edge') is distances # computed once
+
+
+def test_point_distances(habitats):
+    points = [(0.35, 0.15), (0.45, 0.15), (0.35, 0.3), (0.0, 0.0)]
+    distances = habitats.point_settlement_distances(points)
+    assert distances[:, 0] == pytest.approx([0.0, 0.05, 0.1, np.hypot(0.3, 0.1)])
+    assert distances[:, 1] == pytest.approx([0.25, np.hypot(0.05, 0.25), 0.1, np.hypot(0.3, 0.4)])
+    assert np.array_equal(distances[:, 0], polygon_distances(points, habitats[2].get_vertices()))
+
+
+@pytest.mark.parametrize('metric', ['edge', 'point'])
+def test_simulations_with_other_metrics(cnf, metric):
+    cnf['app']['distance'] = metric
+    sim = Simulation(cnf, seed=2019).run()
+    habitats = sim.habitats
+    if metric == 'edge':
+        assert np.array_equal(sim.table.env[:, 3], habitats.settlement_distances('edge').min(axis=1))
+    else: # evaluated at every destination
+        stats = sim.results()['stats']
+        points = stats[['agent_x', 'agent_y']].to_numpy()
+        expected = habitats.point_settlement_distances(points).min(axis=1)
+        moved = stats['has_moved'].to_numpy()
+        assert moved.any()
+        assert stats['hab_distance'].to_numpy()[moved] == pytest.approx(expected[moved])
+
+
+def test_point_metric_lookup(habitats, base_config):
+    fns = C.settings(base_config).FNS
+    table = ProbabilityTable(habitats, fns, 'point').refresh(0)
+    points = np.array([(0.15, 0.15), (0.55, 0.15)])
+    env, probs, overall = table.lookup(0, np.array([0, 1]), points)
+    assert env[:, 3] == pytest.approx([0.15, 0.15])
+    assert probs[:, 3] == pytest.approx(fns[table.types[0]]['d'](env[:, 3]))
+    assert overall == pytest.approx(probs.prod(axis=1))
+
+# ==============================================================================
+# END: Distance tests
+# ==============================================================================
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the update engines: the vectorized engine draws its random
+# numbers in another order than the reference one, but simulates the same
+# process
+
+# ==============================================================================
+# START: Engine tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+from simulation import Simulation
+
+SEEDS = range(40)
+
+
+@pytest.fixture(scope='module')
+def occupancy(base_config):
+    return {engine: np.array([
+        Simulation(base_config, seed=seed, engine=engine, record=False).run().results()['occupancy']
+        for seed in SEEDS
+    ]) for engine in ('vectorized', 'reference')}
+
+
+def test_same_initial_state(occupancy):
+    assert np.array_equal(occupancy['vectorized'][:, 0], occupancy['reference'][:, 0])
+
+
+@pytest.mark.parametrize('engine', ['vectorized', 'reference'])
+def test_agents_stay_within_their_habitats(base_config, occupancy, engine):
+    sim = Simulation(base_config, seed=0, record=False)
+    quantities = [ag_cnf['quantity'] for ag_cnf in sim.settings.CNF_AG]
+    counts = occupancy[engine]
+    assert (counts.sum(axis=2) == quantities).all() # no agent lost nor created
+    for t, ag_cnf in enumerate(sim.settings.CNF_AG):
+        allowed = [h.type in ag_cnf['habs'] for h in sim.habitats]
+        assert (counts[:, :, np.logical_not(allowed), t] == 0).all()
+
+
+def test_same_expected_occupancy(occupancy):
+    # mean occupancy over time, by habitat and agent's type, across the seeds
+    a = occupancy['vectorized'].mean(axis=1)
+    b = occupancy['reference'].mean(axis=1)
+    stderr = np.sqrt((a.var(axis=0, ddof=1) + b.var(axis=0, ddof=1)) / len(SEEDS))
+    assert (np.abs(a.mean(axis=0) - b.mean(axis=0)) <= 4 * stderr + 1e-12).all()
+
+# ==============================================================================
+# END: Engine tests
+# ==============================================================================
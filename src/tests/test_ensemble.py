@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the ensembles: reproducible from their root seed, whatever the
+# number of workers and the batch size
+
+# ==============================================================================
+# START: Ensemble tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from ensemble import Ensemble
+from .conftest import small_config
+
+
+def run(cnf, **kwargs):
+    kwargs = {'replicates': 4, 'seed': 2019, 'workers': 1, **kwargs}
+    return Ensemble(cnf=cnf, **kwargs).run()
+
+
+def same(a, b):
+    return all(np.array_equal(getattr(a, k), getattr(b, k)) for k in ('occupancy', 'moves', 'prob'))
+
+
+@pytest.fixture
+def small(cnf):
+    return small_config(cnf, quantity=30, counter=8)
+
+
+def test_same_seed_same_results(small):
+    assert same(run(small), run(small))
+    assert not np.array_equal(run(small).occupancy, run(small, seed=2020).occupancy)
+
+
+@pytest.mark.parametrize('kwargs', [{'batch': 2}, {'batch': 3}, {'workers': 2}, {'workers': 2, 'batch': 2}])
+def test_results_independent_of_workers_and_batches(small, kwargs):
+    assert same(run(small, **kwargs), run(small))
+
+
+def test_replicates_are_independent(small):
+    occupancy = run(small).occupancy
+    assert any(not np.array_equal(occupancy[0], occupancy[r]) for r in range(1, len(occupancy)))
+
+
+def test_configuration_of_the_module_by_default(small, configured):
+    C.configure(small)
+    assert same(run(None), run(small))
+
+
+def test_batches_require_the_vectorized_engine(small):
+    with pytest.raises(ValueError, match='vectorized engine'):
+        Ensemble(replicates=2, seed=2019, workers=1, engine='reference', batch=2, cnf=small)
+
+# ==============================================================================
+# END: Ensemble tests
+# ==============================================================================
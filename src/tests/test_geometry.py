@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the polygon utilities and of the habitat locators
+
+# ==============================================================================
+# START: Geometry tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from core import create_patches
+from geometry import (polygon_area, polygon_areas, polygon_centroids, is_rectangle,
+    triangulate, points_in_polygon, points_in_polygons)
+from spatial import HabitatIndex
+from raster import HabitatRaster
+
+SQUARE = [(0, 0), (1, 0), (1, 1), (0, 1)]
+TRIANGLE = [(0, 0), (3, 0), (0, 3)]
+L_SHAPE = [(0, 0), (2, 0), (2, 1), (1, 1), (1, 2), (0, 2)] # concave
+COMB = [(0, 0), (5, 0), (5, 3), (4, 3), (4, 1), (3, 1), (3, 3), (2, 3), (2, 1), (1, 1), (1, 3), (0, 3)]
+
+
+def random_points(n, low=-0.5, high=5.5, seed=2019):
+    return np.random.default_rng(seed).uniform(low, high, size=(n, 2))
+
+
+@pytest.mark.parametrize('vertices, area', [
+    (SQUARE, 1.0), (TRIANGLE, 4.5), (L_SHAPE, 3.0), (COMB, 11.0)
+])
+def test_polygon_area(vertices, area):
+    assert polygon_area(vertices) == pytest.approx(area)
+    assert polygon_area(vertices[::-1]) == pytest.approx(area) # either orientation
+    assert polygon_areas([vertices, vertices[::-1]]) == pytest.approx([area, area])
+
+
+def test_polygon_centroids():
+    rectangle = [(0.1, 0.2), (0.7, 0.2), (0.7, 0.9), (0.1, 0.9)]
+    centroids = polygon_centroids([rectangle, TRIANGLE, L_SHAPE, [(1, 1)] * 3])
+    assert tuple(centroids[0]) == ((0.1 + 0.7) / 2, (0.2 + 0.9) / 2) # exact mid point
+    assert centroids[1] == pytest.approx([1.0, 1.0])
+    assert centroids[2] == pytest.approx([5 / 6, 5 / 6])
+    assert centroids[3] == pytest.approx([1.0, 1.0]) # no area: mean of the vertices
+
+
+def test_is_rectangle():
+    assert is_rectangle(SQUARE)
+    assert not is_rectangle(TRIANGLE)
+    assert not is_rectangle(L_SHAPE)
+    assert not is_rectangle([(0, 0), (1, 1), (1, 0), (0, 1)]) # crossing edges
+
+
+@pytest.mark.parametrize('vertices', [SQUARE, TRIANGLE, L_SHAPE, COMB, COMB[::-1]])
+def test_triangulate(vertices):
+    triangles = triangulate(vertices)
+    assert triangles.shape == (len(vertices) - 2, 3, 2)
+    # the triangles cover the polygon: same area, and their centroids lie within it
+    assert sum(polygon_area(t) for t in triangles) == pytest.approx(polygon_area(vertices))
+    assert points_in_polygon(triangles.mean(axis=1), vertices).all()
+
+
+def test_triangulate_rejects_degenerate_polygons():
+    with pytest.raises(ValueError, match='not simple'):
+        triangulate([(0, 0), (1, 0), (2, 0), (3, 0)]) # no ear to clip
+
+
+def test_points_in_polygon():
+    mask = points_in_polygon([(1.5, 0.5), (0.5, 1.5), (1.5, 1.5), (3, 3), (-1, 0.5)], L_SHAPE)
+    assert mask.tolist() == [True, True, False, False, False]
+    assert points_in_polygon(np.zeros((0, 2)), SQUARE).shape == (0,)
+
+
+@pytest.mark.parametrize('chunk', [1 << 20, 7])
+def test_points_in_polygons_matches_points_in_polygon(chunk):
+    polygons = [SQUARE, TRIANGLE, L_SHAPE, COMB]
+    points = random_points(2000)
+    owners = np.random.default_rng(7).integers(0, len(polygons), size=len(points))
+    expected = np.zeros(len(points), dtype=bool)
+    for i, vertices in enumerate(polygons):
+        expected[owners == i] = points_in_polygon(points[owners == i], vertices)
+    assert np.array_equal(points_in_polygons(points, owners, polygons, chunk=chunk), expected)
+
+
+def brute_force(habitats, points):
+    located = np.full(len(points), -1)
+    for i, h in enumerate(habitats):
+        inside = points_in_polygon(points, h.get_vertices())
+        located[inside & (located == -1)] = i
+    return located
+
+
+@pytest.fixture
+def concave_habitats(cnf):
+    props = {'w': 0.1, 's': 10, 'f': 5}
+    cnf['app']['habitats'] = [
+        {'id': 'comb', 'type': 1, 'verts': [(x / 10, y / 10) for x, y in COMB], 'props': props},
+        {'id': 'L', 'type': 2, 'verts': [(0.6 + x / 10, 0.5 + y / 10) for x, y in L_SHAPE], 'props': props},
+        {'id': 'square', 'type': 3, 'verts': [(0.1 + x / 5, 0.6 + y / 5) for x, y in SQUARE], 'props': props},
+        {'id': C.HUMAN_SETTLEMENT, 'type': C.HUMAN_SETTLEMENT, 'verts': [(0.8, 0.1), (0.95, 0.1), (0.8, 0.3)]}
+    ]
+    return create_patches(C.settings(cnf))
+
+
+@pytest.mark.parametrize('layout', ['default', 'concave'])
+def test_locators_match_brute_force(layout, base_config, concave_habitats):
+    habitats = create_patches(C.settings(base_config)) if layout == 'default' else concave_habitats
+    points = random_points(20000, low=-0.1, high=1.1)
+    expected = brute_force(habitats, points)
+    assert np.array_equal(HabitatIndex(habitats).locate(points), expected)
+    for resolution in (8, 64, 512):
+        assert np.array_equal(HabitatRaster(habitats, resolution).locate(points), expected)
+
+
+def test_raster_samples_within_the_habitats(concave_habitats):
+    raster = HabitatRaster(concave_habitats, 64)
+    points, hab_index = raster.sample(5000, np.random.default_rng(2019), return_index=True)
+    assert (hab_index >= 0).all()
+    assert np.array_equal(hab_index, brute_force(concave_habitats, points))
+
+# ==============================================================================
+# END: Geometry tests
+# ==============================================================================
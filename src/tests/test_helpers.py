@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the compiled functions of the configuration
+
+# ==============================================================================
+# START: Helpers tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import pickle
+import numpy as np # arithmetic computations
+import pytest
+
+from helpers import compile_fn
+
+
+def meta(definition, deps=None, args=('x',)):
+    return {'def': definition, 'args': list(args), 'deps': deps}
+
+
+def test_polynomials_are_compiled_to_coefficients():
+    fn = compile_fn(meta('lambda x: 2*x**2 + 1'))
+    assert fn.coefs.tolist() == [2.0, 0.0, 1.0]
+    assert fn(np.array([1, 2])).tolist() == [3.0, 9.0]
+
+
+@pytest.mark.parametrize('definition, deps', [
+    ('lambda x: math.exp(-x) + math.sqrt(x)', ['import math']),
+    ('lambda x: np.clip(np.log1p(x), 0, np.pi)', ['import numpy as np']),
+    ('lambda x: clip(x, 0, 1)', ['from numpy import clip'])
+])
+def test_safe_functions(definition, deps):
+    fn = compile_fn(meta(definition, deps))
+    assert np.all(np.isfinite(fn(np.array([0.5, 1.0, 2.0]))))
+
+
+@pytest.mark.parametrize('definition, deps', [
+    ('lambda x: np.savetxt("out.txt", x)', ['import numpy as np']), # not whitelisted
+    ('lambda x: np.ctypeslib.load_library("lib", ".")', ['import numpy as np']), # deeper than module.func
+    ('lambda x: x.tofile("out.bin")', None), # attributes of the arguments
+    ('lambda x: (x).real', None),
+    ('lambda math: math.exp(1)', ['import math']), # argument shadowing a module
+    ('lambda x: os.remove(x)', ['import os']) # module not allowed
+])
+def test_forbidden_functions(definition, deps):
+    with pytest.raises(ValueError):
+        compile_fn(meta(definition, deps, ['math'] if 'lambda math' in definition else ['x']))
+
+@pytest.mark.parametrize('meta_fn', [
+    meta('lambda x: -10.89*math.log(x) + 44.71', ['import math']),
+    meta('lambda x: 2*x**2 + 1'),
+    {'coefs': [0.001, 0.1], 'args': ['x']}
+])
+def test_pickle_round_trip(meta_fn):
+    fn = compile_fn(meta_fn)
+    clone = pickle.loads(pickle.dumps(fn))
+    x = np.array([0.5, 1.0, 2.0])
+    assert clone.source == fn.source and clone.args == fn.args
+    assert np.array_equal(clone(x), fn(x))
+
+# ==============================================================================
+# END: Helpers tests
+# ==============================================================================
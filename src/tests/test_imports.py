@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the imports: the simulation core without visualization
+
+# ==============================================================================
+# START: Import tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import sys
+import json
+import subprocess
+import numpy as np # arithmetic computations
+import pytest
+
+from core import create_patches
+
+HEAVY = ['matplotlib', 'pandas', 'imageio']
+
+
+def loaded_after(statement, cwd):
+    """ The heavy libraries loaded by a statement, in a fresh interpreter """
+    script = f'import sys, json; {statement}; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))'
+    output = subprocess.run([sys.executable, '-c', script], cwd=cwd, check=True, stdout=subprocess.PIPE)
+    return json.loads(output.stdout.decode().splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', ['core', 'ensemble', 'sweep'])
+def test_core_needs_no_visualization(notebooks_dir, module):
+    assert loaded_after(f'import {module}', notebooks_dir) == []
+
+
+def test_visualization_loaded_by_the_output_only(notebooks_dir):
+    assert loaded_after('import habitat; habitat.Habitat("h", 1, "blue").build()', notebooks_dir) == []
+    assert 'matplotlib' in loaded_after('import output', notebooks_dir)
+
+
+def test_containment_matches_matplotlib(base_config):
+    from matplotlib.path import Path
+
+    points = np.random.default_rng(0).random((20000, 2))
+    for habitat in create_patches():
+        expected = Path(habitat.verts, habitat.codes).contains_points(points)
+        assert np.array_equal(habitat.contains_points(points), expected)
+
+
+def test_artist_built_on_first_use(base_config):
+    habitat = create_patches()[0]
+    habitat.build(fill=True)
+    artist = habitat.artist
+    assert artist is habitat.artist and artist.get_fill()
+    assert np.allclose(artist.get_path().vertices, habitat.verts)
+
+# ==============================================================================
+# END: Import tests
+# ==============================================================================
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the instrumentation of the process
+
+# ==============================================================================
+# START: Instrumentation tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import json
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from core import get_probe
+from instrument import Probe, NullProbe, NULL_PROBE
+from simulation import Simulation
+from .conftest import small_config
+
+
+def read(filename):
+    with open(filename, 'r') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def small(cnf):
+    return small_config(cnf, quantity=20, counter=6)
+
+
+def test_one_json_line_per_unit_of_time(tmp_path):
+    filename = str(tmp_path / 'timings.jsonl')
+    probe = Probe(filename)
+    for time in range(3):
+        with probe.phase('sampling'):
+            with probe.phase('lookup'): # nested: accounted for in both
+                pass
+        probe.count('moves_accepted', time)
+        probe.count('moves_accepted')
+        probe.progress('bytes_written', 100 * (time + 1) ** 2)
+        probe.step(time)
+    probe.close()
+
+    records = read(filename)
+    assert [r['time'] for r in records] == [0, 1, 2]
+    assert [r['counters'] for r in records] == [
+        {'moves_accepted': 1, 'bytes_written': 100},
+        {'moves_accepted': 2, 'bytes_written': 300},
+        {'moves_accepted': 3, 'bytes_written': 500}
+    ]
+    for r in records:
+        assert set(r['phases']) == {'sampling', 'lookup'}
+        assert r['phases']['sampling'] >= r['phases']['lookup'] >= 0
+        assert r['wall'] >= r['phases']['sampling']
+    assert probe.records == [] # written, not kept
+
+
+def test_records_kept_in_memory_without_a_file():
+    probe = Probe()
+    with probe.phase('counting'):
+        probe.count('moves_rejected', 2)
+    record = probe.step(0)
+    assert probe.records == [record] and record['counters'] == {'moves_rejected': 2}
+    assert (probe.phases, probe.counters) == ({}, {}) # a new unit of time
+    probe.close()
+
+
+def test_null_probe_does_nothing():
+    probe = NullProbe()
+    with probe.phase('sampling'):
+        probe.count('moves_accepted', 3)
+        probe.progress('bytes_written', 10)
+    assert probe.step(0) is None
+    probe.close()
+    assert not probe.enabled and probe.filename is None
+
+
+@pytest.mark.parametrize('engine', ['vectorized', 'reference'])
+def test_simulation_reports_every_unit_of_time(small, engine):
+    probe = Probe()
+    sim = Simulation(small, seed=2, engine=engine, probe=probe).run()
+    assert [r['time'] for r in probe.records] == list(range(len(sim)))
+    for r in probe.records[1:]:
+        assert {'environment', 'sampling', 'lookup', 'probability', 'acceptance', 'counting'} <= set(r['phases'])
+        assert r['counters']['moves_accepted'] + r['counters'].get('moves_rejected', 0) == len(sim.agents)
+    moves = sum(r['counters']['moves_accepted'] for r in probe.records[1:])
+    changes = np.abs(np.diff(sim.occupancy.tensor, axis=0)).sum() // 2 # net moves between habitats
+    assert moves >= changes > 0
+    # measuring does not change the process
+    plain = Simulation(small, seed=2, engine=engine).run()
+    assert plain.probe is NULL_PROBE
+    assert np.array_equal(sim.results()['occupancy'], plain.results()['occupancy'])
+
+
+def test_configured_probe(small, tmp_path, configured):
+    C.configure(small)
+    C.STORE['probe'] = None
+    assert get_probe() is NULL_PROBE
+
+    filename = str(tmp_path / 'timings.jsonl')
+    small['app']['instrument'] = {'enabled': True, 'file': filename}
+    C.configure(small)
+    C.STORE['probe'] = None
+    probe = get_probe()
+    assert isinstance(probe, Probe) and probe.filename == filename
+    assert get_probe() is probe # once per process
+    probe.step(0)
+    probe.close()
+    assert [r['time'] for r in read(filename)] == [0]
+
+# ==============================================================================
+# END: Instrumentation tests
+# ==============================================================================
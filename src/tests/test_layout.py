@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the layout of the habitats: configured inline, or in a GeoJSON
+# or CSV file
+
+# ==============================================================================
+# START: Layout tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import csv
+import json
+import pickle
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from core import create_patches
+from layout import load_layout
+from simulation import Simulation
+
+PROPS = {'w': 0.2, 's': 15, 'f': 8}
+SQUARE = [[0.1, 0.1], [0.4, 0.1], [0.4, 0.4], [0.1, 0.4]]
+TRIANGLE = [[0.5, 0.5], [0.9, 0.5], [0.5, 0.9]]
+
+
+def feature(coordinates, properties, kind='Polygon', **extra):
+    return {'type': 'Feature', 'geometry': {'type': kind, 'coordinates': coordinates},
+        'properties': properties, **extra}
+
+
+def write_geojson(path, features):
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+    return str(path)
+
+
+def write_csv(path, rows, columns=('id', 'type', 'x', 'y', 'w', 's', 'f')):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_inline_layout_is_closed_and_completed():
+    spec, = load_layout([{'id': 'lagoon', 'type': 1, 'verts': SQUARE, 'props': PROPS}])
+    assert spec['verts'] == tuple(map(tuple, SQUARE + SQUARE[:1])) # closing vertex
+    assert spec['label'] == 'lagoon' and spec['color'] == 'gray' and not spec['filled']
+    assert spec['props'] == PROPS and spec['rain'] is None
+    # an outline already closed is not closed twice
+    assert load_layout([{'id': 'lagoon', 'type': 1, 'verts': SQUARE + SQUARE[:1], 'props': PROPS}]) == [spec]
+
+
+def test_environmental_characteristics_aliases_and_order():
+    spec, = load_layout([{'id': 'lagoon', 'type': 1, 'verts': SQUARE,
+        'props': {'depth': 3, 'food': 8, 'salinity': 15, 'water': 0.2}}])
+    assert list(spec['props']) == ['w', 's', 'f', 'depth']
+
+
+def test_settlements_need_no_environmental_characteristics():
+    spec, = load_layout([{'id': 'town', 'type': 'town', 'verts': TRIANGLE}], settlement='town')
+    assert spec['filled'] and spec['props'] == {}
+
+
+def test_rain_shorthands():
+    specs = load_layout([
+        {'id': 'a', 'type': 1, 'verts': SQUARE, 'props': PROPS, 'rain': 'lambda x: x / 100'},
+        {'id': 'b', 'type': 1, 'verts': TRIANGLE, 'props': PROPS, 'rain': [0.001, 0.1]}
+    ])
+    assert specs[0]['rain'] == {'def': 'lambda x: x / 100', 'args': ['x'], 'deps': None}
+    assert specs[1]['rain'] == {'coefs': [0.001, 0.1], 'args': ['x']}
+
+
+def test_habitats_with_rain_can_be_pickled(cnf):
+    cnf['app']['habitats'] = [
+        {'id': 'a', 'type': 1, 'verts': SQUARE, 'props': PROPS,
+            'rain': {'def': 'lambda x: math.sqrt(x) / 100', 'args': ['x'], 'deps': ['import math']}},
+        {'id': 'b', 'type': 1, 'verts': TRIANGLE, 'props': PROPS, 'rain': [0.001, 0.1]}
+    ]
+    habitats = create_patches(C.settings(cnf))
+    # as handed over to the worker processes, whatever their start method
+    clones = pickle.loads(pickle.dumps(habitats))
+    for h, clone in zip(habitats, clones):
+        assert clone.rain(200) == h.rain(200)
+        assert np.array_equal(clone.get_vertices(), h.get_vertices())
+
+
+def test_geojson_layout(tmp_path):
+    path = write_geojson(tmp_path / 'lagoons.geojson', [
+        feature([SQUARE + SQUARE[:1]], {'type': 1, 'label': 'Square', **PROPS}, id='square'),
+        feature([[TRIANGLE], [[[0.6, 0.1], [0.9, 0.1], [0.9, 0.3]]]],
+            {'id': 'twins', 'type': 2, 'water': 0.3, 'salinity': 20, 'food': 9}, kind='MultiPolygon')
+    ])
+    specs = load_layout(path)
+    assert [(s['id'], s['type']) for s in specs] == [('square', 1), ('twins', 2), ('twins', 2)]
+    assert specs[0]['label'] == 'Square' and specs[0]['props'] == PROPS
+    assert specs[1]['props'] == specs[2]['props'] == {'w': 0.3, 's': 20, 'f': 9}
+    assert specs[1]['verts'][:3] == tuple(map(tuple, TRIANGLE))
+
+
+def test_geojson_holes_are_rejected(tmp_path):
+    hole = [[0.2, 0.2], [0.3, 0.2], [0.3, 0.3], [0.2, 0.2]]
+    path = write_geojson(tmp_path / 'holes.geojson', [feature([SQUARE + SQUARE[:1], hole], {'id': 'a', 'type': 1, **PROPS})])
+    with pytest.raises(ValueError, match='holes'):
+        load_layout(path)
+
+
+def test_csv_layout(tmp_path):
+    rows = [dict(id='a', type=1, x=x, y=y, **PROPS) for x, y in SQUARE + SQUARE[:1]] # closed
+    rows += [dict(id='a', type=1, x=x, y=y, **PROPS) for x, y in TRIANGLE] # same id, new habitat
+    rows += [dict(id='b', type=2, x=x, y=y, w=0.5, s=5, f=1) for x, y in TRIANGLE]
+    specs = load_layout(write_csv(tmp_path / 'lagoons.csv', rows))
+    assert [(s['id'], s['type']) for s in specs] == [('a', 1), ('a', 1), ('b', 2)]
+    assert specs[0]['verts'] == tuple(map(tuple, SQUARE + SQUARE[:1]))
+    assert specs[1]['verts'] == specs[2]['verts'] == tuple(map(tuple, TRIANGLE + TRIANGLE[:1]))
+    assert specs[0]['props'] == PROPS and specs[2]['props'] == {'w': 0.5, 's': 5, 'f': 1}
+
+
+@pytest.mark.parametrize('item, error', [
+    ({'type': 1, 'verts': SQUARE, 'props': PROPS}, 'missing key <id>'),
+    ({'id': 'a', 'type': 1, 'verts': SQUARE[:2] + SQUARE[:1], 'props': PROPS}, 'at least 3 distinct vertices'),
+    ({'id': 'a', 'type': 1, 'verts': SQUARE, 'props': {'w': 0.2}}, 'missing environmental characteristics <s, f>')
+])
+def test_malformed_habitats(item, error):
+    with pytest.raises(ValueError, match=error):
+        load_layout([item])
+
+
+def test_unknown_formats(tmp_path):
+    with pytest.raises(ValueError, match='unknown format'):
+        load_layout(str(tmp_path / 'lagoons.shp'))
+    with pytest.raises(ValueError, match='should be a list'):
+        load_layout({'id': 'a'})
+
+
+def test_default_layout(base_config):
+    assert load_layout(None) is None
+    habitats = C.settings(base_config).HABITATS
+    assert habitats == C.default_layout()
+    assert [h['type'] for h in habitats].count(C.HUMAN_SETTLEMENT) == 3
+
+
+def test_default_layout_from_a_file_runs_the_same_process(cnf, tmp_path):
+    # the last default vertex only stands for the closing one (CLOSEPOLY)
+    rows = [dict(id=spec['id'], type=spec['type'], label=spec['label'], color=spec['color'],
+        filled=int(spec['filled']), x=x, y=y, **spec['props'])
+        for spec in C.default_layout() for x, y in spec['verts'][:-1] + spec['verts'][:1]]
+    columns = ('id', 'type', 'label', 'color', 'filled', 'x', 'y', 'w', 's', 'f')
+    default = Simulation(cnf, seed=2019).run().results()
+    cnf['app']['habitats'] = write_csv(tmp_path / 'default.csv', rows, columns)
+    layout = Simulation(cnf, seed=2019).run().results()
+    assert layout['hab_names'] == default['hab_names']
+    assert np.array_equal(layout['occupancy'], default['occupancy'])
+    assert layout['stats'].equals(default['stats'])
+
+# ==============================================================================
+# END: Layout tests
+# ==============================================================================
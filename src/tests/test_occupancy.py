@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the occupancy of the habitats
+
+# ==============================================================================
+# START: Occupancy tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+from occupancy import Occupancy
+from simulation import Simulation
+
+HABS = ['lagoon-1', 'lagoon-2', 'human-settlement-1']
+HAB_TYPES = [1, 2, 'human-settlement']
+TYPES = ['5cm', '30cm']
+NONE = np.empty(0, dtype=int) # no agent
+
+
+def occupancy_of(habs, codes, capacity=0):
+    occupancy = Occupancy(HABS, TYPES, HAB_TYPES, capacity)
+    occupancy.reset(habs, codes)
+    return occupancy
+
+
+def test_agents_out_of_any_habitat_are_not_counted():
+    occupancy = occupancy_of([0, 0, 2, -1], [0, 1, 1, 0])
+    assert occupancy.counts.tolist() == [[1, 1], [0, 0], [0, 1]]
+
+
+def test_moves_match_a_full_count():
+    rng = np.random.default_rng(0)
+    habs, codes = rng.integers(-1, len(HABS), 200), rng.integers(0, len(TYPES), 200)
+    occupancy = occupancy_of(habs, codes)
+    for _ in range(50):
+        movers = np.flatnonzero(rng.random(len(habs)) < 0.2)
+        new_habs = rng.integers(-1, len(HABS), len(movers))
+        occupancy.move(codes[movers], habs[movers], new_habs)
+        habs[movers] = new_habs
+        assert np.array_equal(occupancy.counts, occupancy_of(habs, codes).counts)
+    occupancy.move([], [], []) # nothing moved
+    assert np.array_equal(occupancy.counts, occupancy_of(habs, codes).counts)
+
+
+@pytest.mark.parametrize('engine', ['vectorized', 'reference'])
+def test_simulation_keeps_the_counts(cnf, engine):
+    sim = Simulation(cnf, seed=1, engine=engine, record=False)
+    for _ in range(5):
+        sim.step()
+        recount = Occupancy(sim.occupancy.hab_names, sim.occupancy.types)
+        recount.reset(sim.agents.habs, sim.agents.codes)
+        assert np.array_equal(sim.occupancy.counts, recount.counts)
+    assert np.array_equal(sim.occupancy.tensor[-1], sim.occupancy.counts)
+
+
+@pytest.mark.parametrize('capacity', [0, 1, 10])
+def test_history_is_a_time_x_habitat_x_type_tensor(capacity):
+    occupancy = occupancy_of(NONE, NONE, capacity)
+    snapshots = []
+    for t in range(7):
+        occupancy.counts = np.full((len(HABS), len(TYPES)), t) + np.arange(len(TYPES))
+        snapshots.append(occupancy.snapshot())
+        occupancy.record()
+    assert len(occupancy) == 7
+    assert occupancy.tensor.shape == (7, len(HABS), len(TYPES))
+    assert np.array_equal(occupancy.tensor, snapshots)
+    assert np.array_equal(occupancy.tensor[:, 1, 1], np.arange(7) + 1) # time series
+
+
+def test_snapshot_is_a_copy():
+    occupancy = occupancy_of([0], [0])
+    snapshot = occupancy.snapshot()
+    occupancy.move([0], [0], [1])
+    assert snapshot.tolist() == [[1, 0], [0, 0], [0, 0]]
+
+
+def test_npz_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    occupancy = occupancy_of(rng.integers(0, len(HABS), 20), rng.integers(0, len(TYPES), 20))
+    for _ in range(4):
+        occupancy.record()
+        occupancy.counts = rng.integers(0, 9, occupancy.counts.shape)
+    filename = occupancy.save(str(tmp_path / 'occupancy.npz'))
+
+    with np.load(filename) as data: # readable without this module
+        assert np.array_equal(data['occupancy'], occupancy.tensor)
+        assert data['hab_names'].tolist() == HABS
+        assert data['hab_types'].tolist() == [str(t) for t in HAB_TYPES]
+        assert data['types'].tolist() == TYPES
+
+    loaded = Occupancy.load(filename)
+    assert np.array_equal(loaded.tensor, occupancy.tensor)
+    assert np.array_equal(loaded.counts, occupancy.tensor[-1]) # last recorded
+    assert (loaded.hab_names, loaded.types) == (HABS, TYPES)
+    loaded.record() # the history keeps growing
+    assert len(loaded) == 5
+
+
+def test_restore_rejects_other_shapes():
+    occupancy = occupancy_of(NONE, NONE)
+    with pytest.raises(ValueError, match='occupancy of shape'):
+        occupancy.restore(np.zeros((3, len(HABS), len(TYPES) + 1)))
+
+# ==============================================================================
+# END: Occupancy tests
+# ==============================================================================
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the background rendering of the snapshots
+
+# ==============================================================================
+# START: Pipeline tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import weakref
+import tracemalloc
+import numpy as np # arithmetic computations
+import matplotlib
+import pytest
+
+import config
+import constants as C
+from pipeline import FramePipeline
+from simulation import Simulation
+from .test_renderer import renderer_of
+
+
+@pytest.fixture
+def sim(base_config):
+    return Simulation(base_config, seed=2019, record=False)
+
+
+def start(sim, dirname, **kwargs):
+    cnf_ag = sim.settings.CNF_AG
+    return FramePipeline(
+        sim.habitats, [a['type'] for a in cnf_ag], [a['color'] for a in cnf_ag],
+        [a['label'] for a in cnf_ag], dirname, **kwargs
+    )
+
+
+def test_frames_complete_in_order(sim, tmp_path):
+    results, expected = [], []
+    with matplotlib.rc_context(), start(sim, str(tmp_path), workers=2, on_frame=results.append) as pipeline:
+        config.set_style() # as the workers do
+        renderer = renderer_of(sim)
+        for time in range(8):
+            pipeline.submit(sim.agents.x, sim.agents.y, sim.agents.codes, time)
+            expected.append(renderer.frame(sim.agents.x, sim.agents.y, sim.agents.codes, time))
+            sim.step() # the submitted positions are copies
+    assert [os.path.basename(path) for path, _ in results] == [f'{t + 1}.png' for t in range(8)]
+    for (_, frame), frame_in_process in zip(results, expected):
+        assert np.array_equal(frame, frame_in_process)
+
+
+def test_back_pressure(sim, tmp_path):
+    with start(sim, str(tmp_path), workers=2, maxsize=3, png=False) as pipeline:
+        for time in range(10):
+            pipeline.submit(sim.agents.x, sim.agents.y, sim.agents.codes, time)
+            assert len(pipeline.pending) <= 3
+            assert pipeline.count >= time + 1 - 3 # the oldest frames waited for
+    assert pipeline.count == 10
+
+
+def test_rendering_within_the_simulation_by_default(base_config, configured):
+    from output import start_pipeline
+    C.configure(base_config)
+    habitats = Simulation(base_config, seed=2019, record=False).habitats
+    assert C.RENDER_WORKERS == 0 and start_pipeline(habitats) is None
+
+
+def test_frames_are_not_kept(sim, tmp_path):
+    frames, nbytes = [], []
+    def on_frame(result):
+        frames.append(weakref.ref(result[1]))
+        nbytes.append(result[1].nbytes)
+
+    tracemalloc.start()
+    try:
+        with start(sim, str(tmp_path), workers=1, maxsize=2, on_frame=on_frame, png=False) as pipeline:
+            for time in range(30):
+                pipeline.submit(sim.agents.x, sim.agents.y, sim.agents.codes, time)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert pipeline.close() == len(frames) == 30
+    assert all(frame() is None for frame in frames) # released once handed over
+    # the frames in flight only (maxsize), whatever the number of snapshots
+    assert peak < 6 * max(nbytes)
+
+# ==============================================================================
+# END: Pipeline tests
+# ==============================================================================
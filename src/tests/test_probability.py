@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the table of the probabilities of habitat use
+
+# ==============================================================================
+# START: Probability tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from core import create_patches
+from helpers import eval_fn, compute_dist
+from probability import ProbabilityTable
+from simulation import Simulation
+
+
+@pytest.fixture
+def settings(base_config):
+    return C.settings(base_config)
+
+
+@pytest.fixture
+def table(settings):
+    return ProbabilityTable(create_patches(settings), settings.FNS).refresh(0)
+
+
+def test_table_matches_the_functions(settings, table):
+    habitats = table.habitats
+    for k, ag_cnf in enumerate(settings.CNF_AG):
+        meta_fns = {meta_fn['penv']: meta_fn for meta_fn in ag_cnf['fns']}
+        for i, h in enumerate(habitats):
+            if h in habitats.settlements:
+                continue
+            values = [h.props['w'], h.props['s'], h.props['f'], min(compute_dist(h, habitats.settlements))]
+            expected = [eval_fn(meta_fns[penv], *([v] if meta_fns[penv]['args'] else []))
+                for penv, v in zip(ProbabilityTable.PENVS, values)]
+            assert table.probs[k, i] == pytest.approx(expected)
+            assert table.overall[k, i] == pytest.approx(np.prod(expected))
+
+
+def test_refresh_once_per_epoch(settings, table):
+    overall = table.overall.copy()
+    for h in table.habitats.lagoons:
+        h.props['w'] += 5 # new environment, not refreshed yet
+    assert np.array_equal(table.refresh(0).overall, overall) # same epoch: memoized
+
+    fresh = ProbabilityTable(table.habitats, settings.FNS).refresh(0).overall
+    assert not np.array_equal(fresh, overall)
+    assert np.array_equal(table.refresh(1).overall, fresh, equal_nan=True)
+    assert table.epoch == 1
+
+
+def test_invalidate(settings, table):
+    for h in table.habitats.lagoons:
+        h.props['s'] *= 2
+    table.invalidate()
+    fresh = ProbabilityTable(table.habitats, settings.FNS).refresh(0).overall
+    assert np.array_equal(table.refresh(0).overall, fresh, equal_nan=True)
+
+
+def test_simulation_refreshes_on_rain(base_config):
+    sim = Simulation(base_config, seed=2019, record=False)
+    divisor = sim.settings.TIME_DIVISOR
+    sim.run(divisor - 1)
+    assert sim.epoch == 0 and sim.table.epoch == 0
+    sim.step() # rain
+    assert sim.epoch == 1 and sim.table.epoch == 1
+    water = [h.props.get('w', 0) for h in sim.habitats]
+    assert np.array_equal(sim.table.env[:, 0], water)
+
+
+def test_lookup(table):
+    hab_index = np.array([0, 2, 2])
+    env, probs, overall = table.lookup(1, hab_index)
+    assert np.array_equal(env, table.env[hab_index])
+    assert np.array_equal(probs, table.probs[1, hab_index])
+    assert np.array_equal(overall, table.overall[1, hab_index])
+
+
+def test_unknown_metric(settings):
+    with pytest.raises(ValueError, match='unknown distance metric'):
+        ProbabilityTable(create_patches(settings), settings.FNS, 'manhattan')
+
+# ==============================================================================
+# END: Probability tests
+# ==============================================================================
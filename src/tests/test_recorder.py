@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the recording of the agents' statistics
+
+# ==============================================================================
+# START: Recorder tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import numpy as np # arithmetic computations
+import pandas as pd # dataframe handling
+import pytest
+
+from recorder import StatsRecorder, StatsWriter, has_parquet
+
+AGENTS = ['1-5cm', '2-5cm', '1-30cm']
+HABS = ['lagoon', 'human-settlement', 'human-settlement']
+TYPES = [1, 'human-settlement', 'human-settlement']
+FORMATS = ['csv', pytest.param('parquet', marks=pytest.mark.skipif(not has_parquet(), reason='no Parquet engine'))]
+
+
+def batch(time, n=3, seed=0):
+    """ The statistics of `n` agents at a unit of time """
+    rng = np.random.default_rng(seed + time)
+    return dict(
+        processing_unit=time, agents=np.arange(n) % len(AGENTS), agent_x=rng.random(n),
+        agent_y=rng.random(n), habs=np.arange(n) % len(HABS), env=rng.random((n, 4)),
+        probs=rng.random((n, 4)), prob=rng.random(n), moved=rng.random(n) < 0.5
+    )
+
+
+def record_batches(recorder, times, n=3):
+    for time in times:
+        recorder.record_batch(**batch(time, n))
+    return recorder
+
+
+def as_rows(b):
+    """ The same statistics as `record` arguments, one per agent """
+    return [dict(
+        processing_unit=b['processing_unit'], agent_name=AGENTS[a], agent_x=b['agent_x'][i],
+        agent_y=b['agent_y'][i], hab_name=HABS[h], hab_water_depth=b['env'][i, 0],
+        hab_salinity=b['env'][i, 1], hab_food=b['env'][i, 2], hab_distance=b['env'][i, 3],
+        prob_overall=b['prob'][i], prob_water=b['probs'][i, 0], prob_salinity=b['probs'][i, 1],
+        prob_food=b['probs'][i, 2], prob_distance=b['probs'][i, 3], has_moved=b['moved'][i]
+    ) for i, (a, h) in enumerate(zip(b['agents'], b['habs']))]
+
+
+def test_frame():
+    recorder = record_batches(StatsRecorder(6, AGENTS, HABS, TYPES), [1, 2])
+    df = recorder.to_frame()
+    assert list(df.columns) == list(StatsRecorder.FIELDS)
+    assert len(df) == len(recorder) == 6
+    assert df['processing_unit'].tolist() == [1, 1, 1, 2, 2, 2]
+    assert df['agent_name'].tolist() == AGENTS * 2
+    assert df['hab_name'].tolist() == HABS * 2
+    assert df['hab_type'].tolist() == TYPES * 2
+    assert list(df['hab_name'].cat.categories) == ['lagoon', 'human-settlement'] # no duplicates
+    b = batch(2)
+    assert df['prob_food'].tolist()[3:] == b['probs'][:, 2].tolist()
+    assert df['has_moved'].tolist()[3:] == b['moved'].tolist()
+
+
+def test_record_matches_record_batch():
+    by_batch = record_batches(StatsRecorder(6, AGENTS, HABS, TYPES), [1, 2])
+    by_row = StatsRecorder(6, AGENTS, HABS, TYPES)
+    for time in (1, 2):
+        for row in as_rows(batch(time)):
+            by_row.record(**row)
+    pd.testing.assert_frame_equal(by_row.to_frame(), by_batch.to_frame())
+
+
+def test_columns_grow_on_demand():
+    recorder = record_batches(StatsRecorder(4, AGENTS, HABS, TYPES), range(1, 6))
+    assert len(recorder) == 15 and recorder.capacity >= 15
+    assert recorder.to_frame()['processing_unit'].tolist() == np.repeat(range(1, 6), 3).tolist()
+    assert recorder.nbytes == sum(c.nbytes for c in recorder.columns.values())
+
+
+def test_views_and_copies():
+    recorder = record_batches(StatsRecorder(6, AGENTS, HABS, TYPES), [1])
+    view, copy = recorder.to_frame(), recorder.to_frame(copy=True)
+    recorder.clear()
+    record_batches(recorder, [7])
+    assert view['processing_unit'].tolist() == [7, 7, 7] # the recorded arrays
+    assert copy['processing_unit'].tolist() == [1, 1, 1]
+
+
+def test_restore():
+    recorder = record_batches(StatsRecorder(6, AGENTS, HABS, TYPES), [1, 2])
+    columns = {k: col[:len(recorder)].copy() for k, col in recorder.columns.items()}
+    restored = StatsRecorder(2, AGENTS, HABS, TYPES)
+    restored.restore(columns)
+    pd.testing.assert_frame_equal(restored.to_frame(), recorder.to_frame())
+
+def read(writer):
+    if writer.fmt == 'parquet':
+        return pd.read_parquet(writer.path)
+    return pd.read_csv(writer.path, float_precision='round_trip')
+
+
+def assert_same_rows(df, expected):
+    assert list(df.columns) == list(expected.columns) and len(df) == len(expected)
+    for k in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[k]) or expected[k].dtype == bool:
+            assert np.array_equal(df[k].to_numpy(), expected[k].to_numpy()), k
+        else: # names
+            assert df[k].astype(str).tolist() == expected[k].astype(str).tolist(), k
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_streamed_in_chunks(tmp_path, fmt):
+    writer = StatsWriter(str(tmp_path / 'stats'), fmt)
+    recorder = record_batches(StatsRecorder(6, AGENTS, HABS, TYPES, writer), range(1, 6))
+    assert len(recorder) < 15 and recorder.capacity == 6 # memory stays flat
+    recorder.close()
+    assert writer.chunks == 3 # 6 + 6 + 3 rows
+    expected = record_batches(StatsRecorder(15, AGENTS, HABS, TYPES), range(1, 6)).to_frame()
+    assert_same_rows(read(writer), expected)
+    if fmt == 'parquet':
+        assert sorted(os.listdir(writer.path)) == ['part-00000.parquet', 'part-00001.parquet', 'part-00002.parquet']
+    assert writer.nbytes == sum(os.path.getsize(os.path.join(writer.path, name))
+        for name in os.listdir(writer.path)) if fmt == 'parquet' else os.path.getsize(writer.path)
+
+
+@pytest.mark.skipif(not has_parquet(), reason='no Parquet engine')
+def test_unfinished_parts_are_ignored(tmp_path):
+    writer = StatsWriter(str(tmp_path / 'stats'), 'parquet')
+    record_batches(StatsRecorder(3, AGENTS, HABS, TYPES, writer), [1, 2]).close()
+    with open(os.path.join(writer.path, '.part-00002.parquet.tmp'), 'wb') as f:
+        f.write(b'PAR1 interrupted') # as left by a process killed while writing
+    assert len(read(writer)) == 6
+
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_resume_discards_what_follows(tmp_path, fmt):
+    frames = [record_batches(StatsRecorder(3, AGENTS, HABS, TYPES), [t]).to_frame(copy=True) for t in (1, 2, 3)]
+    writer = StatsWriter(str(tmp_path / 'stats'), fmt)
+    writer.write(frames[0])
+    writer.sync()
+    state = (writer.chunks, writer.nbytes) # e.g., saved in a checkpoint
+    writer.write(frames[1]) # lost by the interrupted process
+    writer.close()
+
+    writer = StatsWriter(str(tmp_path / 'stats'), fmt) # the resumed process
+    if fmt == 'parquet': # a part left unfinished too
+        open(os.path.join(writer.path, '.part-00002.parquet.tmp'), 'wb').close()
+    writer.resume(*state)
+    if fmt == 'parquet':
+        assert os.listdir(writer.path) == ['part-00000.parquet']
+    writer.write(frames[2])
+    writer.close()
+    assert_same_rows(read(writer), pd.concat([frames[0], frames[2]], ignore_index=True))
+
+
+def test_write_errors_are_reported(tmp_path):
+    writer = StatsWriter(str(tmp_path / 'missing' / 'stats'), 'csv')
+    writer.write(record_batches(StatsRecorder(3, AGENTS, HABS, TYPES), [1]).to_frame(copy=True))
+    with pytest.raises(IOError, match='cannot be written'):
+        writer.sync()
+    with pytest.raises(IOError):
+        writer.close()
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match='unknown format'):
+        StatsWriter(str(tmp_path / 'stats'), 'xlsx')
+
+# ==============================================================================
+# END: Recorder tests
+# ==============================================================================
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the rendering of the snapshots
+
+# ==============================================================================
+# START: Renderer tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import imageio as gm # gif maker
+import numpy as np # arithmetic computations
+import pytest
+
+import constants as C
+from renderer import Renderer, GifWriter
+from simulation import Simulation
+
+
+@pytest.fixture
+def sim(base_config):
+    return Simulation(base_config, seed=2019, record=False)
+
+
+def renderer_of(sim, dirname='.'):
+    cnf_ag = sim.settings.CNF_AG
+    return Renderer(
+        sim.habitats, [a['type'] for a in cnf_ag], [a['color'] for a in cnf_ag],
+        [a['label'] for a in cnf_ag], dirname
+    )
+
+
+def snapshot(renderer, sim):
+    return renderer.frame(sim.agents.x, sim.agents.y, sim.agents.codes, sim.time)
+
+
+def test_frames(sim):
+    frame = snapshot(renderer_of(sim), sim)
+    assert frame.dtype == np.uint8 and frame.ndim == 3 and frame.shape[2] == 3
+    assert frame.flags['OWNDATA'] # not a view of the canvas, redrawn at the next snapshot
+
+
+def test_figure_is_reused(sim):
+    renderer = renderer_of(sim)
+    snapshot(renderer, sim)
+    artists = (list(renderer.ax.patches), list(renderer.ax.lines), len(renderer.fig.axes))
+    for _ in range(5):
+        snapshot(renderer, sim.step())
+    assert (list(renderer.ax.patches), list(renderer.ax.lines), len(renderer.fig.axes)) == artists
+
+
+def test_reused_figure_draws_as_a_new_one(sim):
+    renderer = renderer_of(sim)
+    first = snapshot(renderer, sim)
+    sim.run(12)
+    later = snapshot(renderer, sim)
+    assert not np.array_equal(first, later) # agents moved, new title
+    assert np.array_equal(later, snapshot(renderer_of(sim), sim)) # nothing left from before
+
+
+def test_agents_by_type(sim):
+    renderer = renderer_of(sim)
+    renderer.update(sim.agents.x, sim.agents.y, sim.agents.codes)
+    for k, line in enumerate(renderer.lines):
+        selected = sim.agents.codes == k
+        assert np.array_equal(line.get_xdata(), sim.agents.x[selected])
+        assert np.array_equal(line.get_ydata(), sim.agents.y[selected])
+
+
+def test_renderer_built_once(base_config, configured):
+    from output import get_renderer
+    C.configure(base_config)
+    sim = Simulation(base_config, seed=2019, record=False)
+    renderer = get_renderer(sim.habitats)
+    assert get_renderer(sim.habitats) is renderer
+    assert get_renderer(Simulation(base_config, seed=1, record=False).habitats) is not renderer
+
+def test_png_is_the_frame(sim, tmp_path):
+    renderer = renderer_of(sim, str(tmp_path))
+    image_path, frame = renderer.snapshot(sim.agents.x, sim.agents.y, sim.agents.codes, 4)
+    assert image_path == os.path.join(str(tmp_path), '5.png')
+    assert np.array_equal(gm.imread(image_path)[:, :, :3], frame)
+    assert renderer.snapshot(sim.agents.x, sim.agents.y, sim.agents.codes, 5, png=False)[0] is None
+    assert os.listdir(tmp_path) == ['5.png']
+
+
+def test_frames_streamed_into_a_gif(sim, tmp_path):
+    renderer = renderer_of(sim)
+    filename = str(tmp_path / 'snapshots.gif')
+    with GifWriter(filename) as gif:
+        for _ in range(4):
+            gif.append(snapshot(renderer, sim.step()))
+    assert gif.count == 4
+    frames = gm.mimread(filename)
+    assert len(frames) == 4 and frames[0].shape[:2] == snapshot(renderer, sim).shape[:2]
+
+
+def test_make_gif_combines_the_pngs_in_order(tmp_path):
+    from output import make_gif
+    colors = {1: 0, 2: 60, 10: 120, 11: 180} # numeric, not lexicographic, order
+    for n, value in colors.items():
+        gm.imwrite(str(tmp_path / f'{n}.png'), np.full((8, 8, 3), value, dtype=np.uint8))
+    make_gif('image.gif', dirname=str(tmp_path))
+    frames = gm.mimread(str(tmp_path / 'image.gif'))
+    assert [int(f[0, 0, 0]) for f in frames] == list(colors.values())
+
+# ==============================================================================
+# END: Renderer tests
+# ==============================================================================
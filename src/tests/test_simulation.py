@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the self-contained simulations
+
+# ==============================================================================
+# START: Simulation tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import copy
+from concurrent.futures import ThreadPoolExecutor # threads
+import numpy as np # arithmetic computations
+import pandas as pd # dataframe handling
+import pytest
+
+import constants as C
+from simulation import Simulation
+from .conftest import small_config
+from .test_imports import loaded_after
+
+
+def same(a, b):
+    """ Whether two simulations gave the same results """
+    a, b = a.results(), b.results()
+    return np.array_equal(a['occupancy'], b['occupancy']) and \
+        ('stats' not in a or a['stats'].equals(b['stats']))
+
+
+@pytest.fixture
+def small(cnf):
+    return small_config(cnf, quantity=20, counter=8)
+
+
+def test_same_seed_same_results(small):
+    assert same(Simulation(small, seed=3).run(), Simulation(small, seed=3).run())
+    assert not same(Simulation(small, seed=3).run(), Simulation(small, seed=4).run())
+
+
+def test_run_up_to_the_end(small):
+    sim = Simulation(small, seed=0)
+    assert (sim.time, len(sim), sim.done) == (0, 1, False)
+    sim.run(3)
+    assert (sim.time, len(sim)) == (3, 4)
+    sim.run()
+    assert sim.done and len(sim) == small['app']['counter']
+    results = sim.results()
+    assert results['occupancy'].shape == (len(sim), len(results['hab_names']), len(results['types']))
+    assert isinstance(results['stats'], pd.DataFrame)
+    assert len(results['stats']) == len(sim.agents) * (len(sim) - 1)
+    assert 'stats' not in Simulation(small, seed=0, record=False).run().results()
+
+
+def test_unknown_engine(small):
+    with pytest.raises(ValueError, match='unknown engine <fast>'):
+        Simulation(small, engine='fast')
+
+
+def test_simulations_are_isolated(small):
+    cnf = copy.deepcopy(small)
+    store = dict(C.STORE)
+    processing_time, threshold = C.PROCESSING_TIME, C.THRESHOLD
+
+    sims = [Simulation(small, seed=1), Simulation(small, seed=1, engine='reference')]
+    for _ in range(4): # interleaved
+        for sim in sims:
+            sim.step()
+    sims[0].config['app']['counter'] = 2 # own copy
+    assert small == cnf
+    assert all(C.STORE[k] is v for k, v in store.items())
+    assert (C.PROCESSING_TIME, C.THRESHOLD) == (processing_time, threshold)
+    assert same(sims[0], Simulation(small, seed=1).run(4))
+    assert same(sims[1], Simulation(small, seed=1, engine='reference').run(4))
+
+
+def test_simulations_side_by_side_in_threads(small):
+    other = small_config(copy.deepcopy(small), quantity=10, counter=12)
+    jobs = [(small, 0), (other, 0), (small, 1), (other, 1)] * 2
+    expected = [Simulation(cnf, seed=seed).run() for cnf, seed in jobs]
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        sims = list(pool.map(lambda job: Simulation(job[0], seed=job[1]).run(), jobs))
+    assert all(same(a, b) for a, b in zip(sims, expected))
+
+
+def test_simulating_needs_no_visualization(notebooks_dir):
+    statement = 'from simulation import Simulation; Simulation(seed=0, record=False).run(3)'
+    assert loaded_after(statement, notebooks_dir) == []
+
+# ==============================================================================
+# END: Simulation tests
+# ==============================================================================
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#
+# Individual-Based Modeling (IBM)
+#
+# Created on October 12, 2019
+#
+# Authors:
+#   Ralph Florent <r.florent@jacobs-university.de>
+#   Davi Tavares <davi.tavares@leibniz-zmt.de>
+#   Agostino Merico <a.merico@jacobs-university.de>
+#
+# Behaviour of the parameter sweeps
+
+# ==============================================================================
+# START: Sweep tests
+# ==============================================================================
+
+# -*- coding: utf-8 -*-
+import os
+import copy
+import json
+import numpy as np # arithmetic computations
+import pytest
+
+from sweep import Sweep, set_param, grid, latin_hypercube, point_key
+from .conftest import small_config
+
+PARAMS = {'app.threshold': [1e-8, 1e-6], 'app.agents.30cm.quantity': [5, 10]}
+
+
+def sweep_of(cnf, dirname, **kwargs):
+    kwargs = {'replicates': 2, 'seed': 2019, 'workers': 1, 'cnf': cnf, **kwargs}
+    return Sweep(kwargs.pop('params', PARAMS), str(dirname), **kwargs)
+
+
+@pytest.fixture
+def small(cnf):
+    return small_config(cnf, quantity=20, counter=6)
+
+
+def test_set_param_by_position_type_and_penv(cnf):
+    set_param(cnf, 'app.agents.30cm.quantity', 7)
+    set_param(cnf, 'app.agents.0.quantity', 3)
+    set_param(cnf, 'app.agents.5cm.fns.s.coefs.0', 1.0) # taken from the definition first
+    agents = {ag['type']: ag for ag in cnf['app']['agents']}
+    assert (agents['30cm']['quantity'], cnf['app']['agents'][0]['quantity']) == (7, 3)
+    assert agents['5cm']['fns'][1]['coefs'] == pytest.approx([1.0, 0.0002, 0.0004])
+    with pytest.raises(KeyError, match='no item <1cm>'):
+        set_param(cnf, 'app.agents.1cm.quantity', 1)
+    with pytest.raises(ValueError, match='not a polynomial'):
+        set_param(cnf, 'app.agents.30cm.fns.w.coefs.0', 1.0)
+
+
+def test_grid_and_latin_hypercube():
+    assert grid(PARAMS) == [
+        {'app.threshold': t, 'app.agents.30cm.quantity': q} for t in PARAMS['app.threshold'] for q in (5, 10)
+    ]
+    points = latin_hypercube({'a': [0.0, 1.0], 'b': [0, 100]}, 10, seed=1)
+    strata = np.floor(np.array([p['a'] for p in points]) * 10)
+    assert sorted(strata) == list(range(10)) # every stratum sampled exactly once
+    assert all(isinstance(p['b'], int) and 0 <= p['b'] <= 100 for p in points)
+    assert latin_hypercube({'a': [0.0, 1.0]}, 5, seed=1) == latin_hypercube({'a': [0.0, 1.0]}, 5, seed=1)
+
+
+def test_resume_runs_the_pending_points_only(small, tmp_path):
+    sweep = sweep_of(small, tmp_path).run()
+    assert len(sweep.store) == 4 and sweep.pending() == []
+    results = {point_key(p): sweep.store.load(p) for p in sweep.points}
+
+    index = os.path.join(str(tmp_path), 'index.jsonl')
+    with open(index, 'r') as f:
+        lines = f.readlines()
+    with open(index, 'w') as f: # the last point interrupted while being saved
+        f.writelines(lines[:-1])
+        f.write(lines[-1][:10])
+
+    resumed = sweep_of(small, tmp_path)
+    assert resumed.points == sweep.points
+    assert [point_key(p) for p in resumed.pending()] == [json.loads(lines[-1])['key']]
+    resumed.run()
+    assert len(resumed.store) == 4 and resumed.pending() == []
+    for point in resumed.points: # the same seed gives the same results
+        loaded = resumed.store.load(point)
+        assert all(np.array_equal(loaded[k], results[point_key(point)][k]) for k in loaded)
+
+
+def test_another_sweep_is_refused(small, tmp_path):
+    sweep_of(small, tmp_path).run()
+    with open(os.path.join(str(tmp_path), 'sweep.json'), 'r') as f:
+        spec = json.load(f)
+    with pytest.raises(ValueError, match=r'holds the results of another sweep \(changed: config\)'):
+        sweep_of(small_config(copy.deepcopy(small), quantity=21), tmp_path)
+    with pytest.raises(ValueError, match=r'changed: params'):
+        sweep_of(small, tmp_path, params={'app.threshold': [1e-8]})
+    with pytest.raises(ValueError, match=r'changed: replicates, seed'):
+        sweep_of(small, tmp_path, replicates=3, seed=1)
+    with open(os.path.join(str(tmp_path), 'sweep.json'), 'r') as f:
+        assert json.load(f) == spec # left as it was
+    assert sweep_of(small, tmp_path).pending() == []
+
+
+def test_summaries_indexed_by_the_parameters(small, tmp_path):
+    df = sweep_of(small, tmp_path).run().store.to_frame()
+    assert list(df.index.names) == list(PARAMS)
+    assert len(df) == 4 and df['key'].is_unique
+    assert 'moves_30cm' in df.columns
+
+# ==============================================================================
+# END: Sweep tests
+# ==============================================================================